@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import math
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+from config import Config
+
+PRIORITIES = ("high", "normal", "low")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """取一个令牌，成功返回0，否则返回还要等待的秒数"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Admission:
+    """一次准入判断的结果: allow_llm 为 False 时只用规则引擎处理；rejected 时应返回429"""
+
+    __slots__ = ("priority", "allow_llm", "rejected", "reason", "retry_after", "started")
+
+    def __init__(self, priority: str, allow_llm: bool = True, rejected: bool = False,
+                 reason: Optional[str] = None, retry_after: float = 0.0):
+        self.priority = priority
+        self.allow_llm = allow_llm
+        self.rejected = rejected
+        self.reason = reason
+        self.retry_after = retry_after
+        self.started = time.monotonic()
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionController:
+    """
+    /api/process 的准入控制。每个客户端一个令牌桶限速: 已在 client_priorities 中配置的API key按key计，其余按IP计；
+    全局在途请求数按 max_in_flight 计算负载，负载升高时按优先级先把请求降级为只用规则引擎，再拒绝。
+    状态只在本进程内，多个worker进程时每个进程各自限流。
+    """
+
+    # 优先级 → (降级为规则引擎的负载, 拒绝的负载)，负载 = 在途请求数 / max_in_flight
+    SHED_LEVELS = {"high": (1.0, 1.0), "normal": (0.75, 1.0), "low": (0.5, 0.75)}
+
+    def __init__(self, max_in_flight: int = 32, rate: float = 5.0, burst: float = 20.0,
+                 client_priorities: Optional[Dict[str, str]] = None, max_clients: int = 10000):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight必须是正整数")
+        for api_key, priority in (client_priorities or {}).items():
+            if priority not in PRIORITIES:
+                raise ValueError(f"API key {api_key[:4]}*** 的优先级 {priority} 无效，必须是 {'/'.join(PRIORITIES)}")
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.client_priorities = dict(client_priorities or {})
+        self.max_clients = max_clients
+        self.in_flight = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._avg_duration = 1.0
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "degraded": 0, "rate_limited": 0, "overloaded": 0, "peak_in_flight": 0,
+                      "shed_by_priority": {priority: {"degraded": 0, "rejected": 0} for priority in PRIORITIES}}
+
+    @classmethod
+    def from_config(cls) -> Optional["AdmissionController"]:
+        if not Config.ADMISSION_ENABLED:
+            return None
+        return cls(Config.ADMISSION_MAX_IN_FLIGHT, Config.ADMISSION_RATE, Config.ADMISSION_BURST,
+                   parse_client_priorities(Config.ADMISSION_CLIENT_PRIORITIES))
+
+    def _bucket(self, client: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    def admit(self, client: str, api_key: Optional[str] = None) -> Admission:
+        """
+        client 为客户端IP。只有配置过的API key才按key限速并使用配置的优先级；
+        未配置的key随手就能换一个，按key计会绕过限速并挤满令牌桶表，所以按IP计，优先级为normal。
+        """
+        configured = api_key is not None and api_key in self.client_priorities
+        priority = self.client_priorities[api_key] if configured else "normal"
+        now = time.monotonic()
+        with self._lock:
+            shed = self.stats["shed_by_priority"][priority]
+            if self.rate > 0:
+                wait = self._bucket(f"key:{api_key}" if configured else f"ip:{client}", now).take(now)
+                if wait > 0:
+                    self.stats["rate_limited"] += 1
+                    shed["rejected"] += 1
+                    return Admission(priority, rejected=True, reason="rate_limited", retry_after=wait)
+            load = self.in_flight / self.max_in_flight
+            degrade_at, reject_at = self.SHED_LEVELS[priority]
+            if load >= reject_at:
+                self.stats["overloaded"] += 1
+                shed["rejected"] += 1
+                return Admission(priority, rejected=True, reason="overloaded", retry_after=self._avg_duration)
+            allow_llm = load < degrade_at
+            if not allow_llm:
+                self.stats["degraded"] += 1
+                shed["degraded"] += 1
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+        return Admission(priority, allow_llm=allow_llm)
+
+    def release(self, admission: Admission):
+        """请求处理完后调用；处理耗时的滑动平均用作过载时的Retry-After"""
+        elapsed = time.monotonic() - admission.started
+        with self._lock:
+            self.in_flight -= 1
+            self._avg_duration += 0.1 * (elapsed - self._avg_duration)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["shed_by_priority"] = {p: dict(counts) for p, counts in self.stats["shed_by_priority"].items()}
+            stats["in_flight"] = self.in_flight
+            stats["clients"] = len(self._buckets)
+            stats["avg_duration_ms"] = round(self._avg_duration * 1000, 1)
+        stats["max_in_flight"] = self.max_in_flight
+        return stats
+
+
+def parse_client_priorities(value: str) -> Dict[str, str]:
+    """解析 "key1:low,key2:high" 形式的配置"""
+    priorities = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        api_key, _, priority = item.rpartition(':')
+        if not api_key:
+            raise ValueError(f"ADMISSION_CLIENT_PRIORITIES 格式不正确: {item}")
+        priorities[api_key] = priority
+    return priorities
+
+
+def benchmark(duration: float = 8.0, threads: int = 8, partner_rate: float = 120.0, user_rate: float = 4.0,
+              llm_ms: float = 200.0, user_timeout: float = 5.0):
+    """
+    本地负载生成器: 一个合作方按API key以 partner_rate 请求/秒灌入 /api/process，交互用户(不同IP)以 user_rate 请求/秒访问。
+    threads 个工作线程按到达顺序从队列取请求，模拟固定线程数的服务进程；桩模型每次调用固定耗时 llm_ms。
+    对比不做准入控制、只按负载降级/拒绝、再加上限速时交互用户的延迟和成功率。
+    """
+    import os
+    import queue
+    import random
+    import logging
+    from collections import Counter
+    from stub_llm import StubChatModel
+    from llm_nlp_engine import LLMVolunteerNLPEngine
+
+    logging.disable(logging.WARNING)
+    os.environ["USE_LLM"] = "true"
+    import volunteer_api
+    engine = volunteer_api.nlp_engine
+    backend = StubChatModel()
+    complete = backend.complete
+
+    def slow_complete(prompt, max_tokens=None):
+        time.sleep(llm_ms / 1000)
+        return complete(prompt, max_tokens)
+
+    backend.complete = slow_complete
+    engine.llm_engine = LLMVolunteerNLPEngine(backend=backend)
+    engine.use_llm = True
+    engine.parse_cache = None
+    texts = ["我和我朋友都是16岁，想参加明天上午的环保活动", "我18岁，想一个人参加下周六下午的社区服务",
+             "我们三个人想在4月3号做一些教育相关的事情，都是20岁", "明天下午两个人去敬老院，我们17岁"]
+    scenarios = [
+        ("不做准入控制", None),
+        ("按负载降级/拒绝", AdmissionController(threads, rate=0, client_priorities={"partner": "low"})),
+        ("加上令牌桶限速", AdmissionController(threads, rate=10, burst=20, client_priorities={"partner": "low"})),
+    ]
+    print(f"{threads} 个工作线程，合作方 {partner_rate:g} 请求/s，交互用户 {user_rate:g} 请求/s，"
+          f"模型每次调用 {llm_ms:g}ms，交互用户 {user_timeout:g}s 后放弃")
+    print(f"{'场景':<14}{'用户成功':>8}{'用户p50':>10}{'用户p95':>10}{'用户未降级':>10}"
+          f"{'合作方完成':>10}{'合作方429':>10}{'最长队列':>8}")
+    for label, controller in scenarios:
+        volunteer_api.admission_controller = controller
+        rng = random.Random(0)
+        arrivals = []
+        for client, rate in (("partner", partner_rate), ("user", user_rate)):
+            at = 0.0
+            while True:
+                at += rng.expovariate(rate)
+                if at >= duration:
+                    break
+                arrivals.append((at, client, rng.randrange(1000)))
+        arrivals.sort()
+        pending: "queue.Queue" = queue.Queue()
+        results = []
+        max_queued = [0]
+
+        def worker():
+            client = volunteer_api.app.test_client()
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                arrived, kind, user = item
+                if kind == "user" and time.monotonic() - arrived > user_timeout:
+                    results.append((kind, "timeout", None, None))
+                    continue
+                headers = {"X-API-Key": "partner"} if kind == "partner" else {}
+                response = client.post("/api/process", json={"text": texts[user % len(texts)]}, headers=headers,
+                                       environ_base={"REMOTE_ADDR": f"10.0.{user // 256}.{user % 256}"})
+                used_llm = response.status_code == 200 and response.get_json()["extracted_info"]["引擎类型"] == "LLM"
+                results.append((kind, response.status_code, time.monotonic() - arrived, used_llm))
+
+        workers = [threading.Thread(target=worker, daemon=True) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        start = time.monotonic()
+        for at, kind, user in arrivals:
+            delay = start + at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pending.put((time.monotonic(), kind, user))
+            max_queued[0] = max(max_queued[0], pending.qsize())
+        for _ in workers:
+            pending.put(None)
+        for thread in workers:
+            thread.join()
+
+        users = [r for r in results if r[0] == "user"]
+        ok = sorted(r[2] for r in users if r[1] == 200 and r[2] <= user_timeout)
+        partner = Counter(r[1] for r in results if r[0] == "partner")
+        p50 = f"{ok[len(ok) // 2] * 1000:.0f}ms" if ok else "-"
+        p95 = f"{ok[int(len(ok) * 0.95)] * 1000:.0f}ms" if ok else "-"
+        llm_share = sum(1 for r in users if r[3]) / len(users)
+        print(f"{label:<14}{len(ok) / len(users):>8.0%}{p50:>10}{p95:>10}{llm_share:>10.0%}"
+              f"{partner[200]:>10}{partner[429]:>10}{max_queued[0]:>8}")
+        if controller is not None:
+            stats = controller.get_stats()
+            print(f"{'':<14}降级 {stats['degraded']}，限速拒绝 {stats['rate_limited']}，过载拒绝 {stats['overloaded']}，"
+                  f"在途峰值 {stats['peak_in_flight']}，按优先级 {stats['shed_by_priority']}")
+
+
+if __name__ == "__main__":
+    benchmark()
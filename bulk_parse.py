@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程批量解析历史查询
+
+    python bulk_parse.py queries.ndjson -o results.ndjson --workers 8
+    python bulk_parse.py queries.csv --format csv --text-field query -o results.ndjson --resume
+"""
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from collections import deque
+from typing import Dict, List, Iterator, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+_engine = None
+_database = None
+_include_projects = False
+
+
+def _init_worker(include_projects: bool):
+    global _engine, _database, _include_projects
+    import jieba
+    from volunteer_nlp_system import VolunteerNLPEngine, VolunteerDatabase
+    logging.getLogger().setLevel(logging.WARNING)
+    jieba.setLogLevel(logging.WARNING)
+    jieba.initialize()
+    _engine = VolunteerNLPEngine()
+    _database = VolunteerDatabase()
+    _include_projects = include_projects
+    _engine.process_natural_language("我和朋友想参加明天上午的环保活动，我们都是16岁")
+
+
+def _parse_chunk(chunk: List[Tuple[int, str]]) -> List[str]:
+    lines = []
+    for offset, text in chunk:
+        try:
+            processed_data = _engine.process_natural_language(text)
+            query = _engine.generate_database_query(processed_data)
+            matched = _database.search_projects(query)
+            record = {
+                "offset": offset,
+                "text": text,
+                "processed_data": processed_data.to_dict(),
+                "query_conditions": query,
+                "matched_projects": matched if _include_projects else [p["id"] for p in matched],
+                "project_count": len(matched)
+            }
+        except Exception as e:
+            record = {"offset": offset, "text": text, "error": str(e)}
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return lines
+
+
+def read_records(path: str, fmt: str, text_field: str) -> Iterator[Tuple[int, str]]:
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == "csv":
+            for offset, row in enumerate(csv.DictReader(f)):
+                yield offset, row.get(text_field) or ""
+        else:
+            for offset, line in enumerate(f):
+                line = line.strip()
+                if not line:
+                    yield offset, ""
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    yield offset, line
+                    continue
+                yield offset, item.get(text_field, "") if isinstance(item, dict) else str(item)
+
+
+def _chunked(records: Iterator[Tuple[int, str]], size: int) -> Iterator[List[Tuple[int, str]]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _truncate_partial_line(path: str):
+    """中断时最后一行可能只写了一半，续跑前把它截掉"""
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        pos = size
+        while pos > 0:
+            step = min(pos, 1 << 16)
+            pos -= step
+            f.seek(pos)
+            index = f.read(step).rfind(b'\n')
+            if index != -1:
+                f.truncate(pos + index + 1)
+                return
+        f.truncate(0)
+
+
+def last_written_offset(path: str) -> Optional[int]:
+    """读取已有输出文件最后一条完整记录的offset，用于断点续跑"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        block = min(end, 1 << 16)
+        while True:
+            f.seek(end - block)
+            tail = f.read(block)
+            lines = tail.rstrip(b'\n').split(b'\n')
+            if len(lines) > 1 or block == end:
+                break
+            block = min(end, block * 2)
+    for raw in reversed(lines):
+        try:
+            return json.loads(raw.decode('utf-8'))["offset"]
+        except (ValueError, KeyError, UnicodeDecodeError):
+            continue
+    return None
+
+
+class ThroughputReporter:
+    def __init__(self, interval: float = 5.0, stream=sys.stderr):
+        self.interval = interval
+        self.stream = stream
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.count = 0
+        self.errors = 0
+
+    def update(self, lines: List[str]):
+        self.count += len(lines)
+        self.errors += sum(1 for line in lines if '"error":' in line)
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self._print("进度")
+
+    def _print(self, label: str):
+        elapsed = time.perf_counter() - self.start
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        print(f"[{label}] 已处理 {self.count} 条, 失败 {self.errors} 条, "
+              f"耗时 {elapsed:.1f}s, 吞吐 {rate:.1f} 条/秒", file=self.stream, flush=True)
+
+    def finish(self) -> Dict[str, Any]:
+        self._print("完成")
+        elapsed = time.perf_counter() - self.start
+        return {
+            "processed": self.count,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "records_per_second": round(self.count / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+
+def run(input_path: str, output, fmt: str = "ndjson", text_field: str = "text",
+        workers: int = None, chunk_size: int = 256, start_offset: int = 0,
+        include_projects: bool = False, report_interval: float = 5.0) -> Dict[str, Any]:
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+    records = (r for r in read_records(input_path, fmt, text_field) if r[0] >= start_offset)
+    reporter = ThroughputReporter(report_interval)
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(include_projects,)) as pool:
+        pending = deque()
+        for chunk in _chunked(records, chunk_size):
+            pending.append(pool.apply_async(_parse_chunk, (chunk,)))
+            if len(pending) >= max_pending:
+                lines = pending.popleft().get()
+                output.write('\n'.join(lines) + '\n')
+                reporter.update(lines)
+        while pending:
+            lines = pending.popleft().get()
+            output.write('\n'.join(lines) + '\n')
+            reporter.update(lines)
+        output.flush()
+
+    stats = reporter.finish()
+    stats["workers"] = workers
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="多进程批量解析NDJSON/CSV中的自然语言查询")
+    parser.add_argument("input", help="输入文件(NDJSON或CSV)")
+    parser.add_argument("-o", "--output", default="-", help="输出NDJSON文件，默认标准输出")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None, help="输入格式，默认按扩展名判断")
+    parser.add_argument("--text-field", default="text", help="文本所在的字段/列名")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认CPU核数")
+    parser.add_argument("--chunk-size", type=int, default=256, help="每个任务包含的记录数")
+    parser.add_argument("--start-offset", type=int, default=0, help="从第N条记录(从0开始)继续")
+    parser.add_argument("--resume", action="store_true", help="根据输出文件最后一条记录自动续跑")
+    parser.add_argument("--include-projects", action="store_true", help="输出完整的匹配项目而不是项目ID")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="进度报告间隔(秒)")
+    parser.add_argument("--stats", default=None, help="把吞吐统计写入JSON文件")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "ndjson")
+    start_offset = args.start_offset
+    mode = 'w'
+    if args.resume:
+        if args.output == "-":
+            parser.error("--resume 需要指定 --output 文件")
+        if os.path.exists(args.output):
+            _truncate_partial_line(args.output)
+        last = last_written_offset(args.output)
+        if last is not None:
+            start_offset = max(start_offset, last + 1)
+            mode = 'a'
+            print(f"从第 {start_offset} 条记录继续", file=sys.stderr)
+
+    output = sys.stdout if args.output == "-" else open(args.output, mode, encoding='utf-8')
+    try:
+        stats = run(args.input, output, fmt=fmt, text_field=args.text_field,
+                    workers=args.workers, chunk_size=args.chunk_size,
+                    start_offset=start_offset, include_projects=args.include_projects,
+                    report_interval=args.report_interval)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    stats["start_offset"] = start_offset
+    if args.stats:
+        with open(args.stats, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
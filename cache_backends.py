@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import json
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Cache:
+    """
+    解析结果缓存的接口: 值是可JSON序列化的对象，get() 未命中或已过期返回None。
+    调用方不要修改 get() 返回的对象。
+    """
+
+    name = "base"
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class InProcessCache(Cache):
+    """进程内LRU缓存，gunicorn的每个worker各有一份"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats, backend=self.name, entries=len(self._entries))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_SEQUENCE = struct.Struct("<I")
+_SLOT_FIELDS = struct.Struct("<QdHI")
+
+
+def _default_shared_path() -> str:
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "volunteer-parse-cache")
+
+
+class SharedMemoryCache(Cache):
+    """
+    同一台机器上所有worker共用的缓存，数据放在映射到内存的文件里(默认在 /dev/shm)。
+
+    文件是固定大小的开放寻址哈希表: 槽位按 GROUP_SIZE 个分成桶，键的哈希决定所在的桶，
+    只在桶内线性探测。每个槽位的头部有一个序号(seqlock)，写入前改成奇数、写完改成下一个偶数；
+    读取不加锁，读前读后序号相同且为偶数才算读到了完整的数据，否则重读。
+    写入时对桶所在的字节范围加 fcntl 记录锁(跨进程)，同一进程内的线程另用分段的线程锁互斥。
+    桶满时覆盖已过期或最早过期的槽位。值超过槽位容量时不缓存。
+    """
+
+    name = "shared"
+    MAGIC = b"VPC1"
+    FILE_HEADER = struct.Struct("<4sIII")          # magic, 槽位数, 槽位字节数, 桶大小
+    SLOT_HEADER = struct.Struct("<IQdHI")          # 序号, 键哈希, 过期时间, 键长度, 值长度 (序号之后即 _SLOT_FIELDS)
+    GROUP_SIZE = 8
+    READ_RETRIES = 4
+    THREAD_LOCK_STRIPES = 64
+
+    def __init__(self, path: Optional[str] = None, slots: int = 4096, slot_bytes: int = 1024,
+                 ttl: float = 3600.0):
+        if slot_bytes <= self.SLOT_HEADER.size + 16:
+            raise ValueError(f"slot_bytes至少为 {self.SLOT_HEADER.size + 17}")
+        self.path = path or _default_shared_path()
+        self.groups = max(1, (slots + self.GROUP_SIZE - 1) // self.GROUP_SIZE)
+        self.slots = self.groups * self.GROUP_SIZE
+        self.slot_bytes = slot_bytes
+        self.ttl = ttl
+        self.size = self.FILE_HEADER.size + self.slots * slot_bytes
+        self._thread_locks = [threading.Lock() for _ in range(self.THREAD_LOCK_STRIPES)]
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0, "too_large": 0, "torn_reads": 0}
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._open()
+
+    def _open(self):
+        header = self.FILE_HEADER.pack(self.MAGIC, self.slots, self.slot_bytes, self.GROUP_SIZE)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            current = os.pread(self._fd, self.FILE_HEADER.size, 0)
+            if current != header or os.fstat(self._fd).st_size != self.size:
+                if current:
+                    logger.warning(f"共享缓存文件 {self.path} 的布局与当前配置不同，重新初始化")
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self.size)
+                os.pwrite(self._fd, header, 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, self.size)
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        # 各进程的 hash() 随机化不同，跨进程必须用稳定的哈希；0 表示空槽位
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+    def _offset(self, slot: int) -> int:
+        return self.FILE_HEADER.size + slot * self.slot_bytes
+
+    def _read_slot(self, offset: int):
+        """返回 (键哈希, 过期时间, 键, 值字节)；读到写了一半的数据时重试，仍不一致返回None"""
+        fields_start = offset + 4
+        data_start = offset + self.SLOT_HEADER.size
+        for _ in range(self.READ_RETRIES):
+            sequence = _SEQUENCE.unpack_from(self._map, offset)[0]
+            if sequence & 1:
+                continue
+            key_hash, expires_at, key_length, value_length = _SLOT_FIELDS.unpack_from(self._map, fields_start)
+            payload = self._map[data_start:data_start + key_length + value_length] if key_hash else b""
+            if _SEQUENCE.unpack_from(self._map, offset)[0] == sequence:
+                return key_hash, expires_at, payload[:key_length], payload[key_length:]
+        self.stats["torn_reads"] += 1
+        return None
+
+    def get(self, key: str) -> Optional[Any]:
+        raw_key = key.encode("utf-8")
+        key_hash = self._hash(raw_key)
+        first = (key_hash % self.groups) * self.GROUP_SIZE
+        now = time.time()
+        for slot in range(first, first + self.GROUP_SIZE):
+            entry = self._read_slot(self._offset(slot))
+            if entry is None:
+                continue
+            entry_hash, expires_at, entry_key, value = entry
+            if entry_hash == 0:
+                # 除 clear() 外不会删除条目，遇到空槽位说明桶里后面也没有这个键
+                break
+            if entry_hash == key_hash and entry_key == raw_key and expires_at > now:
+                self.stats["hits"] += 1
+                return json.loads(value)
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        raw_key = key.encode("utf-8")
+        raw_value = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+        if self.SLOT_HEADER.size + len(raw_key) + len(raw_value) > self.slot_bytes:
+            self.stats["too_large"] += 1
+            return
+        key_hash = self._hash(raw_key)
+        group = key_hash % self.groups
+        first = group * self.GROUP_SIZE
+        start, length = self._offset(first), self.GROUP_SIZE * self.slot_bytes
+        with self._thread_locks[group % self.THREAD_LOCK_STRIPES]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                target, target_expiry, evicting = None, None, False
+                now = time.time()
+                for slot in range(first, first + self.GROUP_SIZE):
+                    entry_hash, expires_at, key_length, _ = _SLOT_FIELDS.unpack_from(
+                        self._map, self._offset(slot) + 4)
+                    if entry_hash == 0:
+                        target, evicting = slot, False
+                        break
+                    if entry_hash == key_hash:
+                        data_start = self._offset(slot) + self.SLOT_HEADER.size
+                        if self._map[data_start:data_start + key_length] == raw_key:
+                            target, evicting = slot, False
+                            break
+                    if target_expiry is None or expires_at < target_expiry:
+                        target, target_expiry, evicting = slot, expires_at, expires_at > now
+                self._write_slot(self._offset(target), key_hash, raw_key, raw_value)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+        self.stats["stores"] += 1
+        if evicting:
+            self.stats["evicted"] += 1
+
+    def _write_slot(self, offset: int, key_hash: int, raw_key: bytes, raw_value: bytes):
+        # 序号先改成奇数，数据和其余头部字段写完后最后才写回偶数，读者据此发现并发写入
+        sequence = _SEQUENCE.unpack_from(self._map, offset)[0]
+        _SEQUENCE.pack_into(self._map, offset, (sequence + 1) & 0xffffffff)
+        data_start = offset + self.SLOT_HEADER.size
+        self._map[data_start:data_start + len(raw_key) + len(raw_value)] = raw_key + raw_value
+        _SLOT_FIELDS.pack_into(self._map, offset + 4, key_hash, time.time() + self.ttl, len(raw_key), len(raw_value))
+        _SEQUENCE.pack_into(self._map, offset, (sequence + 2) & 0xffffffff)
+
+    def clear(self):
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            empty = bytes(self.slot_bytes)
+            for slot in range(self.slots):
+                offset = self._offset(slot)
+                sequence = _SEQUENCE.unpack_from(self._map, offset)[0]
+                _SEQUENCE.pack_into(self._map, offset, (sequence + 1) & 0xffffffff)
+                self._map[offset + 4:offset + self.slot_bytes] = empty[4:]
+                _SEQUENCE.pack_into(self._map, offset, (sequence + 2) & 0xffffffff)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中、写入等计数只统计当前进程，entries 是整个共享表中的条目数"""
+        entries = sum(1 for slot in range(self.slots) if _SLOT_FIELDS.unpack_from(self._map, self._offset(slot) + 4)[0])
+        stats = dict(self.stats, backend=self.name, entries=entries, slots=self.slots, path=self.path)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def create_cache(kind: Optional[str] = None) -> Optional[Cache]:
+    kind = kind or Config.PARSE_CACHE_BACKEND
+    if kind == "off":
+        return None
+    if kind == "memory":
+        return InProcessCache(Config.PARSE_CACHE_SIZE, Config.PARSE_CACHE_TTL)
+    if kind == "shared":
+        return SharedMemoryCache(Config.PARSE_CACHE_PATH or None, Config.PARSE_CACHE_SIZE,
+                                 Config.PARSE_CACHE_SLOT_BYTES, Config.PARSE_CACHE_TTL)
+    raise ValueError(f"未知的缓存后端: {kind}")
+
+
+def _benchmark_worker(args):
+    """在子进程中模拟一个gunicorn worker: 依次处理分到的请求，返回 (命中数, 请求数, CPU耗时)"""
+    kind, path, texts = args
+    import logging as _logging
+    import jieba
+    from hybrid_nlp_engine import HybridNLPEngine
+
+    _logging.disable(_logging.INFO)
+    jieba.setLogLevel(_logging.WARNING)
+    engine = HybridNLPEngine()
+    engine.parse_cache = InProcessCache() if kind == "memory" else SharedMemoryCache(path)
+    # 用进程CPU时间而不是墙钟时间，worker数超过CPU核数时不会把其他worker的时间片算进来
+    start = time.process_time()
+    for text in texts:
+        engine.process_natural_language(text)
+    elapsed = time.process_time() - start
+    return engine.parse_cache.stats["hits"], len(texts), elapsed
+
+
+def benchmark(requests: int = 24000, distinct: int = 3000, llm_latency_ms: float = 200.0):
+    """
+    按Zipf分布生成查询流，像gunicorn一样轮流分给多个worker进程，
+    对比每个worker各自的进程内缓存与共享内存缓存的命中率和平均解析耗时(规则引擎)；
+    最后一列按未命中时调用一次耗时 llm_latency_ms 的大模型估算平均延迟。
+    """
+    import random
+    import multiprocessing
+
+    rng = random.Random(0)
+    ages = range(8, 61)
+    days = ["明天", "后天", "下周六", "下周日", "这周末", "4月3号", "5月1号", "下个月"]
+    periods = ["上午", "下午", "晚上", ""]
+    types = ["环保", "社区服务", "教育", "敬老院", "动物保护", "医疗"]
+    people = ["我", "我和朋友", "我们三个人", "我们一家四口"]
+    texts = set()
+    while len(texts) < distinct:
+        texts.add(f"{rng.choice(people)}{rng.choice(ages)}岁，{rng.choice(days)}{rng.choice(periods)}"
+                  f"想参加{rng.choice(types)}的志愿活动")
+    texts = sorted(texts)
+    rng.shuffle(texts)
+    weights = [1 / (rank + 1) ** 0.9 for rank in range(distinct)]
+    stream = rng.choices(texts, weights, k=requests)
+
+    path = os.path.join(tempfile.gettempdir(), f"volunteer-parse-cache-bench-{os.getpid()}")
+    context = multiprocessing.get_context("fork")
+    print(f"{requests} 个请求，{distinct} 种不同的输入 (Zipf 0.9)")
+    print(f"{'worker数':<8}{'后端':<10}{'命中率':>8}{'规则引擎CPU耗时':>16}{'LLM估算延迟':>14}")
+    try:
+        for workers in (1, 2, 4, 8):
+            for kind in ("memory", "shared"):
+                if os.path.exists(path):
+                    os.unlink(path)
+                SharedMemoryCache(path).close()
+                shares = [(kind, path, stream[i::workers]) for i in range(workers)]
+                with context.Pool(workers) as pool:
+                    results = pool.map(_benchmark_worker, shares)
+                hits = sum(r[0] for r in results)
+                elapsed = sum(r[2] for r in results)
+                hit_rate = hits / requests
+                print(f"{workers:<10}{kind:<12}{hit_rate:>8.1%}{elapsed / requests * 1e6:>16.1f}us"
+                      f"{(1 - hit_rate) * llm_latency_ms:>14.1f}ms")
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import bisect
+import threading
+from collections import deque
+from datetime import datetime, date
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional, Any, Iterable, Iterator, Callable
+import geo_index
+from geo_index import has_coordinates, project_cell
+from text_index import TextIndex, text_changed
+
+
+@lru_cache(maxsize=1024)
+def parse_age_limit(age_limit: str) -> Tuple[int, int]:
+    parts = str(age_limit).split('-')
+    return int(parts[0]), int(parts[1])
+
+
+def parse_time_range(time_range: str) -> Tuple[int, int]:
+    """"08:00-12:00" -> (480, 720)，单位为分钟"""
+    start, end = str(time_range).split('-')
+    start_hour, start_minute = start.split(':')
+    end_hour, end_minute = end.split(':')
+    return int(start_hour) * 60 + int(start_minute), int(end_hour) * 60 + int(end_minute)
+
+
+@lru_cache(maxsize=8192)
+def date_ordinal(iso_date: str) -> int:
+    """"2026-04-03" -> 公历序数，相邻日期的序数相差1"""
+    return date.fromisoformat(iso_date).toordinal()
+
+
+def ordinal_weekday(ordinal: int) -> int:
+    """0表示周一，6表示周日"""
+    return (ordinal - 1) % 7
+
+
+# 次级索引的键都带上日期作为第二维，使每个桶只包含同一天的项目，写入时复制的桶足够小
+MAX_KEY = "\uffff"
+MAX_ORDINAL = date.max.toordinal()
+
+
+def type_key(project: Dict) -> Tuple[str, int]:
+    return project["type"], date_ordinal(project["date"])
+
+
+def date_key(project: Dict) -> int:
+    return date_ordinal(project["date"])
+
+
+def min_age_key(project: Dict) -> Tuple[int, str]:
+    return parse_age_limit(project["age_limit"])[0], project["date"]
+
+
+def start_time_key(project: Dict) -> Tuple[int, str]:
+    return parse_time_range(project["time"])[0], project["date"]
+
+
+class BucketIndex:
+    """
+    不可变的有序分桶索引。有序的键切成若干块，每块是一个有序键元组和对应的项目元组(桶)；
+    每次写入返回一个新索引，只复制块表(约 键数/CHUNK_SIZE 项)和被改动的那一块，
+    其余块和桶与旧索引共享，因此持有旧索引的读者不受影响。定位是 O(log n)，
+    但复制块表仍是 O(n/CHUNK_SIZE)，写入耗时随键数线性增长，只是比整表复制小约64倍。
+    """
+
+    __slots__ = ("chunks", "firsts", "key_count", "size")
+    CHUNK_SIZE = 64
+
+    def __init__(self, chunks: Optional[List[Tuple[tuple, tuple]]] = None, firsts: Optional[List] = None,
+                 key_count: int = 0, size: int = 0):
+        # chunks[i] = (有序键, 对应的桶)，firsts[i] 为第i块的第一个键，用于二分定位
+        self.chunks = chunks if chunks is not None else []
+        self.firsts = firsts if firsts is not None else []
+        self.key_count = key_count
+        self.size = size
+
+    @classmethod
+    def build(cls, items: Iterable[Tuple[Any, Dict]]) -> "BucketIndex":
+        grouped = {}
+        for key, project in items:
+            grouped.setdefault(key, []).append(project)
+        keys = sorted(grouped)
+        chunks = []
+        for start in range(0, len(keys), cls.CHUNK_SIZE):
+            chunk_keys = tuple(keys[start:start + cls.CHUNK_SIZE])
+            chunks.append((chunk_keys, tuple(tuple(sorted(grouped[key], key=lambda p: p["id"])) for key in chunk_keys)))
+        return cls(chunks, [chunk[0][0] for chunk in chunks], len(keys), sum(map(len, grouped.values())))
+
+    def _locate(self, key) -> Tuple[int, int, bool]:
+        """(块序号, 键在块内的位置, 键是否存在)；键不存在时位置为插入点"""
+        chunk = max(bisect.bisect_right(self.firsts, key) - 1, 0)
+        keys = self.chunks[chunk][0]
+        position = bisect.bisect_left(keys, key)
+        return chunk, position, position < len(keys) and keys[position] == key
+
+    def _with_chunk(self, chunk: int, keys: tuple, buckets: tuple, key_delta: int, size_delta: int) -> "BucketIndex":
+        chunks = list(self.chunks)
+        firsts = list(self.firsts)
+        if not keys:
+            del chunks[chunk], firsts[chunk]
+        elif len(keys) > 2 * self.CHUNK_SIZE:
+            half = len(keys) // 2
+            chunks[chunk:chunk + 1] = [(keys[:half], buckets[:half]), (keys[half:], buckets[half:])]
+            firsts[chunk:chunk + 1] = [keys[0], keys[half]]
+        else:
+            chunks[chunk] = (keys, buckets)
+            firsts[chunk] = keys[0]
+        return BucketIndex(chunks, firsts, self.key_count + key_delta, self.size + size_delta)
+
+    def with_added(self, key, project: Dict) -> "BucketIndex":
+        if not self.chunks:
+            return BucketIndex([((key,), ((project,),))], [key], 1, 1)
+        chunk, position, found = self._locate(key)
+        keys, buckets = self.chunks[chunk]
+        if found:
+            bucket = buckets[position]
+            ids = [p["id"] for p in bucket]
+            at = bisect.bisect_left(ids, project["id"])
+            buckets = buckets[:position] + (bucket[:at] + (project,) + bucket[at:],) + buckets[position + 1:]
+        else:
+            keys = keys[:position] + (key,) + keys[position:]
+            buckets = buckets[:position] + ((project,),) + buckets[position:]
+        return self._with_chunk(chunk, keys, buckets, 0 if found else 1, 1)
+
+    def with_removed(self, key, project_id: int) -> "BucketIndex":
+        if not self.chunks:
+            return self
+        chunk, position, found = self._locate(key)
+        if not found:
+            return self
+        keys, buckets = self.chunks[chunk]
+        bucket = buckets[position]
+        remaining = tuple(p for p in bucket if p["id"] != project_id)
+        if remaining:
+            buckets = buckets[:position] + (remaining,) + buckets[position + 1:]
+        else:
+            keys = keys[:position] + keys[position + 1:]
+            buckets = buckets[:position] + buckets[position + 1:]
+        return self._with_chunk(chunk, keys, buckets, 0 if remaining else -1, len(remaining) - len(bucket))
+
+    def get(self, key) -> Tuple[Dict, ...]:
+        if not self.chunks:
+            return ()
+        chunk, position, found = self._locate(key)
+        return self.chunks[chunk][1][position] if found else ()
+
+    def items(self, low=None, high=None) -> Iterator[Tuple[Any, Tuple[Dict, ...]]]:
+        """按键的顺序返回键在 [low, high] 区间内的 (键, 桶)，用二分查找定位起止位置"""
+        first = 0 if low is None or not self.chunks else max(bisect.bisect_right(self.firsts, low) - 1, 0)
+        for chunk in range(first, len(self.chunks)):
+            keys, buckets = self.chunks[chunk]
+            start = 0 if low is None or chunk != first else bisect.bisect_left(keys, low)
+            end = len(keys) if high is None else bisect.bisect_right(keys, high)
+            for position in range(start, end):
+                yield keys[position], buckets[position]
+            if end < len(keys):
+                return
+
+    def range_keys(self, low=None, high=None) -> List:
+        """[low, high] 区间内的键"""
+        return [key for key, _ in self.items(low, high)]
+
+    def range(self, low=None, high=None) -> List[Dict]:
+        """返回键在 [low, high] 区间内的所有项目"""
+        result = []
+        for _, bucket in self.items(low, high):
+            result.extend(bucket)
+        return result
+
+    def __len__(self):
+        return self.size
+
+
+class ProjectIdMap:
+    """按id分块的不可变映射，写入时只复制顶层块表(约 项目数/64 项)和一个最多64项的块，避免整表复制"""
+
+    __slots__ = ("chunks", "size")
+    CHUNK_BITS = 6
+
+    def __init__(self, chunks: Optional[Dict[int, Dict]] = None, size: int = 0):
+        self.chunks = chunks if chunks is not None else {}
+        self.size = size
+
+    @classmethod
+    def build(cls, projects: Iterable[Dict]) -> "ProjectIdMap":
+        chunks = {}
+        size = 0
+        for project in projects:
+            chunk = chunks.setdefault(project["id"] >> cls.CHUNK_BITS, {})
+            if project["id"] not in chunk:
+                size += 1
+            chunk[project["id"]] = project
+        return cls(chunks, size)
+
+    def get(self, project_id: int, default=None):
+        return self.chunks.get(project_id >> self.CHUNK_BITS, {}).get(project_id, default)
+
+    def __getitem__(self, project_id: int) -> Dict:
+        project = self.get(project_id)
+        if project is None:
+            raise KeyError(project_id)
+        return project
+
+    def __contains__(self, project_id: int) -> bool:
+        return self.get(project_id) is not None
+
+    def __len__(self):
+        return self.size
+
+    def values(self) -> Iterable[Dict]:
+        for chunk in self.chunks.values():
+            yield from chunk.values()
+
+    def with_set(self, project: Dict) -> "ProjectIdMap":
+        key = project["id"] >> self.CHUNK_BITS
+        chunk = dict(self.chunks.get(key, {}))
+        size = self.size if project["id"] in chunk else self.size + 1
+        chunk[project["id"]] = project
+        chunks = dict(self.chunks)
+        chunks[key] = chunk
+        return ProjectIdMap(chunks, size)
+
+    def with_deleted(self, project_id: int) -> "ProjectIdMap":
+        key = project_id >> self.CHUNK_BITS
+        chunk = dict(self.chunks.get(key, {}))
+        del chunk[project_id]
+        chunks = dict(self.chunks)
+        if chunk:
+            chunks[key] = chunk
+        else:
+            del chunks[key]
+        return ProjectIdMap(chunks, self.size - 1)
+
+
+class CatalogueSnapshot:
+    """
+    某一版本目录的只读快照。写者构造新快照后整体替换引用，
+    读者只需读取一次引用即可在整个查询期间看到一致的数据，无需加锁。
+    """
+
+    __slots__ = ("version", "by_id", "by_type", "by_date", "by_min_age", "by_start_time", "by_cell",
+                 "text_index", "_projects")
+
+    def __init__(self, version: int, by_id: ProjectIdMap, by_type: BucketIndex,
+                 by_date: BucketIndex, by_min_age: BucketIndex, by_start_time: BucketIndex,
+                 by_cell: BucketIndex, text_index: TextIndex):
+        self.version = version
+        self.by_id = by_id
+        self.by_type = by_type
+        self.by_date = by_date
+        self.by_min_age = by_min_age
+        self.by_start_time = by_start_time
+        # 只收录带坐标的项目，键为网格单元格 (纬度格, 经度格)
+        self.by_cell = by_cell
+        # 名称、描述、地点的倒排索引
+        self.text_index = text_index
+        self._projects = None
+
+    @classmethod
+    def build(cls, projects: List[Dict], version: int = 0) -> "CatalogueSnapshot":
+        return cls(
+            version,
+            ProjectIdMap.build(projects),
+            BucketIndex.build((type_key(p), p) for p in projects),
+            BucketIndex.build((date_key(p), p) for p in projects),
+            BucketIndex.build((min_age_key(p), p) for p in projects),
+            BucketIndex.build((start_time_key(p), p) for p in projects),
+            BucketIndex.build((project_cell(p), p) for p in projects if has_coordinates(p)),
+            TextIndex.build(projects)
+        )
+
+    @property
+    def projects(self) -> List[Dict]:
+        if self._projects is None:
+            self._projects = sorted(self.by_date.range(), key=lambda p: p["id"])
+        return self._projects
+
+    def with_project(self, version: int, project: Dict, previous: Optional[Dict] = None) -> "CatalogueSnapshot":
+        by_type, by_date, by_min_age, by_start_time = self.by_type, self.by_date, self.by_min_age, self.by_start_time
+        by_cell, text_index = self.by_cell, self.text_index
+        if previous is None:
+            text_index = text_index.with_added(project)
+        elif text_changed(previous, project):
+            text_index = text_index.with_removed(previous).with_added(project)
+        if previous is not None:
+            project_id = previous["id"]
+            by_type = by_type.with_removed(type_key(previous), project_id)
+            by_date = by_date.with_removed(date_key(previous), project_id)
+            by_min_age = by_min_age.with_removed(min_age_key(previous), project_id)
+            by_start_time = by_start_time.with_removed(start_time_key(previous), project_id)
+            if has_coordinates(previous):
+                by_cell = by_cell.with_removed(project_cell(previous), project_id)
+        by_type = by_type.with_added(type_key(project), project)
+        by_date = by_date.with_added(date_key(project), project)
+        by_min_age = by_min_age.with_added(min_age_key(project), project)
+        by_start_time = by_start_time.with_added(start_time_key(project), project)
+        if has_coordinates(project):
+            by_cell = by_cell.with_added(project_cell(project), project)
+        by_id = self.by_id.with_set(project)
+        return CatalogueSnapshot(version, by_id, by_type, by_date, by_min_age, by_start_time, by_cell, text_index)
+
+    def without_project(self, version: int, previous: Dict) -> "CatalogueSnapshot":
+        project_id = previous["id"]
+        return CatalogueSnapshot(
+            version,
+            self.by_id.with_deleted(project_id),
+            self.by_type.with_removed(type_key(previous), project_id),
+            self.by_date.with_removed(date_key(previous), project_id),
+            self.by_min_age.with_removed(min_age_key(previous), project_id),
+            self.by_start_time.with_removed(start_time_key(previous), project_id),
+            self.by_cell.with_removed(project_cell(previous), project_id) if has_coordinates(previous) else self.by_cell,
+            self.text_index.with_removed(previous)
+        )
+
+    def candidates_for_type(self, activity_type: str, date: Optional[str] = None) -> List[Dict]:
+        if date is not None:
+            return list(self.by_type.get((activity_type, date_ordinal(date))))
+        return self.by_type.range((activity_type,), (activity_type, MAX_ORDINAL))
+
+    def candidates_for_date(self, date: str) -> List[Dict]:
+        return list(self.by_date.get(date_ordinal(date)))
+
+    def candidates_for_dates(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                             weekdays: Optional[Iterable[int]] = None,
+                             activity_type: Optional[str] = None) -> List[Dict]:
+        """
+        日期区间(含两端)内的项目，按日期排序。weekdays 为星期几的集合(0=周一)，
+        只筛选区间内的日期键，不逐个检查项目。
+        """
+        low = date_ordinal(date_from) if date_from else 0
+        high = date_ordinal(date_to) if date_to else MAX_ORDINAL
+        if activity_type is not None:
+            buckets = ((key[1], bucket) for key, bucket in self.by_type.items((activity_type, low), (activity_type, high)))
+        else:
+            buckets = self.by_date.items(low, high)
+        if weekdays is not None:
+            weekdays = set(weekdays)
+        result = []
+        for ordinal, bucket in buckets:
+            if weekdays is None or ordinal_weekday(ordinal) in weekdays:
+                result.extend(bucket)
+        return result
+
+    def candidates_for_age(self, age: int) -> List[Dict]:
+        """最小年龄不超过age、且最大年龄不低于age的项目"""
+        return [p for p in self.by_min_age.range(None, (age, MAX_KEY)) if parse_age_limit(p["age_limit"])[1] >= age]
+
+    def candidates_for_time(self, start: int, end: int) -> List[Dict]:
+        """与 [start, end) 分钟区间有重叠的项目"""
+        return [p for p in self.by_start_time.range(None, (end - 1, MAX_KEY)) if parse_time_range(p["time"])[1] > start]
+
+    def candidates_within(self, latitude: float, longitude: float, radius_km: float,
+                          accept: Optional[Callable[[Dict], bool]] = None) -> List[Tuple[float, Dict]]:
+        """半径radius_km公里内带坐标的项目，返回按距离排序的 (距离, 项目)"""
+        return geo_index.within(self.by_cell, latitude, longitude, radius_km, accept)
+
+    def text_scores(self, terms: Iterable[str], projects: Optional[List[Dict]] = None) -> Dict[int, float]:
+        """查询词的BM25得分 {项目id: 得分}；给出projects时只在这些项目中打分"""
+        project_ids = {p["id"] for p in projects} if projects is not None else None
+        return self.text_index.score(terms, project_ids)
+
+    def nearest(self, latitude: float, longitude: float, k: int,
+                accept: Optional[Callable[[Dict], bool]] = None) -> List[Tuple[float, Dict]]:
+        """距离最近的k个满足accept的项目"""
+        return geo_index.nearest(self.by_cell, latitude, longitude, k, accept)
+
+
+def group_by_day(projects: List[Dict]) -> List[Dict]:
+    """把项目列表按日期分组为 [{"date", "weekday", "projects"}]，组内保持原有顺序(如按距离排序)"""
+    groups = {}
+    for project in projects:
+        group = groups.get(project["date"])
+        if group is None:
+            group = groups[project["date"]] = {
+                "date": project["date"],
+                "weekday": ordinal_weekday(date_ordinal(project["date"])),
+                "projects": []
+            }
+        group["projects"].append(project)
+    return [groups[day] for day in sorted(groups)]
+
+
+class ChangeLog:
+    """按版本号单调递增的目录变更日志，只保留最近 max_entries 条；追加和读取在同一把锁内"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def append(self, version: int, op: str, project_id: int, project: Optional[Dict] = None, **extra):
+        entry = {
+            "version": version,
+            "op": op,
+            "project_id": project_id,
+            "project": project,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        entry.update(extra)
+        with self._lock:
+            self.entries.append(entry)
+        return entry
+
+    def since(self, version: int) -> Tuple[List[Dict], bool]:
+        """
+        返回版本号大于version的变更，以及这些变更是否完整。
+        若所需的变更已被淘汰，complete为False，调用方应重新拉取全量目录。
+        """
+        # 不加锁复制deque时，并发的append会让迭代抛出 RuntimeError
+        with self._lock:
+            entries = list(self.entries)
+        changes = []
+        for entry in reversed(entries):
+            if entry["version"] <= version:
+                break
+            changes.append(entry)
+        changes.reverse()
+        complete = not entries or entries[0]["version"] <= version + 1
+        return changes, complete
+
+
+def benchmark(projects_per_day: int = 40, repeat: int = 20):
+    """一年的目录数据上，对比按天逐个查询与一次区间查询取整月项目的耗时"""
+    import time
+    import random
+    from datetime import timedelta
+
+    rng = random.Random(0)
+    first_day = date(2026, 1, 1)
+    types = ["环保", "教育", "社区服务", "医疗", "动物保护"]
+    projects = []
+    for offset in range(365):
+        day = (first_day + timedelta(days=offset)).isoformat()
+        for _ in range(projects_per_day):
+            projects.append({"id": len(projects) + 1, "type": rng.choice(types), "date": day,
+                             "time": "08:00-12:00", "age_limit": "12-60", "max_participants": 20})
+    snapshot = CatalogueSnapshot.build(projects)
+    month = [(date(2026, 6, 1) + timedelta(days=i)).isoformat() for i in range(30)]
+
+    def timed(label, query):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            count = len(query())
+        print(f"{label:<28}{(time.perf_counter() - start) * 1000 / repeat:9.3f}ms  {count:>6}条")
+
+    print(f"目录 {len(projects)} 个项目，查询2026年6月整月:")
+    timed("逐天全表扫描(30次请求)", lambda: [p for day in month for p in projects if p["date"] == day])
+    timed("逐天索引查询(30次请求)", lambda: [p for day in month for p in snapshot.candidates_for_date(day)])
+    timed("一次区间查询", lambda: snapshot.candidates_for_dates(month[0], month[-1]))
+    timed("区间查询+周末筛选", lambda: snapshot.candidates_for_dates(month[0], month[-1], (5, 6)))
+    timed("区间查询+类型", lambda: snapshot.candidates_for_dates(month[0], month[-1], activity_type="环保"))
+    timed("区间查询+按天分组", lambda: group_by_day(snapshot.candidates_for_dates(month[0], month[-1])))
+
+    # 写入只复制块表和被改动的块，比整表重建小约64倍
+    project = projects[len(projects) // 2]
+    changed = dict(project, age_limit="16-60", time="09:00-12:00")
+    start = time.perf_counter()
+    for _ in range(repeat * 10):
+        snapshot.with_project(1, changed, project)
+    print(f"{'修改一个项目(年龄、时间)':<28}{(time.perf_counter() - start) * 100 / repeat:9.3f}ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+from functools import lru_cache
+from typing import Optional, Union, Pattern
+
+_DIGITS = {
+    '零': 0, '〇': 0, '一': 1, '二': 2, '两': 2, '俩': 2, '三': 3, '四': 4,
+    '五': 5, '六': 6, '七': 7, '八': 8, '九': 9
+}
+_UNITS = {'十': 10, '百': 100, '千': 1000}
+_FULLWIDTH_DIGITS = str.maketrans('０１２３４５６７８９', '0123456789')
+
+_NUMERAL_CHARS = '0-9０-９' + ''.join(_DIGITS) + ''.join(_UNITS) + '万'
+
+# 一个数词: 阿拉伯数字、全角数字和中文数字可以混写(如 "2十")，末尾可带 "半"；单独的 "半" 也算
+NUMERAL = f'(?:[{_NUMERAL_CHARS}]+半?|半)'
+
+
+@lru_cache(maxsize=4096)
+def parse_numeral(token: str, year: bool = False) -> Optional[Union[int, float]]:
+    """
+    把一个数词转换成数值，例如 十六→16、二十五→25、一百零五→105、2十→20、三岁半中的 "三半"→3.5。
+    相邻的两个中文数字是约数(五六→5、两三→2、三四十→30、十五六→15)，取下限；
+    其他相邻的中文数字只在 year 为 True 时逐位拼接(二〇二六→2026)，否则和单位顺序不合法(如 "十百")一样返回None。
+    """
+    token = token.translate(_FULLWIDTH_DIGITS)
+    half = token.endswith('半')
+    if half:
+        token = token[:-1]
+    total = 0
+    section = 0
+    number = 0
+    last_unit = 10000
+    # 前一个字是中文数字时的取值；单位后面的 "零" 只是占位，不算
+    previous = None
+    approximate = False
+    for ch in token:
+        if '0' <= ch <= '9':
+            number = number * 10 + ord(ch) - 48
+            previous = None
+        elif ch in _DIGITS:
+            digit = _DIGITS[ch]
+            if year or previous is None:
+                number = number * 10 + digit
+            elif digit == previous + 1 and not approximate:
+                approximate = True
+            else:
+                return None
+            previous = None if digit == 0 and number == 0 and (total or section) else digit
+        elif ch in _UNITS:
+            unit = _UNITS[ch]
+            if unit >= last_unit:
+                return None
+            section += (number or (1 if unit == 10 else 0)) * unit
+            number = 0
+            last_unit = unit
+            previous = None
+        elif ch == '万':
+            if total:
+                return None
+            total = (section + number or 1) * 10000
+            section = number = 0
+            last_unit = 10000
+            previous = None
+        else:
+            return None
+    value = total + section + number
+    if half:
+        return value + 0.5
+    return value
+
+
+def compile_quantity(pattern: str) -> Pattern:
+    """编译带数词的模式，模式中的 {n} 会被替换成捕获数词的分组"""
+    return re.compile(pattern.replace('{n}', f'({NUMERAL})'))
+
+
+def first_quantity(pattern: Pattern, text: str, minimum: int = 1) -> Optional[int]:
+    """按出现顺序返回第一个取值不小于minimum的数词(取整)，一次扫描完成"""
+    for match in pattern.finditer(text):
+        token = next(group for group in match.groups() if group)
+        value = parse_numeral(token)
+        if value is not None and value >= minimum:
+            return int(value)
+    return None
+
+
+CORRECTNESS_CASES = [
+    ("十", 10), ("十六", 16), ("二十", 20), ("二十五", 25), ("一百", 100), ("一百零五", 105), ("一万零五百", 10500),
+    ("一百二十", 120), ("三千零一", 3001), ("一万二千", 12000), ("两", 2), ("俩", 2), ("半", 0.5),
+    ("三半", 3.5), ("2十", 20), ("2十5", 25), ("１６", 16), ("16", 16), ("十百", None),
+    # 相邻的中文数字是约数，取下限；不构成约数的数字串只在年份中拼接
+    ("五六", 5), ("两三", 2), ("三四", 3), ("一两", 1), ("一二十", 10), ("三四十", 30), ("十五六", 15),
+    ("二十五六", 25), ("二〇二六", None), ("五五", None), ("五六七", None),
+]
+YEAR_CASES = [("二〇二六", 2026), ("二零二七", 2027), ("2026", 2026)]
+
+
+def benchmark(iterations: int = 20000):
+    """比较旧的逐项子串匹配与编译后的数词模式抽取年龄的耗时；正确性见 tests/test_chinese_numerals.py"""
+    import time
+    from volunteer_nlp_system import VolunteerNLPEngine
+
+    engine = VolunteerNLPEngine()
+    texts = ["我十六岁，想参加献血宣传", "我和我朋友都是十八岁", "我今年２５岁", "年龄30，想去图书馆", "我三岁半",
+             "二十人的团队想去养老院", "我们三个人想做环保", "我们俩人可以去孤儿院", "孩子们三四岁"]
+
+    number_map = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9,
+                  '十': 10, '两': 2, '俩': 2}
+
+    def legacy_age(text):
+        for chinese_num, arabic_num in number_map.items():
+            if f'{chinese_num}岁' in text or f'{chinese_num}周岁' in text:
+                return arabic_num
+        return None
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        legacy_age(texts[i % len(texts)])
+    legacy = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(iterations):
+        engine.extract_age(texts[i % len(texts)])
+    compiled = time.perf_counter() - start
+    print(f"年龄抽取 {iterations} 次: 旧的子串循环 {legacy * 1e6 / iterations:.2f}us/次, "
+          f"编译后的数词模式 {compiled * 1e6 / iterations:.2f}us/次")
+    print(f"旧写法的结果: 十六岁→{legacy_age('我十六岁')}, 十八岁→{legacy_age('都是十八岁')}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -5,6 +5,11 @@ class Config:
     LLM_MODEL_ENDPOINT = os.getenv('LLM_MODEL_ENDPOINT', 'http://localhost:8000/v1/chat/completions')
     LLM_MODEL_TYPE = os.getenv('LLM_MODEL_TYPE', 'qwen-6b-chat')
     LLM_TIMEOUT = int(os.getenv('LLM_TIMEOUT', '30'))
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'http')
+    LLM_LOCAL_MODEL_PATH = os.getenv('LLM_LOCAL_MODEL_PATH', '')
+    LLM_DEVICE = os.getenv('LLM_DEVICE', 'cpu')
+    LLM_BATCH_SIZE = int(os.getenv('LLM_BATCH_SIZE', '8'))
+    LLM_BATCH_WAIT_MS = float(os.getenv('LLM_BATCH_WAIT_MS', '5'))
     FALLBACK_TO_RULES = os.getenv('FALLBACK_TO_RULES', 'true').lower() == 'true'
     SUPPORTED_MODELS = {
         'qwen-6b-chat': {
@@ -15,6 +20,39 @@ class Config:
         },
     }
 
+    SESSION_TTL = float(os.getenv('SESSION_TTL', '600'))
+    SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', '10000'))
+    RESERVATION_HOLD_TTL = float(os.getenv('RESERVATION_HOLD_TTL', '300'))
+    RESERVATION_LOCK_STRIPES = int(os.getenv('RESERVATION_LOCK_STRIPES', '64'))
+    RULES_PATH = os.getenv('RULES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extraction_rules.json'))
+    RULES_RELOAD_INTERVAL = float(os.getenv('RULES_RELOAD_INTERVAL', '5'))
+    GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.json'))
+    GEO_NEARBY_RADIUS_KM = float(os.getenv('GEO_NEARBY_RADIUS_KM', '5'))
+    GEO_NEAREST_K = int(os.getenv('GEO_NEAREST_K', '5'))
+    GEO_INDEX_THRESHOLD = int(os.getenv('GEO_INDEX_THRESHOLD', '256'))
+    RESPONSE_ENCODER = os.getenv('RESPONSE_ENCODER', 'utf8')
+    RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'on')
+    RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', '1024'))
+    QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '4096'))
+    QUERY_CACHE_PREWARM_DAYS = int(os.getenv('QUERY_CACHE_PREWARM_DAYS', '14'))
+    QUERY_CACHE_PREWARM_TYPES = int(os.getenv('QUERY_CACHE_PREWARM_TYPES', '3'))
+    PARSE_CACHE_BACKEND = os.getenv('PARSE_CACHE_BACKEND', 'memory')
+    PARSE_CACHE_SIZE = int(os.getenv('PARSE_CACHE_SIZE', '4096'))
+    PARSE_CACHE_TTL = float(os.getenv('PARSE_CACHE_TTL', '3600'))
+    PARSE_CACHE_PATH = os.getenv('PARSE_CACHE_PATH', '')
+    PARSE_CACHE_SLOT_BYTES = int(os.getenv('PARSE_CACHE_SLOT_BYTES', '1024'))
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '8'))
+    # 默认不按客户端限速: 部署在路由/反向代理之后时所有请求的来源地址都是代理，按IP限速会让全部用户共用一个桶
+    ADMISSION_RATE = float(os.getenv('ADMISSION_RATE', '0'))
+    ADMISSION_BURST = float(os.getenv('ADMISSION_BURST', '20'))
+    ADMISSION_CLIENT_PRIORITIES = os.getenv('ADMISSION_CLIENT_PRIORITIES', '')
+    ADMISSION_TRUST_PROXY = os.getenv('ADMISSION_TRUST_PROXY', 'false').lower() == 'true'
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+    PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', '10'))
+    PROFILER_MAX_SECONDS = float(os.getenv('PROFILER_MAX_SECONDS', '60'))
+    PROFILER_KEEP_PROFILES = int(os.getenv('PROFILER_KEEP_PROFILES', '16'))
+
     LLM_MAX_RESPONSE_TIME = 5.0  
     LLM_MAX_CONCURRENT = 10
     
@@ -27,7 +65,13 @@ class Config:
         errors = []
         
         if cls.USE_LLM:
-            if not cls.LLM_MODEL_ENDPOINT.startswith(('http://', 'https://')):
+            if cls.LLM_BACKEND not in ('http', 'local'):
+                errors.append("LLM_BACKEND必须是http或local")
+            
+            if cls.LLM_BACKEND == 'local' and not cls.LLM_LOCAL_MODEL_PATH:
+                errors.append("使用本地模型后端时必须设置LLM_LOCAL_MODEL_PATH")
+            
+            if cls.LLM_BACKEND == 'http' and not cls.LLM_MODEL_ENDPOINT.startswith(('http://', 'https://')):
                 errors.append("LLM_MODEL_ENDPOINT必须是有效的URL")
             
             if cls.LLM_TIMEOUT < 1 or cls.LLM_TIMEOUT > 300:
@@ -39,7 +83,9 @@ class Config:
     def print_config(cls):
         print("当前系统配置:")
         print(f"  USE_LLM: {cls.USE_LLM}")
+        print(f"  LLM_BACKEND: {cls.LLM_BACKEND}")
         print(f"  LLM_MODEL_ENDPOINT: {cls.LLM_MODEL_ENDPOINT}")
+        print(f"  LLM_LOCAL_MODEL_PATH: {cls.LLM_LOCAL_MODEL_PATH}")
         print(f"  LLM_MODEL_TYPE: {cls.LLM_MODEL_TYPE}")
         print(f"  FALLBACK_TO_RULES: {cls.FALLBACK_TO_RULES}")
         print(f"  LLM_TIMEOUT: {cls.LLM_TIMEOUT}秒")
\ No newline at end of file
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则引擎 / LLM引擎 / 混合引擎 的准确率与延迟评测
+
+    python evaluate_engines.py --corpus eval_corpus.jsonl --min-f1 0.8
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Callable
+
+from volunteer_nlp_system import VolunteerNLPEngine
+from llm_nlp_engine import LLMVolunteerNLPEngine
+from hybrid_nlp_engine import HybridNLPEngine
+from stub_llm import StubChatModel
+
+logger = logging.getLogger(__name__)
+
+SLOTS = ["年龄", "人数", "日期", "时间", "活动类型"]
+DATE_QUESTION = "请问您希望参加活动的具体日期是？"
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    corpus = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                corpus.append(json.loads(line))
+    return corpus
+
+
+def resolve_gold_date(spec: Optional[str], today) -> Optional[str]:
+    """金标日期写作 "+N"(相对今天) 或 "MM-DD"(今年未到则今年，否则明年)"""
+    if not spec:
+        return None
+    if spec.startswith('+'):
+        return (today + timedelta(days=int(spec[1:]))).strftime('%Y-%m-%d')
+    month, day = (int(part) for part in spec.split('-'))
+    target = datetime(today.year, month, day).date()
+    if target < today:
+        target = datetime(today.year + 1, month, day).date()
+    return target.strftime('%Y-%m-%d')
+
+
+def normalize_prediction(result: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉引擎填充的默认值，只保留真正从文本中抽取到的槽位"""
+    predicted = {slot: result.get(slot) for slot in SLOTS}
+    if predicted["年龄"] == "不限":
+        predicted["年龄"] = None
+    if predicted["时间"] == "09:00-17:00":
+        predicted["时间"] = None
+    if predicted["活动类型"] == "综合":
+        predicted["活动类型"] = None
+    if DATE_QUESTION in result.get("验证结果", {}).get("questions", []):
+        predicted["日期"] = None
+    return predicted
+
+
+def gold_answers(corpus: List[Dict], today) -> Dict[str, Dict[str, Any]]:
+    """桩模型的回答来源: 输入文本 → 金标槽位(日期解析成 YYYY-MM-DD)，与规则引擎的抽取结果无关"""
+    answers = {}
+    for case in corpus:
+        gold = dict(case["gold"])
+        gold["日期"] = resolve_gold_date(gold.get("日期"), today)
+        answers[case["text"]] = gold
+    return answers
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def evaluate(name: str, process: Callable[[str], Dict], corpus: List[Dict],
+             stub: Optional[StubChatModel] = None) -> Dict[str, Any]:
+    today = datetime.now().date()
+    counts = {slot: {"tp": 0, "fp": 0, "fn": 0} for slot in SLOTS}
+    latencies = []
+    errors = []
+    if stub:
+        stub.reset_stats()
+
+    for case in corpus:
+        text = case["text"]
+        gold = dict(case["gold"])
+        gold["日期"] = resolve_gold_date(gold.get("日期"), today)
+
+        start = time.perf_counter()
+        result = process(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        predicted = normalize_prediction(result)
+        for slot in SLOTS:
+            expected = gold.get(slot)
+            actual = predicted[slot]
+            if actual is not None and actual == expected:
+                counts[slot]["tp"] += 1
+            else:
+                if actual is not None:
+                    counts[slot]["fp"] += 1
+                if expected is not None:
+                    counts[slot]["fn"] += 1
+                if actual != expected:
+                    errors.append({"text": text, "slot": slot, "expected": expected, "actual": actual})
+
+    slots = {}
+    for slot, c in counts.items():
+        precision = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else 1.0
+        recall = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else 1.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        slots[slot] = {
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4)
+        }
+
+    return {
+        "engine": name,
+        "cases": len(corpus),
+        "slots": slots,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 50), 3),
+            "p95": round(_percentile(latencies, 95), 3),
+            "max": round(max(latencies), 3) if latencies else 0.0
+        },
+        "llm_calls": stub.calls if stub else 0,
+        "llm_injected": dict(stub.injected) if stub else {},
+        "llm_calls_per_request": round(stub.calls / len(corpus), 3) if stub and corpus else 0.0,
+        "errors": errors
+    }
+
+
+def build_engines(stub: StubChatModel, prefill: bool = True) -> Dict[str, Callable[[str], Dict]]:
+    rule_engine = VolunteerNLPEngine()
+
+    llm_engine = LLMVolunteerNLPEngine(model_type="local", backend=stub, prefill_slots=prefill)
+
+    hybrid_engine = HybridNLPEngine()
+    hybrid_engine.use_llm = True
+    hybrid_engine.llm_engine = llm_engine
+
+    return {
+        "rule": rule_engine.process_natural_language,
+        "llm": llm_engine.process_natural_language,
+        "hybrid": hybrid_engine.process_natural_language
+    }
+
+
+def check_quality_gate(reports: List[Dict], min_f1: Optional[float],
+                       max_p95_ms: Optional[float]) -> List[str]:
+    failures = []
+    for report in reports:
+        if min_f1 is not None:
+            for slot, scores in report["slots"].items():
+                if scores["f1"] < min_f1:
+                    failures.append(f"{report['engine']}.{slot} F1={scores['f1']} < {min_f1}")
+        if max_p95_ms is not None and report["latency_ms"]["p95"] > max_p95_ms:
+            failures.append(f"{report['engine']} p95={report['latency_ms']['p95']}ms > {max_p95_ms}ms")
+    return failures
+
+
+def print_report(report: Dict[str, Any], show_errors: bool = False):
+    print(f"== {report['engine']} ({report['cases']}条) ==")
+    print(f"  {'槽位':<6}{'precision':>10}{'recall':>10}{'f1':>10}")
+    for slot, scores in report["slots"].items():
+        print(f"  {slot:<6}{scores['precision']:>10.3f}{scores['recall']:>10.3f}{scores['f1']:>10.3f}")
+    latency = report["latency_ms"]
+    print(f"  延迟(ms): mean={latency['mean']} p50={latency['p50']} p95={latency['p95']} max={latency['max']}")
+    print(f"  LLM调用: {report['llm_calls']} ({report['llm_calls_per_request']}/请求)"
+          + (f"，注入的噪声 {report['llm_injected']}" if report["llm_calls"] else ""))
+    if show_errors:
+        for error in report["errors"]:
+            print(f"    ✗ [{error['slot']}] 期望={error['expected']} 实际={error['actual']} | {error['text']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="引擎准确率与延迟评测")
+    parser.add_argument("--corpus", default="eval_corpus.jsonl", help="金标语料(JSONL)")
+    parser.add_argument("--engines", default="rule,llm,hybrid", help="逗号分隔: rule,llm,hybrid")
+    parser.add_argument("--min-f1", type=float, default=None, help="任一槽位F1低于该值则失败")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="p95延迟超过该值则失败")
+    parser.add_argument("--json", dest="json_output", default=None, help="把报告写入JSON文件")
+    parser.add_argument("--show-errors", action="store_true", help="打印每条错例")
+    parser.add_argument("--llm-omission", type=float, default=0.1, help="桩模型每个槽位漏答的比例")
+    parser.add_argument("--llm-error", type=float, default=0.05, help="桩模型每个槽位答错的比例")
+    parser.add_argument("--llm-malformed", type=float, default=0.05, help="桩模型整条回复被截断的比例")
+    parser.add_argument("--seed", type=int, default=0, help="桩模型噪声的随机种子")
+    parser.add_argument("--no-prefill", action="store_true", help="不把规则结果预填进提示词，所有槽位都由模型回答")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    corpus = load_corpus(args.corpus)
+    stub = StubChatModel(answers=gold_answers(corpus, datetime.now().date()), omission_rate=args.llm_omission,
+                         error_rate=args.llm_error, malformed_rate=args.llm_malformed, seed=args.seed)
+    engines = build_engines(stub, prefill=not args.no_prefill)
+
+    reports = []
+    for name in args.engines.split(','):
+        name = name.strip()
+        if name not in engines:
+            parser.error(f"未知引擎: {name}")
+        report = evaluate(name, engines[name], corpus, stub if name != "rule" else None)
+        print_report(report, args.show_errors)
+        reports.append(report)
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+    failures = check_quality_gate(reports, args.min_f1, args.max_p95_ms)
+    for failure in failures:
+        print(f"质量门禁未通过: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
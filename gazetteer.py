@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Tuple
+from config import Config
+
+# 按地名类型给出默认的搜索半径(公里)，用户没有说 "N公里以内" 时使用
+DEFAULT_RADIUS_KM = {"city": 30.0, "district": 8.0, "area": 5.0, "landmark": 3.0}
+
+
+class Place:
+    __slots__ = ("name", "kind", "latitude", "longitude")
+
+    def __init__(self, name: str, kind: str, latitude: float, longitude: float):
+        self.name = name
+        self.kind = kind
+        self.latitude = latitude
+        self.longitude = longitude
+
+    @property
+    def default_radius_km(self) -> float:
+        return DEFAULT_RADIUS_KM.get(self.kind, 5.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "kind": self.kind, "latitude": self.latitude, "longitude": self.longitude}
+
+
+class PlaceTrie:
+    """
+    紧凑的字符前缀树: 节点只是整数编号，所有边放在一个 (节点, 字符) -> 子节点 的字典里，
+    比逐层嵌套的字典省内存；扫描文本时从每个可能的首字符出发做最长匹配。
+    """
+
+    __slots__ = ("edges", "values", "first_chars", "size")
+
+    def __init__(self):
+        self.edges: Dict[Tuple[int, str], int] = {}
+        self.values: Dict[int, Any] = {}
+        self.first_chars = set()
+        self.size = 1
+
+    def insert(self, word: str, value: Any):
+        node = 0
+        for ch in word:
+            child = self.edges.get((node, ch))
+            if child is None:
+                child = self.size
+                self.size += 1
+                self.edges[(node, ch)] = child
+            node = child
+        self.values[node] = value
+        self.first_chars.add(word[0])
+
+    def longest_match(self, text: str, start: int) -> Optional[Tuple[int, Any]]:
+        """从start开始能匹配到的最长词，返回 (结束位置, 值)"""
+        edges = self.edges
+        node = 0
+        found = None
+        for position in range(start, len(text)):
+            node = edges.get((node, text[position]))
+            if node is None:
+                break
+            if node in self.values:
+                found = (position + 1, self.values[node])
+        return found
+
+    def find_all(self, text: str) -> List[Tuple[int, int, Any]]:
+        """从左到右找出互不重叠的最长匹配，返回 [(开始, 结束, 值)]"""
+        matches = []
+        position = 0
+        first_chars = self.first_chars
+        while position < len(text):
+            if text[position] in first_chars:
+                found = self.longest_match(text, position)
+                if found:
+                    matches.append((position, found[0], found[1]))
+                    position = found[0]
+                    continue
+            position += 1
+        return matches
+
+
+class Gazetteer:
+    """本地地名表：名称和别名都指向同一个地点，完全离线"""
+
+    def __init__(self, places: List[Place], aliases: Optional[Dict[str, str]] = None):
+        self.places = {place.name: place for place in places}
+        self.trie = PlaceTrie()
+        for place in places:
+            self.trie.insert(place.name, place)
+        for alias, name in (aliases or {}).items():
+            self.trie.insert(alias, self.places[name])
+
+    @classmethod
+    def load(cls, path: str) -> "Gazetteer":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        places = []
+        aliases = {}
+        for entry in data["places"]:
+            places.append(Place(entry["name"], entry.get("kind", "landmark"),
+                                float(entry["latitude"]), float(entry["longitude"])))
+            for alias in entry.get("aliases", []):
+                aliases[alias] = entry["name"]
+        return cls(places, aliases)
+
+    def lookup(self, name: str) -> Optional[Place]:
+        place = self.places.get(name)
+        if place is None:
+            found = self.trie.longest_match(name, 0)
+            if found and found[0] == len(name):
+                place = found[1]
+        return place
+
+    def find(self, text: str) -> Optional[Place]:
+        """文本中第一个出现的地名，同一位置取最长的(如 "东湖社区公园" 而不是 "东湖")"""
+        matches = self.trie.find_all(text)
+        return matches[0][2] if matches else None
+
+    def __len__(self):
+        return len(self.places)
+
+
+@lru_cache(maxsize=4)
+def _load_cached(path: str) -> Gazetteer:
+    return Gazetteer.load(path)
+
+
+def load_gazetteer(path: Optional[str] = None) -> Gazetteer:
+    """每个进程每个文件只加载一次，默认使用 GAZETTEER_PATH 指向的随包地名表"""
+    return _load_cached(path or Config.GAZETTEER_PATH)
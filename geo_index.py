@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import math
+import heapq
+from typing import Dict, List, Tuple, Optional, Callable, Iterable
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# 网格边长(度)，约2.2公里；单元格的键是 (纬度格, 经度格)，按此排序后同一纬度行的单元格相邻
+CELL_DEGREES = 0.02
+
+
+def has_coordinates(project: Dict) -> bool:
+    return project.get("latitude") is not None and project.get("longitude") is not None
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def cell_key(latitude: float, longitude: float) -> Tuple[int, int]:
+    return math.floor(latitude / CELL_DEGREES), math.floor(longitude / CELL_DEGREES)
+
+
+def project_cell(project: Dict) -> Tuple[int, int]:
+    return cell_key(project["latitude"], project["longitude"])
+
+
+def cell_ranges(latitude: float, longitude: float, radius_km: float) -> Tuple[range, int, int]:
+    """覆盖以 (latitude, longitude) 为中心、radius_km 为半径的圆的单元格: (纬度格范围, 最小经度格, 最大经度格)"""
+    delta_lat = radius_km / KM_PER_DEGREE
+    # 靠近两极时经度方向的1度很短，限制一下避免除以0
+    delta_lon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    low_x, low_y = cell_key(latitude - delta_lat, longitude - delta_lon)
+    high_x, high_y = cell_key(latitude + delta_lat, longitude + delta_lon)
+    return range(low_x, high_x + 1), low_y, high_y
+
+
+def within(index, latitude: float, longitude: float, radius_km: float,
+           accept: Optional[Callable[[Dict], bool]] = None) -> List[Tuple[float, Dict]]:
+    """
+    index 为以 project_cell 为键的 BucketIndex。返回半径内的 (距离, 项目)，按距离排序。
+    每一行纬度格用二分查找切出经度格区间，只计算这些单元格里项目的距离。
+    """
+    rows, low_y, high_y = cell_ranges(latitude, longitude, radius_km)
+    if len(rows) * (high_y - low_y + 1) > index.key_count:
+        cells = index.items()
+    else:
+        cells = [item for x in rows for item in index.items((x, low_y), (x, high_y))]
+    found = []
+    for _, bucket in cells:
+        for project in bucket:
+            if accept is not None and not accept(project):
+                continue
+            distance = haversine_km(latitude, longitude, project["latitude"], project["longitude"])
+            if distance <= radius_km:
+                found.append((distance, project))
+    found.sort(key=lambda item: (item[0], item[1]["id"]))
+    return found
+
+
+def nearest(index, latitude: float, longitude: float, k: int,
+            accept: Optional[Callable[[Dict], bool]] = None,
+            max_radius_km: float = 2 * EARTH_RADIUS_KM) -> List[Tuple[float, Dict]]:
+    """
+    距离最近的k个项目。从一个单元格的半径开始，找不够k个就把半径翻倍；
+    半径r内的项目已经全部算过距离，所以半径内凑够k个时结果就是精确的。
+    """
+    radius = CELL_DEGREES * KM_PER_DEGREE
+    while True:
+        found = within(index, latitude, longitude, radius, accept)
+        if len(found) >= k or radius >= max_radius_km:
+            return found[:k]
+        radius *= 2
+
+
+def nearest_scan(projects: Iterable[Dict], latitude: float, longitude: float, k: int) -> List[Tuple[float, Dict]]:
+    """不用索引的最近k个，作为对照和小候选集时使用"""
+    scored = ((haversine_km(latitude, longitude, p["latitude"], p["longitude"]), p)
+              for p in projects if has_coordinates(p))
+    return heapq.nsmallest(k, scored, key=lambda item: (item[0], item[1]["id"]))
+
+
+def benchmark(count: int = 100000, repeat: int = 20):
+    """10万个随机分布在武汉市区的项目上，对比全表扫描与网格索引的半径查询和最近k个查询的耗时；结果一致性见 tests/test_geo_index.py"""
+    import time
+    import random
+    from catalogue_index import CatalogueSnapshot
+    from gazetteer import load_gazetteer
+
+    rng = random.Random(0)
+    projects = []
+    for project_id in range(1, count + 1):
+        projects.append({"id": project_id, "type": "环保", "date": "2026-06-01", "time": "08:00-12:00",
+                         "age_limit": "12-60", "max_participants": 20,
+                         "latitude": rng.uniform(30.35, 30.85), "longitude": rng.uniform(114.0, 114.6)})
+    start = time.perf_counter()
+    snapshot = CatalogueSnapshot.build(projects)
+    print(f"{count} 个项目，构建目录快照(含网格索引) {(time.perf_counter() - start) * 1000:.0f}ms, "
+          f"{snapshot.by_cell.key_count} 个单元格")
+
+    gazetteer = load_gazetteer()
+    centers = [gazetteer.lookup(name) for name in ("光谷", "黄鹤楼", "江汉路", "东湖", "汉口火车站")]
+
+    def scan_within(place, radius):
+        found = []
+        for p in projects:
+            distance = haversine_km(place.latitude, place.longitude, p["latitude"], p["longitude"])
+            if distance <= radius:
+                found.append((distance, p))
+        found.sort(key=lambda item: (item[0], item[1]["id"]))
+        return found
+
+    def timed(label, query):
+        start = time.perf_counter()
+        for i in range(repeat):
+            size = len(query(centers[i % len(centers)]))
+        print(f"{label:<24}{(time.perf_counter() - start) * 1000 / repeat:9.3f}ms  {size:>6}条")
+
+    timed("全表扫描 3公里内", lambda place: scan_within(place, 3))
+    timed("网格索引 3公里内", lambda place: snapshot.candidates_within(place.latitude, place.longitude, 3))
+    timed("全表扫描 最近10个", lambda place: nearest_scan(projects, place.latitude, place.longitude, 10))
+    timed("网格索引 最近10个", lambda place: snapshot.nearest(place.latitude, place.longitude, 10))
+
+    def from_text(place):
+        found = gazetteer.find(f"想去{place.name}附近做志愿者")
+        return snapshot.nearest(found.latitude, found.longitude, 10)
+
+    timed("地名查找+最近10个", from_text)
+
+
+if __name__ == "__main__":
+    benchmark()
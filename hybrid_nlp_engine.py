@@ -2,10 +2,15 @@
 # -*- coding: utf-8 -*-
 import os
 import logging
-from typing import Dict
-from datetime import datetime
-from llm_nlp_engine import LLMVolunteerNLPEngine
+from typing import Dict, Tuple, Callable
+from datetime import date
+from cache_backends import create_cache
+from text_normalizer import normalize_text
+from llm_nlp_engine import LLMVolunteerNLPEngine, FALLBACK_FLAG
+from model_backends import create_backend
 from volunteer_nlp_system import VolunteerNLPEngine
+from rule_set import RuleSet
+from parse_result import ParseResult
 
 logger = logging.getLogger(__name__)
 
@@ -14,13 +19,15 @@ class HybridNLPEngine:
         self.use_llm = os.getenv('USE_LLM', 'false').lower() == 'true'
         self.llm_engine = None
         self.rule_engine = None
+        self.parse_cache = create_cache()
         self._initialize_engines()
     
     def _initialize_engines(self):
         try:
             if self.use_llm:
-                self.llm_engine = LLMVolunteerNLPEngine(model_type="local")
-                logger.info("已启用LLM引擎")
+                backend = create_backend()
+                self.llm_engine = LLMVolunteerNLPEngine(model_type="local", backend=backend)
+                logger.info(f"已启用LLM引擎，模型后端: {backend.name}")
             else:
                 logger.info("使用规则引擎")
             
@@ -30,28 +37,86 @@ class HybridNLPEngine:
             logger.warning(f"初始化LLM引擎失败: {e}，使用规则引擎")
             self.use_llm = False
     
-    def process_natural_language(self, text: str) -> Dict:
+    def _cached_slots(self, kind: str, text: str, parse: Callable[[str], Dict], rules: RuleSet) -> Dict:
+        """
+        按 (引擎, 规则内容哈希, 当天日期, 规范化后的输入) 缓存抽取出的槽位；相对日期按当天解析，所以键里带上日期，
+        规则热更新后旧条目自然不再命中，与规则文件里的 version 有没有递增无关。只有全角/繁体/空白/emoji不同的输入共用一个条目，传给引擎的也是规范化后的文本。
+        大模型调用失败时的规则回退结果不缓存，模型恢复后同样的输入会重新调用模型。
+        """
+        text = normalize_text(text)
+        if self.parse_cache is None:
+            return parse(text)
+        key = f"{kind}|{rules.digest}|{date.today().isoformat()}|{text}"
+        slots = self.parse_cache.get(key)
+        if slots is None:
+            slots = parse(text)
+            if not slots.get(FALLBACK_FLAG):
+                self.parse_cache.set(key, slots)
+        return dict(slots)
+    
+    def _parse(self, text: str, allow_llm: bool = True) -> Tuple[ParseResult, Dict]:
+        """抽取槽位并统一经过规则引擎的 build_result，两种模式都返回带验证结果的 ParseResult"""
+        # 整个请求只取一次规则集，缓存键、抽取和 build_result 用的是同一个版本
+        rules = self.rule_engine.rules.current
+        if allow_llm and self.use_llm and self.llm_engine:
+            slots = self._cached_slots("llm", text, self.llm_engine.process_natural_language, rules)
+            engine_type = "规则(LLM回退)" if slots.pop(FALLBACK_FLAG, False) else "LLM"
+        else:
+            slots = self._cached_slots("rule", text, lambda normalized: self.rule_engine.extract_slots(
+                normalized, rules=rules), rules)
+            engine_type = "规则"
+        result = self.rule_engine.build_result(text, slots, rules=rules)
+        result.engine_type = engine_type
+        return result, slots
+    
+    def process_natural_language(self, text: str) -> ParseResult:
         try:
-            if self.use_llm and self.llm_engine:
-                result = self.llm_engine.process_natural_language(text)
-                result["引擎类型"] = "LLM"
-                result["原始输入"] = text
-                result["处理时间"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                result = self.rule_engine.process_natural_language(text)
-                result["引擎类型"] = "规则"
-            
-            return result
+            return self._parse(text)[0]
             
         except Exception as e:
             logger.error(f"处理失败: {e}")
             return self.rule_engine.process_natural_language(text)
     
-    def generate_database_query(self, processed_data: Dict) -> Dict:
-        if self.use_llm and self.llm_engine:
-            return self.llm_engine.generate_database_query(processed_data)
-        else:
-            return self.rule_engine.generate_database_query(processed_data)
+    def start_session(self, text: str, allow_llm: bool = True) -> Tuple[ParseResult, Dict]:
+        """完整解析首轮输入，返回 (处理结果, 会话状态)；allow_llm 为 False 时(过载降级)只用规则引擎"""
+        result, slots = self._parse(text, allow_llm)
+        state = {
+            "text": text,
+            "slots": slots,
+            "missing_slots": result.validation.missing_slots,
+            "confirmed_slots": []
+        }
+        return result, state
+    
+    def continue_session(self, state: Dict, answer: str, allow_llm: bool = True) -> Tuple[ParseResult, Dict]:
+        """只针对缺失槽位解析追问的回答，不重新解析之前的输入"""
+        missing = state["missing_slots"]
+        rules = self.rule_engine.rules.current
+        slots = self.rule_engine.merge_follow_up(state["slots"], answer, missing, rules)
+        engine_type = "规则"
+        unresolved = [slot for slot in missing if slots.get(slot) is None]
+        if unresolved and allow_llm and self.use_llm and self.llm_engine:
+            llm_slots = self.llm_engine.process_natural_language(answer)
+            for slot in unresolved:
+                if llm_slots.get(slot) is not None:
+                    slots[slot] = llm_slots[slot]
+            engine_type = "规则(LLM回退)" if llm_slots.get(FALLBACK_FLAG) else "LLM"
+        confirmed = list(state["confirmed_slots"])
+        if "人数" in missing:
+            confirmed.append("人数")
+        text = f"{state['text']}，{answer}"
+        result = self.rule_engine.build_result(text, slots, confirmed, rules)
+        result.engine_type = engine_type
+        new_state = {
+            "text": text,
+            "slots": slots,
+            "missing_slots": result.validation.missing_slots,
+            "confirmed_slots": confirmed
+        }
+        return result, new_state
+    
+    def generate_database_query(self, processed_data: ParseResult) -> Dict:
+        return self.rule_engine.generate_database_query(processed_data)
     
     def get_engine_info(self) -> Dict:
         return {
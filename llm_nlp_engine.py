@@ -4,120 +4,141 @@ import json
 import logging
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
-import requests
+from llm_response_parser import default_parser
+from prompt_templates import SLOT_NAMES, build_extraction_prompt, response_token_budget, estimate_tokens
+from model_backends import ModelBackend, HTTPChatBackend
+from rule_set import RuleSet, RuleStore, load_rules
 
 logger = logging.getLogger(__name__)
 
+# 大模型调用失败、改用规则结果时加在槽位中的标记；调用方据此统计回退，也不会缓存这样的结果
+FALLBACK_FLAG = "规则回退"
+
 class LLMVolunteerNLPEngine:
-    def __init__(self, model_type: str = "local", model_endpoint: str = None):
+    def __init__(self, model_type: str = "local", model_endpoint: str = None, prefill_slots: bool = True,
+                 backend: Optional[ModelBackend] = None, rules: Optional[RuleStore] = None):
         """
         Args:
             model_type: "local" (本地模型) 或 "api" (云端API)
             model_endpoint: 模型服务地址
+            prefill_slots: 是否把规则引擎已确定的槽位预填进提示词，只让模型补全不确定的槽位
+            backend: 模型后端，默认通过HTTP调用model_endpoint
+            rules: 规则文件，人数上限、时间段和活动类型的映射表从中读取
         """
+        self.prefill_slots = prefill_slots
+        self._rule_engine = None
+        self.response_parser = default_parser
+        self.prompt_stats = {"calls": 0, "skipped": 0, "prompt_tokens": 0, "max_tokens": 0, "fallbacks": 0}
         self.model_type = model_type
         self.model_endpoint = model_endpoint or "http://localhost:8000/v1/chat/completions"
+        self.backend = backend or HTTPChatBackend(self.model_endpoint)
         self.current_year = datetime.now().year
         self.current_date = datetime.now().date()
-        self.max_future_days = 365
-        self.max_people_count = 50
-        self.activity_mapping = {
-            "环保": ["环保", "环境保护", "垃圾分类", "植树", "绿化", "清洁", "捡垃圾", "保护地球", "绿色", "生态", "可持续发展", "低碳", "节能"],
-            "教育": ["教育", "教学", "辅导", "支教", "培训", "学习", "读书", "知识", "图书馆"],
-            "社区服务": ["社区", "敬老院", "养老院", "孤儿院", "福利", "关爱", "陪伴", "帮助", "服务", "志愿", "公益"],
-            "医疗": ["医疗", "医院", "健康", "献血", "义诊", "救助", "护理"],
-            "动物保护": ["动物", "流浪动物", "救助", "宠物", "保护", "关爱动物"]
-        }
-        
-    def _build_prompt(self, text: str) -> str:
-        prompt = f"""
-        你是一个志愿活动信息提取专家，请从以下用户输入中提取关键信息，并以JSON格式返回。
-        
-        用户输入：{text}
+        self.rules = rules or load_rules()
         
-        需要提取的信息：
-        1. 年龄：用户的年龄（数字，如果没有则返回null）
-        2. 人数：参与活动的总人数（数字，默认为1）
-        3. 日期：希望参加活动的具体日期（格式：YYYY-MM-DD，如果没有则返回null）
-        4. 时间：希望参加活动的具体时间段（如"上午"、"下午"、"09:00-12:00"等，如果没有则返回null）
-        5. 活动类型：希望参加的活动类型（如"环保"、"教育"、"社区服务"、"医疗"、"动物保护"等，如果没有则返回"综合"）
-        
-        请严格按照以下JSON格式返回：
-        {{
-            "年龄": 数字或null,
-            "人数": 数字,
-            "日期": "YYYY-MM-DD"或null,
-            "时间": "时间段字符串"或null,
-            "活动类型": "活动类型字符串"
-        }}
-        
-        注意：
-        - 如果用户说"我和朋友"，人数应该是2
-        - 如果用户说"4月3号"，假设年份是当前年份，如果日期已过则使用下一年
-        - 时间段的表达要标准化，如"上午"→"08:00-12:00"，"下午"→"14:00-18:00"
-        - 活动类型要从预定义类型中选择最接近的
-        """
-        return prompt.strip()
+    def _build_prompt(self, text: str, known: Optional[Dict[str, Any]] = None,
+                      slots: Optional[List[str]] = None) -> str:
+        return build_extraction_prompt(text, self.current_date.strftime('%Y-%m-%d'), known, slots)
+    
+    def _request_completion(self, prompt: str, max_tokens: int = 200) -> str:
+        return self.backend.complete(prompt, max_tokens)
     
-    def _call_local_model(self, prompt: str) -> Dict[str, Any]:
+    def _call_local_model(self, prompt: str, max_tokens: int = 200,
+                          slots: Optional[List[str]] = None) -> Dict[str, Any]:
         try:
-            headers = {"Content-Type": "application/json"}
-            payload = {
-                "model": "qwen-6b-chat",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.1,
-                "max_tokens": 200
-            }
-            
-            response = requests.post(self.model_endpoint, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            content = result["choices"][0]["message"]["content"]
-            import re
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            else:
-                return {}
+            content = self._request_completion(prompt, max_tokens)
+            return self.response_parser.parse(content, slots)
                 
         except Exception as e:
             logger.error(f"调用本地模型失败: {e}")
             return {}
     
-    def _fallback_rule_based(self, text: str) -> Dict[str, Any]:
-        from volunteer_nlp_system import VolunteerNLPEngine
-        fallback_engine = VolunteerNLPEngine()
-        
-        return {
-            "年龄": fallback_engine.extract_age(text),
-            "人数": fallback_engine.extract_people_count(text),
-            "日期": fallback_engine.extract_date(text),
-            "时间": fallback_engine.extract_time_range(text),
-            "活动类型": fallback_engine.extract_activity_type(text)
-        }
+    def _get_rule_engine(self):
+        if self._rule_engine is None:
+            from volunteer_nlp_system import VolunteerNLPEngine
+            self._rule_engine = VolunteerNLPEngine(self.rules)
+        return self._rule_engine
+    
+    def _fallback_rule_based(self, text: str, rules: Optional[RuleSet] = None) -> Dict[str, Any]:
+        return self._get_rule_engine().extract_slots(text, rules=rules)
+    
+    # 规则引擎对这些槽位的默认值，等于默认值说明规则没有抽取到
+    RULE_DEFAULTS = {"人数": 1, "活动类型": "综合"}
+    
+    def _known_slots(self, rule_slots: Dict[str, Any]) -> Dict[str, Any]:
+        """规则引擎已经明确抽取到、模型本来要回答的槽位，直接预填给模型，不再让模型重复判断"""
+        known = {}
+        for slot in SLOT_NAMES:
+            value = rule_slots.get(slot)
+            if value is not None and value != self.RULE_DEFAULTS.get(slot):
+                known[slot] = value
+        return known
+    
+    @staticmethod
+    def _merge_rule_only_slots(result: Dict[str, Any], rule_slots: Dict[str, Any]) -> Dict[str, Any]:
+        """模型只回答 SLOT_NAMES 中的槽位，结束日期、星期、地点、距离、关键词沿用规则引擎的结果"""
+        for slot, value in rule_slots.items():
+            if slot in SLOT_NAMES:
+                continue
+            if slot in ("结束日期", "星期") and result.get("日期") != rule_slots.get("日期"):
+                # 日期区间以规则抽取的起始日期为准，模型给出的日期不同时不能沿用
+                value = None
+            result[slot] = value
+        return result
     
     def process_natural_language(self, text: str) -> Dict[str, Any]:
+        fallback = False
+        # 整个请求只取一次规则集，规则抽取和结果标准化用的是同一个版本
+        rules = self.rules.current
+        try:
+            rule_slots = self._fallback_rule_based(text, rules)
+        except Exception as e:
+            # 规则抽取失败时所有槽位按未抽取到处理，仍交给模型回答；模型也失败时返回这组默认值
+            logger.error(f"规则抽取失败: {e}")
+            rule_slots = {slot: self.RULE_DEFAULTS.get(slot) for slot in SLOT_NAMES}
         try:
             if self.model_type == "local":
-                prompt = self._build_prompt(text)
-                result = self._call_local_model(prompt)
-                if not result or not any(result.values()):
-                    result = self._fallback_rule_based(text)
-                    logger.info("使用规则回退方案")
+                known = self._known_slots(rule_slots) if self.prefill_slots else {}
+                uncertain = [slot for slot in SLOT_NAMES if slot not in known]
+                if not uncertain:
+                    result = known
+                    self.prompt_stats["skipped"] += 1
+                    logger.info("规则已确定全部信息，跳过大模型")
                 else:
-                    logger.info("使用大模型处理结果")
+                    prompt = self._build_prompt(text, known, uncertain)
+                    max_tokens = response_token_budget(uncertain)
+                    self.prompt_stats["calls"] += 1
+                    self.prompt_stats["prompt_tokens"] += estimate_tokens(prompt)
+                    self.prompt_stats["max_tokens"] += max_tokens
+                    llm_result = self._call_local_model(prompt, max_tokens, uncertain)
+                    if not llm_result or not any(llm_result.values()):
+                        result = rule_slots
+                        # 空字典说明调用失败或回复无法解析；模型正常回答但各槽位都为空不算回退
+                        fallback = not llm_result
+                        self.prompt_stats["fallbacks"] += fallback
+                        logger.info("使用规则回退方案")
+                    else:
+                        result = dict(known)
+                        for slot in uncertain:
+                            result[slot] = llm_result.get(slot)
+                        logger.info("使用大模型处理结果")
                     
             else:  
-                result = self._fallback_rule_based(text)
+                result = rule_slots
                 logger.info("使用规则模式")
-            return self._standardize_result(result)
+            result = self._merge_rule_only_slots(self._standardize_result(result, rules), rule_slots)
             
         except Exception as e:
             logger.error(f"处理自然语言失败: {e}")
-            return self._fallback_rule_based(text)
+            result = dict(rule_slots)
+            fallback = True
+            self.prompt_stats["fallbacks"] += 1
+        if fallback:
+            result[FALLBACK_FLAG] = True
+        return result
     
-    def _standardize_result(self, raw_result: Dict[str, Any]) -> Dict[str, Any]:
+    def _standardize_result(self, raw_result: Dict[str, Any], rules: Optional[RuleSet] = None) -> Dict[str, Any]:
+        rules = rules or self.rules.current
         standardized = {
             "年龄": None,
             "人数": 1,
@@ -129,21 +150,21 @@ class LLMVolunteerNLPEngine:
         if age and isinstance(age, (int, float)) and 1 <= age <= 100:
             standardized["年龄"] = int(age)
         people = raw_result.get("人数", 1)
-        if isinstance(people, (int, float)) and 1 <= people <= self.max_people_count:
+        if isinstance(people, (int, float)) and 1 <= people <= rules.max_people_count:
             standardized["人数"] = int(people)
         elif isinstance(people, str):
             import re
             num_match = re.search(r'\d+', str(people))
             if num_match:
                 num = int(num_match.group())
-                standardized["人数"] = min(num, self.max_people_count)
+                standardized["人数"] = min(num, rules.max_people_count)
         date_str = raw_result.get("日期")
         if date_str:
             try:
                 date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
                 if date_obj < self.current_date:
                     date_obj = date_obj.replace(year=self.current_year + 1)
-                elif (date_obj - self.current_date).days > self.max_future_days:
+                elif (date_obj - self.current_date).days > rules.max_future_days:
                     date_obj = date_obj.replace(year=self.current_year)
                 
                 standardized["日期"] = date_obj.strftime('%Y-%m-%d')
@@ -151,24 +172,16 @@ class LLMVolunteerNLPEngine:
                 pass
         time_str = raw_result.get("时间")
         if time_str:
-            time_mapping = {
-                "上午": "08:00-12:00",
-                "下午": "14:00-18:00",
-                "早上": "07:00-10:00",
-                "中午": "11:00-14:00",
-                "晚上": "19:00-22:00"
-            }
-            standardized["时间"] = time_mapping.get(time_str, time_str)
+            standardized["时间"] = rules.llm_time_of_day.get(time_str, time_str)
         activity = raw_result.get("活动类型", "综合")
-        if activity and activity in ["环保", "教育", "社区服务", "医疗", "动物保护"]:
+        if activity and any(activity == name for name, _ in rules.llm_activity_types):
             standardized["活动类型"] = activity
         else:
+            # 多个类型的关键词都出现时取排在最后的类型
             text_lower = str(activity).lower()
-            for activity_type, keywords in self.activity_mapping.items():
-                for keyword in keywords:
-                    if keyword.lower() in text_lower:
-                        standardized["活动类型"] = activity_type
-                        break
+            for activity_type, pattern in rules.llm_activity_types:
+                if pattern.search(text_lower):
+                    standardized["活动类型"] = activity_type
         
         return standardized
     
@@ -200,26 +213,6 @@ class LLMVolunteerNLPEngine:
             "age_limit": processed_data["年龄"]
         }
         return {k: v for k, v in query.items() if v is not None}
-class HybridNLPEngine:
-    """混合引擎，支持规则和大模型切换"""
-    
-    def __init__(self, use_llm: bool = False, **kwargs):
-        self.use_llm = use_llm
-        if use_llm:
-            self.engine = LLMVolunteerNLPEngine(**kwargs)
-        else:
-            from volunteer_nlp_system import VolunteerNLPEngine
-            self.engine = VolunteerNLPEngine()
-    
-    def process_natural_language(self, text: str) -> Dict[str, Any]:
-        return self.engine.process_natural_language(text)
-    
-    def validate_input(self, processed_data: Dict[str, Any]) -> Dict[str, Any]:
-        return self.engine.validate_input(processed_data)
-    
-    def generate_database_query(self, processed_data: Dict[str, Any]) -> Dict[str, Any]:
-        return self.engine.generate_database_query(processed_data)
-
 
 if __name__ == "__main__":
     engine = LLMVolunteerNLPEngine(model_type="rule")  # 先用规则模式测试
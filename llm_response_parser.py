@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+import json
+import threading
+from typing import Dict, List, Optional, Any, Tuple, Iterator
+
+# 模型常输出的全角标点，统一映射为JSON可以识别的半角符号
+_PUNCTUATION_TABLE = str.maketrans({
+    '｛': '{', '｝': '}', '：': ':', '，': ',', '＂': '"',
+    '“': '"', '”': '"', '‘': "'", '’': "'", '［': '[', '］': ']'
+})
+
+_BARE_LITERALS = {"None": "null", "True": "true", "False": "false", "NULL": "null", "Null": "null"}
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_NUMBER_PATTERN = re.compile(r'-?\d+(?:\.\d+)?')
+
+SLOT_TYPES = {
+    "年龄": "int",
+    "人数": "int",
+    "日期": "date",
+    "时间": "str",
+    "活动类型": "str"
+}
+
+
+def _scan_object(text: str, start: int) -> Tuple[Optional[str], int]:
+    """
+    从start处的 '{' 开始扫描到与之配对的 '}'，返回 (规范化后的JSON文本, 结束位置)。
+    扫描过程中顺便把单引号字符串改写成双引号、去掉尾逗号、替换Python字面量，
+    整个过程只遍历一次输入。找不到配对的 '}' 时返回 (None, len(text))。
+    """
+    out = []
+    depth = 0
+    quote = None
+    i = start
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if quote:
+            if ch == '\\' and i + 1 < n:
+                nxt = text[i + 1]
+                if quote == "'" and nxt == "'":
+                    out.append("'")
+                else:
+                    out.append(ch + nxt)
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == '\n':
+                out.append('\\n')
+            else:
+                out.append(ch)
+            i += 1
+            continue
+        if ch == '"' or ch == "'":
+            quote = ch
+            out.append('"')
+        elif ch == '{' or ch == '[':
+            depth += 1
+            out.append(ch)
+        elif ch == '}' or ch == ']':
+            while out and out[-1] in (' ', '\n', '\t', '\r'):
+                out.pop()
+            if out and out[-1] == ',':
+                out.pop()
+            depth -= 1
+            out.append(ch)
+            if depth == 0:
+                return ''.join(out), i + 1
+        elif ch.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == '_'):
+                j += 1
+            word = text[i:j]
+            k = j
+            while k < n and text[k] in ' \t':
+                k += 1
+            if word in _BARE_LITERALS:
+                out.append(_BARE_LITERALS[word])
+            elif k < n and text[k] == ':':
+                out.append(f'"{word}"')
+            else:
+                out.append(word)
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    return None, n
+
+
+class ResponseParser:
+    """
+    从大模型的回复中提取第一个合法的JSON对象并按槽位校验。
+    容忍markdown代码块、全角标点、单引号、尾逗号和多余的文字，线性时间完成。
+    """
+
+    def __init__(self, slot_types: Optional[Dict[str, str]] = None):
+        self.slot_types = slot_types or SLOT_TYPES
+        self._lock = threading.Lock()
+        self.stats = {"total": 0, "parsed": 0, "no_json": 0, "invalid_json": 0, "invalid_fields": 0}
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def extract_object(self, content: str) -> Optional[Dict[str, Any]]:
+        text = content.translate(_PUNCTUATION_TABLE)
+        position = text.find('{')
+        found_candidate = False
+        while position != -1:
+            candidate, end = _scan_object(text, position)
+            if candidate is None:
+                break
+            found_candidate = True
+            try:
+                value = json.loads(candidate)
+            except ValueError:
+                value = None
+            if isinstance(value, dict):
+                return value
+            position = text.find('{', end)
+        self._count("invalid_json" if found_candidate else "no_json")
+        return None
+
+    def _coerce(self, slot: str, value: Any) -> Tuple[Any, bool]:
+        if value is None:
+            return None, True
+        kind = self.slot_types[slot]
+        if kind == "int":
+            if isinstance(value, bool):
+                return None, False
+            if isinstance(value, (int, float)):
+                return int(value), True
+            if isinstance(value, str):
+                match = _NUMBER_PATTERN.search(value)
+                if match:
+                    return int(float(match.group())), True
+                return None, value.strip().lower() in ("", "null", "none")
+            return None, False
+        if not isinstance(value, str):
+            return None, False
+        value = value.strip()
+        if value.lower() in ("", "null", "none"):
+            return None, True
+        if kind == "date" and not _DATE_PATTERN.match(value):
+            return None, False
+        return value, True
+
+    def parse(self, content: str, slots: Optional[List[str]] = None) -> Dict[str, Any]:
+        """返回校验后的槽位字典；解析失败时返回空字典"""
+        self._count("total")
+        if not content:
+            self._count("no_json")
+            return {}
+        raw = self.extract_object(content)
+        if raw is None:
+            return {}
+        allowed = slots or list(self.slot_types)
+        result = {}
+        invalid = 0
+        for slot in allowed:
+            if slot not in raw:
+                continue
+            value, ok = self._coerce(slot, raw[slot])
+            if ok:
+                result[slot] = value
+            else:
+                invalid += 1
+        if invalid:
+            self._count("invalid_fields", invalid)
+        self._count("parsed")
+        return result
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["failures"] = stats["no_json"] + stats["invalid_json"]
+        return stats
+
+
+default_parser = ResponseParser()
+
+
+def malformed_outputs(count: int, seed: int = 0) -> Iterator[str]:
+    """随机构造畸形的模型输出: 几种常见的包裹方式，再随机插入、删除字符或截断"""
+    import random
+    rng = random.Random(seed)
+    samples = [
+        '{"年龄": 16, "人数": 2, "日期": "2026-04-03", "时间": "08:00-12:00", "活动类型": "环保"}',
+        "{'年龄': None, '人数': '3人', '日期': null, '时间': '上午', '活动类型': '教育',}",
+        '｛“年龄”：18，“人数”：1，“活动类型”：“医疗”｝',
+    ]
+    wrappers = [
+        lambda s: s,
+        lambda s: f"```json\n{s}\n```",
+        lambda s: f"好的，结果如下：{s} 希望对你有帮助 }}",
+        lambda s: f"{s}\n{s}",
+        lambda s: f"示例格式为 {{年龄: 数字}}，实际结果：{s}",
+    ]
+    noise = list('{}[]"\',:：，“” \n\\abc123null')
+    for _ in range(count):
+        text = rng.choice(wrappers)(rng.choice(samples))
+        for _ in range(rng.randint(0, 4)):
+            operation = rng.random()
+            position = rng.randint(0, len(text))
+            if operation < 0.4:
+                text = text[:position] + rng.choice(noise) + text[position:]
+            elif operation < 0.7:
+                text = text[:position] + text[position + 1:]
+            else:
+                text = text[:position]
+        yield text
+
+
+def fuzz(iterations: int = 20000, seed: int = 0):
+    """用畸形的模型输出统计解析结果，并在超长输入上对比解析器与旧的贪婪正则的耗时；正确性见 tests/test_llm_response_parser.py"""
+    import time
+    parser = ResponseParser()
+    failures = 0
+    for text in malformed_outputs(iterations, seed):
+        try:
+            parser.parse(text)
+        except Exception as e:
+            failures += 1
+            print(f"解析异常: {e!r} 输入: {text!r}")
+    print(f"模糊测试 {iterations} 次, 异常 {failures} 次, 统计: {parser.get_stats()}")
+
+    # 大量未闭合的 '{'：旧的贪婪正则会从每个 '{' 出发回溯到结尾，耗时随长度平方增长
+    for size in (2000, 8000, 32000):
+        adversarial = "好的" + "{" * size
+        start = time.perf_counter()
+        parser.parse(adversarial)
+        scan_time = time.perf_counter() - start
+        start = time.perf_counter()
+        re.search(r'\{.*\}', adversarial, re.DOTALL)
+        print(f"输入长度 {len(adversarial):>6}: 解析器 {scan_time * 1000:8.1f}ms, "
+              f"旧的贪婪正则 {(time.perf_counter() - start) * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    fuzz()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+闭环负载测试，全部在本机离线运行:
+启动带故障注入的桩模型服务(stub_llm.py)，再按每组配置用 gunicorn 启动 volunteer_api，
+固定数量的客户端按目标RPS发送 /api/process 请求(响应慢于节奏时立即发下一个，在途请求不超过客户端数)，
+报告吞吐、延迟分位数、规则回退率和错误分类。自动遍历 USE_LLM、LLM_TIMEOUT 和 worker 数。
+
+用法:
+    python load_test.py --rps 20 --duration 10 --workers 1,2,4 --llm-timeouts 1,5
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+from collections import Counter
+from typing import Dict, List, Optional, Any
+
+import requests
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} 的进程已退出，返回码 {process.returncode}")
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"等待 {url} 就绪超时")
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def load_texts(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def drive(url: str, texts: List[str], rps: float, duration: float, clients: int,
+          request_timeout: float) -> List[Dict[str, Any]]:
+    """clients 个线程按 rps 的总节奏发送请求，返回每个请求的结果"""
+    results = []
+    lock = threading.Lock()
+    interval = clients / rps
+    start = time.monotonic() + 0.1
+    deadline = start + duration
+
+    def client(index: int):
+        session = requests.Session()
+        next_send = start + interval * index / clients
+        sent = 0
+        while True:
+            now = time.monotonic()
+            if next_send > now:
+                time.sleep(next_send - now)
+            if time.monotonic() >= deadline:
+                return
+            text = texts[(index + sent * clients) % len(texts)]
+            sent += 1
+            started = time.monotonic()
+            record = {"status": None, "engine": None, "error": None}
+            try:
+                response = session.post(url, json={"text": text}, timeout=request_timeout)
+                record["status"] = response.status_code
+                if response.status_code == 200:
+                    record["engine"] = response.json()["extracted_info"].get("引擎类型")
+                else:
+                    record["error"] = f"HTTP {response.status_code}"
+            except requests.Timeout:
+                record["error"] = "客户端超时"
+            except requests.RequestException as e:
+                record["error"] = type(e).__name__
+            record["latency"] = time.monotonic() - started
+            with lock:
+                results.append(record)
+            # 闭环: 响应慢于节奏时不补发，只从当前时刻接着排
+            next_send = max(next_send + interval, time.monotonic())
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize(results: List[Dict[str, Any]], duration: float) -> Dict[str, Any]:
+    ok = [r for r in results if r["status"] == 200]
+    latencies = sorted(r["latency"] for r in ok)
+    engines = Counter(r["engine"] for r in ok)
+    fallbacks = engines.get("规则(LLM回退)", 0)
+    llm_answers = engines.get("LLM", 0) + fallbacks
+    return {
+        "requests": len(results),
+        "throughput": round(len(ok) / duration, 2),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+        "p90_ms": round(percentile(latencies, 0.9) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+        "fallback_rate": round(fallbacks / llm_answers, 4) if llm_answers else 0.0,
+        "errors": dict(Counter(r["error"] for r in results if r["error"])),
+    }
+
+
+def run_config(args, stub_url: str, use_llm: bool, llm_timeout: int, workers: int,
+               texts: List[str]) -> Dict[str, Any]:
+    port = free_port()
+    env = dict(os.environ, USE_LLM=str(use_llm).lower(), LLM_TIMEOUT=str(llm_timeout), LLM_BACKEND="http",
+               LLM_MODEL_ENDPOINT=f"{stub_url}/v1/chat/completions",
+               # 负载都来自本机同一个IP，关闭按客户端限速；解析缓存会让重复的语料跳过模型，默认也关闭
+               ADMISSION_RATE="0", PARSE_CACHE_BACKEND=args.parse_cache, RULES_RELOAD_INTERVAL="0")
+    command = [sys.executable, "-m", "gunicorn", "volunteer_api:app", "--bind", f"127.0.0.1:{port}",
+               "--workers", str(workers), "--threads", str(args.threads), "--timeout", str(llm_timeout + 30),
+               "--log-level", "warning"]
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                              stderr=None if args.verbose else subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(f"{base}/api/metrics", server)
+        # 每个worker各自加载jieba词典，先预热再计时
+        drive(f"{base}/api/process", texts, max(workers * 2, 4), 2.0, workers * 2, args.request_timeout)
+        before = requests.get(f"{stub_url}/stats", timeout=5).json()
+        results = drive(f"{base}/api/process", texts, args.rps, args.duration, args.clients, args.request_timeout)
+        after = requests.get(f"{stub_url}/stats", timeout=5).json()
+    finally:
+        stop(server)
+    summary = summarize(results, args.duration)
+    summary.update(use_llm=use_llm, llm_timeout=llm_timeout if use_llm else None, workers=workers,
+                   threads=args.threads, target_rps=args.rps,
+                   llm_calls={key: after[key] - before[key] for key in ("requests", "ok", "error", "timeout", "malformed")})
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="对 volunteer_api 做闭环负载测试，遍历 USE_LLM、LLM_TIMEOUT 和 worker 数")
+    parser.add_argument("--rps", type=float, default=20.0, help="目标每秒请求数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每组配置的计时秒数")
+    parser.add_argument("--clients", type=int, default=16, help="并发客户端数，即在途请求上限")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="客户端超时秒数")
+    parser.add_argument("--use-llm", default="false,true", help="逗号分隔的 USE_LLM 取值")
+    parser.add_argument("--llm-timeouts", default="1,5", help="逗号分隔的 LLM_TIMEOUT 秒数，只在 USE_LLM=true 时遍历")
+    parser.add_argument("--workers", default="1,2,4", help="逗号分隔的 gunicorn worker 数")
+    parser.add_argument("--threads", type=int, default=1, help="每个worker的线程数，1为同步worker(与Procfile相同)")
+    parser.add_argument("--parse-cache", default="off", help="PARSE_CACHE_BACKEND，默认关闭以免重复语料命中缓存")
+    parser.add_argument("--corpus", default=os.path.join(ROOT, "eval_corpus.jsonl"), help="请求文本(JSONL的text字段)")
+    parser.add_argument("--latency", default="lognormal:400:0.6", help="桩模型延迟分布，见 stub_llm.py")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--timeout-rate", type=float, default=0.01)
+    parser.add_argument("--malformed-rate", type=float, default=0.02)
+    parser.add_argument("--output", default=None, help="把每组结果写入该NDJSON文件")
+    parser.add_argument("--verbose", action="store_true", help="显示 gunicorn 的日志")
+    args = parser.parse_args(argv)
+
+    texts = load_texts(args.corpus)
+    timeouts = [int(v) for v in args.llm_timeouts.split(',')]
+    stub_port = free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, "stub_llm.py"), "--port", str(stub_port),
+                             "--latency", args.latency, "--error-rate", str(args.error_rate),
+                             "--timeout-rate", str(args.timeout_rate), "--malformed-rate", str(args.malformed_rate),
+                             "--hang-seconds", str(max(timeouts) * 2 + 5), "--seed", "0"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    print(f"目标 {args.rps:g} 请求/s，{args.clients} 个客户端，每组 {args.duration:g}s；桩模型延迟 {args.latency}，"
+          f"错误 {args.error_rate:.0%}，挂起 {args.timeout_rate:.0%}，截断 {args.malformed_rate:.0%}")
+    print(f"{'USE_LLM':<8}{'超时':>5}{'worker':>7}{'吞吐':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'回退率':>8}  "
+          f"{'模型调用':<8}错误")
+    try:
+        wait_until_ready(f"{stub_url}/stats", stub)
+        for use_llm in [v.strip().lower() == "true" for v in args.use_llm.split(',')]:
+            for llm_timeout in timeouts if use_llm else timeouts[:1]:
+                for workers in [int(v) for v in args.workers.split(',')]:
+                    summary = run_config(args, stub_url, use_llm, llm_timeout, workers, texts)
+                    if output is not None:
+                        output.write(json.dumps(summary, ensure_ascii=False) + "\n")
+                        output.flush()
+                    ms = lambda key: f"{summary[key]:.0f}ms" if summary[key] is not None else "-"
+                    print(f"{str(use_llm).lower():<8}{llm_timeout if use_llm else '-':>5}{workers:>7}"
+                          f"{summary['throughput']:>8.1f}{ms('p50_ms'):>9}{ms('p90_ms'):>9}{ms('p99_ms'):>9}"
+                          f"{summary['fallback_rate']:>8.1%}  {summary['llm_calls']['requests']:<8}"
+                          f"{summary['errors'] or ''}", flush=True)
+    finally:
+        stop(stub)
+        if output is not None:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
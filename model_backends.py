@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import copy
+import time
+import queue
+import logging
+import threading
+from typing import Dict, List, Optional, Any, Tuple
+
+import requests
+
+from config import Config
+from prompt_templates import EXTRACTION_PREFIX
+
+logger = logging.getLogger(__name__)
+
+
+class ModelBackend:
+    """模型后端接口：输入提示词，返回模型生成的文本"""
+
+    name = "base"
+
+    def complete(self, prompt: str, max_tokens: int = 200) -> str:
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    def close(self):
+        pass
+
+
+class HTTPChatBackend(ModelBackend):
+    """通过 OpenAI 兼容的 /v1/chat/completions 接口调用模型服务，复用HTTP连接"""
+
+    name = "http"
+
+    def __init__(self, endpoint: str, model: str = None, timeout: float = None, temperature: float = 0.1):
+        self.endpoint = endpoint
+        self.model = model or Config.LLM_MODEL_TYPE
+        self.timeout = timeout or Config.LLM_TIMEOUT
+        self.temperature = temperature
+        self._session = requests.Session()
+        self.requests = 0
+
+    def complete(self, prompt: str, max_tokens: int = 200) -> str:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+            "max_tokens": max_tokens
+        }
+        self.requests += 1
+        response = self._session.post(self.endpoint, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "endpoint": self.endpoint, "requests": self.requests}
+
+    def close(self):
+        self._session.close()
+
+
+_loaded_models: Dict[Tuple[str, str], Tuple[Any, Any]] = {}
+_load_lock = threading.Lock()
+
+
+def load_model(model_path: str, device: str = "cpu") -> Tuple[Any, Any]:
+    """加载 (tokenizer, model)。同一进程内同一路径只加载一次，所有后端实例共享"""
+    key = (model_path, device)
+    with _load_lock:
+        if key not in _loaded_models:
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+            start = time.perf_counter()
+            tokenizer = AutoTokenizer.from_pretrained(model_path)
+            if tokenizer.pad_token_id is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            model = AutoModelForCausalLM.from_pretrained(model_path)
+            model.to(device)
+            model.eval()
+            _loaded_models[key] = (tokenizer, model)
+            logger.info(f"本地模型加载完成: {model_path} ({time.perf_counter() - start:.1f}s)")
+        return _loaded_models[key]
+
+
+class _PendingRequest:
+    __slots__ = ("input_ids", "cached_prefix", "max_tokens", "deadline", "done", "result", "error")
+
+    def __init__(self, input_ids: List[int], cached_prefix: bool, max_tokens: int, deadline: float = None):
+        self.input_ids = input_ids
+        self.cached_prefix = cached_prefix
+        self.max_tokens = max_tokens
+        # 调用方放弃等待的时刻(time.monotonic)，过了这个时刻还没开始生成的请求直接丢弃
+        self.deadline = deadline
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LocalTransformersBackend(ModelBackend):
+    """
+    在当前进程内用 transformers 运行本地模型，省去HTTP序列化和网络往返。
+    所有提示词共享的固定前缀只做一次前向计算，之后每个请求复制这份KV缓存，
+    只对各自的剩余部分做计算；并发请求由后台线程攒成一批统一生成。
+    """
+
+    name = "local"
+
+    def __init__(self, model_path: str, device: str = "cpu", prefix: str = EXTRACTION_PREFIX,
+                 max_batch_size: int = 8, batch_wait_ms: float = 5.0, timeout: float = None):
+        import torch
+        self._torch = torch
+        self.model_path = model_path
+        self.device = device
+        self.tokenizer, self.model = load_model(model_path, device)
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.timeout = timeout or Config.LLM_TIMEOUT
+        self.prefix = prefix
+        self._prefix_ids: List[int] = []
+        self._prefix_cache = None
+        if prefix:
+            self._prefix_ids = self.tokenizer(prefix).input_ids
+            with torch.no_grad():
+                output = self.model(torch.tensor([self._prefix_ids], device=device), use_cache=True)
+            self._prefix_cache = output.past_key_values
+        self.stats = {"requests": 0, "batches": 0, "prefix_hits": 0, "generated_tokens": 0, "max_batch": 0,
+                      "dropped": 0}
+        self._stats_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[_PendingRequest]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._serve, name="local-model-batcher", daemon=True)
+        self._worker.start()
+
+    def _encode(self, prompt: str, max_tokens: int, deadline: float = None) -> _PendingRequest:
+        if self._prefix_cache is not None and prompt.startswith(self.prefix):
+            suffix = prompt[len(self.prefix):]
+            return _PendingRequest(self.tokenizer(suffix, add_special_tokens=False).input_ids, True, max_tokens,
+                                   deadline)
+        return _PendingRequest(self.tokenizer(prompt).input_ids, False, max_tokens, deadline)
+
+    def complete(self, prompt: str, max_tokens: int = 200) -> str:
+        request = self._encode(prompt, max_tokens, time.monotonic() + self.timeout)
+        self._queue.put(request)
+        if not request.done.wait(self.timeout):
+            raise TimeoutError(f"本地模型生成超时({self.timeout}s)")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect_batch(self, first: _PendingRequest) -> Tuple[List[_PendingRequest], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _serve(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect_batch(first)
+            batch = self._drop_expired(batch)
+            for cached_prefix in (True, False):
+                group = [r for r in batch if r.cached_prefix == cached_prefix]
+                if not group:
+                    continue
+                try:
+                    self._generate(group, cached_prefix)
+                except Exception as e:
+                    logger.error(f"本地模型生成失败: {e}")
+                    for request in group:
+                        request.error = e
+                for request in group:
+                    request.done.set()
+
+    def _drop_expired(self, batch: List[_PendingRequest]) -> List[_PendingRequest]:
+        """调用方已经超时返回的请求不再生成，免得占用批次位置、拖慢后面仍在等待的请求"""
+        now = time.monotonic()
+        live = []
+        for request in batch:
+            if request.deadline is not None and request.deadline <= now:
+                request.error = TimeoutError(f"本地模型生成超时({self.timeout}s)")
+                request.done.set()
+            else:
+                live.append(request)
+        if len(live) < len(batch):
+            with self._stats_lock:
+                self.stats["dropped"] += len(batch) - len(live)
+        return live
+
+    def _generate(self, batch: List[_PendingRequest], cached_prefix: bool):
+        """
+        同一批的输入排成 [公共前缀][左填充][各自剩余部分]，注意力掩码屏蔽填充位置，
+        位置编码由掩码累加得到，因此与单独生成时一致。
+        """
+        torch = self._torch
+        tokenizer = self.tokenizer
+        pad_id = tokenizer.pad_token_id
+        prefix = self._prefix_ids if cached_prefix else []
+        longest = max(len(r.input_ids) for r in batch)
+        rows, masks = [], []
+        for request in batch:
+            padding = longest - len(request.input_ids)
+            rows.append(prefix + [pad_id] * padding + request.input_ids)
+            masks.append([1] * len(prefix) + [0] * padding + [1] * len(request.input_ids))
+        input_ids = torch.tensor(rows, device=self.device)
+        kwargs = {"attention_mask": torch.tensor(masks, device=self.device)}
+        if cached_prefix:
+            cache = copy.deepcopy(self._prefix_cache)
+            if len(batch) > 1:
+                cache.batch_repeat_interleave(len(batch))
+            kwargs["past_key_values"] = cache
+
+        with torch.no_grad():
+            output = self.model.generate(
+                input_ids=input_ids,
+                max_new_tokens=max(r.max_tokens for r in batch),
+                do_sample=False,
+                pad_token_id=pad_id,
+                **kwargs
+            )
+
+        generated_tokens = 0
+        for request, tokens in zip(batch, output[:, input_ids.shape[1]:].tolist()):
+            tokens = tokens[:request.max_tokens]
+            if tokenizer.eos_token_id in tokens:
+                tokens = tokens[:tokens.index(tokenizer.eos_token_id)]
+            generated_tokens += len(tokens)
+            request.result = tokenizer.decode(tokens, skip_special_tokens=True)
+
+        with self._stats_lock:
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["generated_tokens"] += generated_tokens
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            if cached_prefix:
+                self.stats["prefix_hits"] += len(batch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["backend"] = self.name
+        stats["model_path"] = self.model_path
+        stats["prefix_tokens"] = len(self._prefix_ids)
+        stats["avg_batch"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+
+def create_backend(kind: str = None, model_endpoint: str = None) -> ModelBackend:
+    """按配置创建模型后端: "http" 调用远程服务，"local" 在进程内运行本地模型"""
+    kind = kind or Config.LLM_BACKEND
+    if kind == "http":
+        return HTTPChatBackend(model_endpoint or Config.LLM_MODEL_ENDPOINT)
+    if kind == "local":
+        return LocalTransformersBackend(
+            Config.LLM_LOCAL_MODEL_PATH,
+            device=Config.LLM_DEVICE,
+            max_batch_size=Config.LLM_BATCH_SIZE,
+            batch_wait_ms=Config.LLM_BATCH_WAIT_MS
+        )
+    raise ValueError(f"未知的模型后端: {kind}")
+
+
+def build_tiny_model(path: str, texts: List[str]):
+    """构造一个随机初始化的字符级小模型并保存到path，供离线测试使用，不需要下载任何权重"""
+    import torch
+    from tokenizers import Tokenizer, decoders, models
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+    from prompt_templates import EXTRACTION_TEMPLATE, SLOT_SCHEMA
+
+    characters = set(EXTRACTION_TEMPLATE.source + "".join(texts) + "".join(SLOT_SCHEMA.values()))
+    characters.update('0123456789{}[]":,-+ \nnull已知今天用户输入')
+    vocab = {"<unk>": 0, "<pad>": 1, "<eos>": 2}
+    for character in sorted(characters):
+        vocab[character] = len(vocab)
+    core = Tokenizer(models.BPE(vocab=vocab, merges=[], unk_token="<unk>"))
+    core.decoder = decoders.Fuse()
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=core, unk_token="<unk>", pad_token="<pad>",
+                                        eos_token="<eos>")
+    torch.manual_seed(0)
+    config = GPT2Config(vocab_size=len(vocab), n_positions=1024, n_embd=64, n_layer=2, n_head=4,
+                        bos_token_id=2, eos_token_id=2, pad_token_id=1)
+    GPT2LMHeadModel(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+
+def demo(corpus_path: str = "eval_corpus.jsonl", workers: int = 8):
+    """用随机初始化的小模型离线跑通本地后端：对比前缀缓存和批处理对吞吐的影响"""
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from evaluate_engines import load_corpus
+    from llm_nlp_engine import LLMVolunteerNLPEngine
+
+    logging.getLogger().setLevel(logging.WARNING)
+    texts = [case["text"] for case in load_corpus(corpus_path)]
+    with tempfile.TemporaryDirectory() as path:
+        build_tiny_model(path, texts)
+        outputs = {}
+        for label, prefix, batch_size in (("无缓存/逐个", "", 1), ("前缀缓存/逐个", EXTRACTION_PREFIX, 1),
+                                          ("前缀缓存/批处理", EXTRACTION_PREFIX, workers)):
+            backend = LocalTransformersBackend(path, prefix=prefix, max_batch_size=batch_size)
+            engine = LLMVolunteerNLPEngine(model_type="local", prefill_slots=False, backend=backend)
+            prompts = [engine._build_prompt(text) for text in texts]
+            start = time.perf_counter()
+            with ThreadPoolExecutor(workers) as pool:
+                outputs[label] = list(pool.map(lambda p: backend.complete(p, 40), prompts))
+            elapsed = time.perf_counter() - start
+            stats = backend.get_stats()
+            backend.close()
+            print(f"{label:<12} {len(prompts) / elapsed:8.1f} 请求/s  批次 {stats['batches']:>3}  "
+                  f"平均批大小 {stats['avg_batch']:>5}  前缀token {stats['prefix_tokens']}")
+
+        baseline = outputs["无缓存/逐个"]
+        for label, result in outputs.items():
+            same = sum(a == b for a, b in zip(baseline, result))
+            print(f"{label:<12} 与无缓存输出一致 {same}/{len(baseline)}")
+
+        engine = LLMVolunteerNLPEngine(model_type="local", backend=LocalTransformersBackend(path))
+        print(f"端到端示例(随机模型输出无意义，解析失败时回退规则): {engine.process_natural_language(texts[0])}")
+
+
+if __name__ == "__main__":
+    demo()
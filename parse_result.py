@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from collections.abc import Mapping, MutableMapping
+from operator import attrgetter
+from typing import Dict, List, Optional, Any
+
+
+class Validation(Mapping):
+    """validate_input 的结果。以属性访问，同时兼容旧的 {"questions", "warnings", ...} 字典用法"""
+
+    __slots__ = ("questions", "warnings", "missing_slots")
+    KEYS = ("questions", "warnings", "needs_clarification", "missing_slots")
+
+    def __init__(self, questions: Optional[List[str]] = None, warnings: Optional[List[str]] = None,
+                 missing_slots: Optional[List[str]] = None):
+        self.questions = questions if questions is not None else []
+        self.warnings = warnings if warnings is not None else []
+        self.missing_slots = missing_slots if missing_slots is not None else []
+
+    @property
+    def needs_clarification(self) -> bool:
+        return len(self.questions) > 0
+
+    def ask(self, question: str, slot: Optional[str] = None, warning: Optional[str] = None):
+        if warning:
+            self.warnings.append(warning)
+        self.questions.append(question)
+        if slot:
+            self.missing_slots.append(slot)
+
+    def __getitem__(self, key: str):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "questions": self.questions,
+            "warnings": self.warnings,
+            "needs_clarification": len(self.questions) > 0,
+            "missing_slots": self.missing_slots
+        }
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+# 中文键与属性的对应表，按旧字典的键顺序排列；序列化时一次取出所有属性再与键表拼成字典
+RESULT_FIELDS = (
+    ("原始输入", "text"),
+    ("年龄", "age"),
+    ("人数", "people"),
+    ("日期", "date"),
+    ("结束日期", "end_date"),
+    ("星期", "weekdays"),
+    ("时间", "time_range"),
+    ("活动类型", "activity_type"),
+    ("地点", "location"),
+    ("距离", "distance"),
+    ("关键词", "keywords"),
+    ("处理时间", "processed_at"),
+)
+_RESULT_KEYS = tuple(key for key, _ in RESULT_FIELDS)
+_RESULT_VALUES = attrgetter(*(attr for _, attr in RESULT_FIELDS))
+_ATTR_BY_KEY = dict(RESULT_FIELDS, 验证结果="validation", 引擎类型="engine_type")
+
+
+class ParseResult(MutableMapping):
+    """
+    一次请求的解析结果。各处理阶段直接读写属性；为兼容按中文键访问的旧代码，
+    同时实现了映射协议，to_dict() 输出与原来的字典相同的JSON结构。
+    """
+
+    __slots__ = ("text", "age", "people", "date", "end_date", "weekdays", "time_range", "activity_type",
+                 "location", "distance", "keywords", "processed_at", "validation", "engine_type")
+
+    def __init__(self, text: str, age=None, people: int = 1, date: Optional[str] = None,
+                 end_date: Optional[str] = None, weekdays: Optional[List[int]] = None,
+                 time_range: Optional[str] = None, activity_type: str = "综合", location: Optional[str] = None,
+                 distance=None, keywords: Optional[List[str]] = None, processed_at: Optional[str] = None,
+                 validation: Optional[Validation] = None,
+                 engine_type: Optional[str] = None):
+        self.text = text
+        self.age = age
+        self.people = people
+        self.date = date
+        self.end_date = end_date
+        self.weekdays = weekdays
+        self.time_range = time_range
+        self.activity_type = activity_type
+        self.location = location
+        self.distance = distance
+        self.keywords = keywords
+        self.processed_at = processed_at
+        self.validation = validation
+        self.engine_type = engine_type
+
+    def __getitem__(self, key: str):
+        attr = _ATTR_BY_KEY.get(key)
+        if attr is None or (attr == "engine_type" and self.engine_type is None):
+            raise KeyError(key)
+        return getattr(self, attr)
+
+    def __setitem__(self, key: str, value):
+        attr = _ATTR_BY_KEY.get(key)
+        if attr is None:
+            raise KeyError(f"解析结果没有字段: {key}")
+        setattr(self, attr, value)
+
+    def __delitem__(self, key: str):
+        raise TypeError("解析结果的字段不能删除")
+
+    def __iter__(self):
+        yield from _RESULT_KEYS
+        yield "验证结果"
+        if self.engine_type is not None:
+            yield "引擎类型"
+
+    def __len__(self):
+        return len(_RESULT_KEYS) + 1 + (self.engine_type is not None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = dict(zip(_RESULT_KEYS, _RESULT_VALUES(self)))
+        data["验证结果"] = self.validation.to_dict() if self.validation is not None else None
+        if self.engine_type is not None:
+            data["引擎类型"] = self.engine_type
+        return data
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class ProcessRequest:
+    """/api/process 的请求体，只在入口处解析和校验一次"""
+
+    __slots__ = ("text", "session_id", "latitude", "longitude")
+
+    def __init__(self, text: str, session_id: Optional[str] = None,
+                 latitude: Optional[float] = None, longitude: Optional[float] = None):
+        self.text = text
+        self.session_id = session_id
+        self.latitude = latitude
+        self.longitude = longitude
+
+    @classmethod
+    def from_payload(cls, data) -> "ProcessRequest":
+        text = data.get('text', '')
+        if not text:
+            raise ValueError("请提供文本输入")
+        latitude, longitude = data.get('latitude'), data.get('longitude')
+        if latitude is not None and longitude is not None:
+            try:
+                latitude, longitude = float(latitude), float(longitude)
+            except (TypeError, ValueError):
+                raise ValueError("latitude和longitude必须是数字")
+        else:
+            latitude = longitude = None
+        return cls(text, data.get('session_id'), latitude, longitude)
+
+
+def benchmark(iterations: int = 2000):
+    """用 tracemalloc 统计每个请求在各阶段的内存分配，并与等价的字典结果对比；兼容性见 tests/test_parse_result.py"""
+    import time
+    import logging
+    import tracemalloc
+    import jieba
+    from volunteer_nlp_system import VolunteerNLPEngine
+
+    logging.getLogger().setLevel(logging.WARNING)
+    jieba.setLogLevel(logging.WARNING)
+    engine = VolunteerNLPEngine()
+    texts = [
+        "我和我朋友都是16岁，我和他要做一个在4月3号上午的志愿活动，我们想做环保类型的",
+        "我想一个人参加明天下午的社区服务活动，我18岁了",
+        "我们三个人想在下周六做一些环保相关的事情，都是大学生",
+        "明天我想和朋友一起去光谷附近参加敬老院的志愿活动",
+    ]
+    slots = [engine.extract_slots(text) for text in texts]
+
+    def measure(label, stage):
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        kept = [stage(i) for i in range(iterations)]
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        stats = after.compare_to(before, "filename")
+        blocks = sum(stat.count_diff for stat in stats)
+        size = sum(stat.size_diff for stat in stats)
+        start = time.perf_counter()
+        for i in range(iterations):
+            stage(i)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<30}{blocks / iterations:8.1f} 块/请求 {size / iterations:9.0f} 字节/请求 "
+              f"{elapsed * 1e6 / iterations:9.1f}us/请求")
+        return kept
+
+    print(f"{iterations} 个请求，统计每个请求的结果对象占用的内存块和字节数:")
+    results = measure("build_result → ParseResult", lambda i: engine.build_result(texts[i % 4], slots[i % 4]))
+    measure("to_dict() → 中文键字典(旧结构)", lambda i: results[i].to_dict())
+    measure("generate_database_query", lambda i: engine.generate_database_query(results[i]))
+    measure("完整解析+查询条件", lambda i: engine.generate_database_query(
+        engine.process_natural_language(texts[i % 4])))
+
+
+if __name__ == "__main__":
+    benchmark()
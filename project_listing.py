@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Callable, Any
+
+from catalogue_index import CatalogueSnapshot, date_ordinal, parse_time_range
+from gazetteer import load_gazetteer
+from text_index import tokenize
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+DEFAULT_RADIUS_KM = 5.0
+PROJECT_FIELDS = ("id", "name", "type", "date", "time", "age_limit", "max_participants",
+                  "description", "location", "latitude", "longitude")
+
+
+def encode_cursor(project_id: int) -> str:
+    return base64.urlsafe_b64encode(str(project_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("cursor无效")
+
+
+class ListingQuery:
+    """/api/projects 的查询参数，规范化后用作缓存键"""
+
+    __slots__ = ("limit", "after_id", "activity_type", "date", "date_from", "date_to", "weekdays",
+                 "age", "time_range", "near", "radius_km", "text", "fields")
+
+    def __init__(self, args: Dict[str, str]):
+        try:
+            self.limit = min(max(int(args.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+            self.age = int(args["age"]) if args.get("age") else None
+        except ValueError:
+            raise ValueError("limit和age必须是整数")
+        cursor = args.get("cursor")
+        self.after_id = decode_cursor(cursor) if cursor else None
+        self.activity_type = args.get("type") or None
+        self.date = args.get("date") or None
+        self.date_from = args.get("date_from") or None
+        self.date_to = args.get("date_to") or None
+        try:
+            for value in (self.date, self.date_from, self.date_to):
+                if value:
+                    date_ordinal(value)
+        except ValueError:
+            raise ValueError("日期格式应为 YYYY-MM-DD")
+        self.weekdays = None
+        if args.get("weekdays"):
+            try:
+                self.weekdays = tuple(sorted({int(day) for day in args["weekdays"].split(',') if day.strip()}))
+            except ValueError:
+                raise ValueError("weekdays应为逗号分隔的0-6(0=周一)")
+            if any(not 0 <= day <= 6 for day in self.weekdays):
+                raise ValueError("weekdays应为逗号分隔的0-6(0=周一)")
+        self.time_range = None
+        if args.get("time"):
+            try:
+                self.time_range = parse_time_range(args["time"])
+            except ValueError:
+                raise ValueError("time格式应为 HH:MM-HH:MM")
+        self.near = None
+        self.radius_km = None
+        if args.get("near"):
+            self.near = self._parse_near(args["near"])
+            try:
+                self.radius_km = float(args.get("radius_km") or DEFAULT_RADIUS_KM)
+            except ValueError:
+                raise ValueError("radius_km必须是数字")
+            if self.radius_km <= 0:
+                raise ValueError("radius_km必须大于0")
+        self.text = args.get("q") or None
+        fields = args.get("fields")
+        if fields:
+            requested = tuple(f.strip() for f in fields.split(',') if f.strip())
+            unknown = [f for f in requested if f not in PROJECT_FIELDS]
+            if unknown:
+                raise ValueError(f"未知字段: {', '.join(unknown)}")
+            self.fields = requested if "id" in requested else ("id",) + requested
+        else:
+            self.fields = None
+
+    @staticmethod
+    def _parse_near(value: str) -> Tuple[float, float]:
+        """near 可以是 "纬度,经度"，也可以是地名表中的地名"""
+        if ',' in value:
+            try:
+                latitude, longitude = (float(part) for part in value.split(','))
+            except ValueError:
+                raise ValueError("near应为 纬度,经度 或地名")
+            return latitude, longitude
+        place = load_gazetteer().lookup(value)
+        if place is None:
+            raise ValueError(f"未知地点: {value}")
+        return place.latitude, place.longitude
+
+    def key(self) -> Tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+def _filter_candidates(snapshot: CatalogueSnapshot, query: ListingQuery) -> List[Dict]:
+    """依次用最具选择性的索引取候选集，再对其余条件求交"""
+    candidate_sets = []
+    if query.date:
+        if query.activity_type:
+            candidate_sets.append(snapshot.candidates_for_type(query.activity_type, query.date))
+        else:
+            candidate_sets.append(snapshot.candidates_for_date(query.date))
+    elif query.activity_type:
+        candidate_sets.append(snapshot.candidates_for_type(query.activity_type))
+    if query.date_from or query.date_to or query.weekdays:
+        candidate_sets.append(snapshot.candidates_for_dates(query.date_from, query.date_to, query.weekdays))
+    if query.age is not None:
+        candidate_sets.append(snapshot.candidates_for_age(query.age))
+    if query.time_range is not None:
+        candidate_sets.append(snapshot.candidates_for_time(*query.time_range))
+    if query.text is not None:
+        scores = snapshot.text_scores(tokenize(query.text))
+        candidate_sets.append([snapshot.by_id[project_id] for project_id in scores])
+    if query.near is not None:
+        candidate_sets.append([p for _, p in snapshot.candidates_within(*query.near, query.radius_km)])
+
+    if not candidate_sets:
+        return snapshot.projects
+    candidate_sets.sort(key=len)
+    result = candidate_sets[0]
+    for other in candidate_sets[1:]:
+        ids = {p["id"] for p in other}
+        result = [p for p in result if p["id"] in ids]
+    return sorted(result, key=lambda p: p["id"])
+
+
+class ProjectListing:
+    """
+    分页、过滤并缓存 /api/projects 的序列化结果。
+    缓存键包含目录版本号，目录一旦变更旧页面自然失效；ETag由页面内容计算，
+    客户端轮询时带上 If-None-Match 即可在内容未变时拿到304。
+    """
+
+    def __init__(self, snapshot_provider: Callable[[], CatalogueSnapshot],
+                 dumps: Callable[[Any], str], max_entries: int = 256):
+        self.snapshot_provider = snapshot_provider
+        self.dumps = dumps
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple, Tuple[bytes, str]]" = OrderedDict()
+        self._cache_version = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _build_page(self, snapshot: CatalogueSnapshot, query: ListingQuery) -> Dict:
+        matched = _filter_candidates(snapshot, query)
+        start = 0
+        if query.after_id is not None:
+            start = next((i for i, p in enumerate(matched) if p["id"] > query.after_id), len(matched))
+        page = matched[start:start + query.limit]
+        if query.fields:
+            page = [{field: p.get(field) for field in query.fields} for p in page]
+        has_more = start + query.limit < len(matched)
+        return {
+            "projects": page,
+            "total_count": len(matched),
+            "version": snapshot.version,
+            "limit": query.limit,
+            "next_cursor": encode_cursor(page[-1]["id"]) if has_more and page else None
+        }
+
+    def get_page(self, args: Dict[str, str]) -> Tuple[bytes, str]:
+        """返回 (序列化后的响应体, ETag)"""
+        query = ListingQuery(args)
+        snapshot = self.snapshot_provider()
+        key = (snapshot.version,) + query.key()
+        with self._lock:
+            if self._cache_version is None or snapshot.version > self._cache_version:
+                self._cache.clear()
+                self._cache_version = snapshot.version
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached
+            self.stats["misses"] += 1
+
+        body = self.dumps(self._build_page(snapshot, query)).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()[:20]
+        with self._lock:
+            if self._cache_version == snapshot.version:
+                self._cache[key] = (body, etag)
+                if len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return body, etag
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+import json
+import string
+import textwrap
+from typing import Dict, List, Optional, Any
+
+SLOT_NAMES = ["年龄", "人数", "日期", "时间", "活动类型"]
+
+SLOT_SCHEMA = {
+    "年龄": "int|null",
+    "人数": "int",
+    "日期": "YYYY-MM-DD|null",
+    "时间": "HH:MM-HH:MM|null",
+    "活动类型": "环保|教育|社区服务|医疗|动物保护|综合"
+}
+
+# 每个槽位在紧凑JSON输出中大约需要的token数，用于计算max_tokens
+SLOT_TOKEN_BUDGET = {
+    "年龄": 6,
+    "人数": 6,
+    "日期": 14,
+    "时间": 14,
+    "活动类型": 10
+}
+RESPONSE_TOKEN_OVERHEAD = 8
+
+_cjk_pattern = re.compile('[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]')
+_ascii_word_pattern = re.compile('[A-Za-z0-9]+|[^\\sA-Za-z0-9\u3000-\u303f\u3400-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计token数: 中文字符和全角符号各算1个，英文单词/数字按每4个字符1个，其余符号各算1个"""
+    cjk = len(_cjk_pattern.findall(text))
+    others = 0
+    for piece in _ascii_word_pattern.findall(text):
+        others += max(1, len(piece) // 4) if piece[0].isalnum() else 1
+    return cjk + others
+
+
+class PromptTemplate:
+    """
+    预编译的提示词模板。构造时去掉三引号带来的缩进并拆分成行，
+    渲染时某一行引用的字段为空则整行省略。
+    """
+
+    def __init__(self, template: str):
+        self.source = textwrap.dedent(template).strip()
+        formatter = string.Formatter()
+        self.lines = []
+        for line in self.source.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            fields = tuple(name for _, name, _, _ in formatter.parse(line) if name)
+            self.lines.append((line, fields))
+
+    def render(self, **values: Any) -> str:
+        rendered = []
+        for line, fields in self.lines:
+            if not fields:
+                rendered.append(line)
+            elif all(values.get(name) not in (None, "") for name in fields):
+                rendered.append(line.format_map(values))
+        return "\n".join(rendered)
+
+    def static_prefix(self) -> str:
+        """第一个含字段的行之前的固定文本，所有渲染结果都以它开头，可供本地模型复用KV缓存"""
+        prefix = []
+        for line, fields in self.lines:
+            if fields:
+                break
+            prefix.append(line + "\n")
+        return "".join(prefix)
+
+
+EXTRACTION_TEMPLATE = PromptTemplate("""
+    从用户输入中提取志愿活动信息。
+    规则：我和朋友=2人；只写月日时取今天之后最近的日期；上午=08:00-12:00，下午=14:00-18:00，早上=07:00-10:00，中午=11:00-14:00，晚上=19:00-22:00
+    用户输入：{text}
+    今天：{today}
+    已知：{known}
+    输出JSON：{schema}
+    缺失填null，只输出JSON。
+""")
+
+EXTRACTION_PREFIX = EXTRACTION_TEMPLATE.static_prefix()
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def build_extraction_prompt(text: str, today: str, known: Optional[Dict[str, Any]] = None,
+                            slots: Optional[List[str]] = None) -> str:
+    slots = slots or [slot for slot in SLOT_NAMES if not known or slot not in known]
+    schema = compact_json({slot: SLOT_SCHEMA[slot] for slot in slots})
+    return EXTRACTION_TEMPLATE.render(
+        text=text,
+        today=today,
+        known=compact_json(known) if known else None,
+        schema=schema
+    )
+
+
+def response_token_budget(slots: List[str]) -> int:
+    return RESPONSE_TOKEN_OVERHEAD + sum(SLOT_TOKEN_BUDGET[slot] for slot in slots)
+
+
+_LEGACY_PROMPT = """
+        你是一个志愿活动信息提取专家，请从以下用户输入中提取关键信息，并以JSON格式返回。
+
+        用户输入：{text}
+
+        需要提取的信息：
+        1. 年龄：用户的年龄（数字，如果没有则返回null）
+        2. 人数：参与活动的总人数（数字，默认为1）
+        3. 日期：希望参加活动的具体日期（格式：YYYY-MM-DD，如果没有则返回null）
+        4. 时间：希望参加活动的具体时间段（如"上午"、"下午"、"09:00-12:00"等，如果没有则返回null）
+        5. 活动类型：希望参加的活动类型（如"环保"、"教育"、"社区服务"、"医疗"、"动物保护"等，如果没有则返回"综合"）
+
+        请严格按照以下JSON格式返回：
+        {{
+            "年龄": 数字或null,
+            "人数": 数字,
+            "日期": "YYYY-MM-DD"或null,
+            "时间": "时间段字符串"或null,
+            "活动类型": "活动类型字符串"
+        }}
+
+        注意：
+        - 如果用户说"我和朋友"，人数应该是2
+        - 如果用户说"4月3号"，假设年份是当前年份，如果日期已过则使用下一年
+        - 时间段的表达要标准化，如"上午"→"08:00-12:00"，"下午"→"14:00-18:00"
+        - 活动类型要从预定义类型中选择最接近的
+        """
+
+
+def benchmark(corpus_path: str = "eval_corpus.jsonl", prompt_token_ms: float = 0.2,
+              output_token_ms: float = 20.0):
+    """在按token计费延迟的桩模型上对比旧提示词与紧凑提示词"""
+    import time
+    import logging
+    from llm_nlp_engine import LLMVolunteerNLPEngine
+    from stub_llm import StubChatModel
+    from evaluate_engines import load_corpus
+
+    logging.getLogger().setLevel(logging.WARNING)
+    texts = [case["text"] for case in load_corpus(corpus_path)]
+
+    legacy_stub = StubChatModel(prompt_token_ms=prompt_token_ms, output_token_ms=output_token_ms)
+    start = time.perf_counter()
+    for text in texts:
+        legacy_stub.complete(_LEGACY_PROMPT.format(text=text).strip(), max_tokens=200)
+    legacy_elapsed = time.perf_counter() - start
+
+    rows = [("旧提示词", legacy_stub.get_stats(), legacy_elapsed, len(texts) * 200)]
+    for label, prefill in (("紧凑提示词", False), ("紧凑提示词+规则预填", True)):
+        stub = StubChatModel(preamble="", prompt_token_ms=prompt_token_ms, output_token_ms=output_token_ms)
+        engine = LLMVolunteerNLPEngine(model_type="local", prefill_slots=prefill, backend=stub)
+        start = time.perf_counter()
+        for text in texts:
+            engine.process_natural_language(text)
+        rows.append((label, stub.get_stats(), time.perf_counter() - start, engine.prompt_stats["max_tokens"]))
+
+    print(f"{'方案':<14}{'调用':>6}{'提示token':>10}{'输出token':>10}{'max_tokens合计':>14}{'总耗时(s)':>10}")
+    for label, stats, elapsed, max_tokens in rows:
+        print(f"{label:<14}{stats['calls']:>6}{stats['prompt_tokens']:>10}{stats['response_tokens']:>10}"
+              f"{max_tokens:>14}{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    benchmark()
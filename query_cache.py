@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple, Iterable
+
+from catalogue_index import date_ordinal
+
+QueryKey = Tuple
+# (候选项目, 对应的 (最小年龄, 最大年龄))
+Candidates = Tuple[Tuple[Dict, ...], Tuple[Tuple[int, int], ...]]
+
+
+def query_key(query: Dict, version: int = 0) -> Optional[QueryKey]:
+    """
+    把查询条件规范化为缓存键: (活动类型, 开始日期, 结束日期, 星期, 关键词, 目录版本)。
+    年龄、人数和坐标不进键，由调用方在缓存的候选上过滤: 条目里存有每个候选解析好的年龄范围，
+    年龄过滤只是整数比较；剩余名额随报名变化而不随目录版本变化，每次都重新检查。
+    带关键词的条目按BM25排序，IDF和平均文档长度取决于整个目录，任何日期的项目变化都可能改变排序，
+    按日期和类型打的标签淘汰不到，所以这类键带上目录版本，目录一变就不再命中；其余键的版本位为None。
+    """
+    date = query.get("date")
+    if date is None:
+        return None
+    activity_type = query.get("activity_type") or "综合"
+    weekdays = tuple(sorted(query["weekdays"])) if query.get("weekdays") else None
+    keywords = tuple(query["keywords"]) if query.get("keywords") else None
+    return activity_type, date, query.get("date_to") or date, weekdays, keywords, version if keywords else None
+
+
+def is_single_bucket(query: Dict) -> bool:
+    """
+    单日、不按星期筛选、没有关键词的查询只是一次桶查找，不经过缓存。每天60个项目时直接计算约6-9us，
+    命中缓存约省4us，未命中却要多花约6us加锁、打标签和写入，命中率低于六成就得不偿失；
+    这类条目还会挤掉区间和关键词查询的条目，后者命中时能省下30-80us(见 benchmark 的分查询形状对比)。
+    """
+    date = query["date"]
+    return (query.get("date_to") or date) == date and not query.get("weekdays") and not query.get("keywords")
+
+
+# 预热的日期区间: 这些说法解析出的区间各不相同，且都是需要合并多个桶的查询
+PREWARM_EXPRESSIONS = ("这周", "这个周末", "下周", "下周末", "下下周", "本月", "下个月")
+
+
+class QueryResultCache:
+    """
+    数据库层的查询结果缓存，缓存的是日期、类型条件筛出并按关键词排序的候选项目及其年龄范围。
+    每个条目按日期和活动类型打标签；项目增删改时只淘汰包含该项目日期、且类型相同或为 "综合" 的条目，
+    带关键词的条目(排序依赖全目录的IDF)则全部淘汰。
+    invalidate() 在新快照发布之前调用并记录新版本号，用旧快照算出的结果不会再被写入。
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[QueryKey, Tuple[Candidates, float]]" = OrderedDict()
+        self._tags: Dict[int, set] = {}
+        # 带目录版本的(关键词)条目，目录一变就全部作废
+        self._versioned: set = set()
+        self._min_version = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "rejected": 0, "invalidated": 0,
+                      "evicted": 0, "prewarmed": 0, "saved_ms": 0.0}
+
+    @staticmethod
+    def _days(key: QueryKey) -> range:
+        return range(date_ordinal(key[1]), date_ordinal(key[2]) + 1)
+
+    def get(self, key: QueryKey) -> Optional[Candidates]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            self.stats["saved_ms"] += entry[1] * 1000
+            return entry[0]
+
+    def put(self, key: QueryKey, version: int, candidates: Candidates, cost: float):
+        """cost 为计算这条结果花费的秒数，命中时累加到 saved_ms"""
+        with self._lock:
+            if version < self._min_version:
+                self.stats["rejected"] += 1
+                return
+            if key not in self._entries:
+                for day in self._days(key):
+                    self._tags.setdefault(day, set()).add(key)
+                if key[5] is not None:
+                    self._versioned.add(key)
+            self._entries[key] = (candidates, cost)
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._untag(evicted)
+                self.stats["evicted"] += 1
+
+    def _untag(self, key: QueryKey):
+        self._versioned.discard(key)
+        for day in self._days(key):
+            keys = self._tags.get(day)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[day]
+
+    def invalidate(self, version: int, changed: Iterable[Dict]):
+        """changed 为变更前后的项目，只淘汰其日期上类型相同或不限类型的条目"""
+        with self._lock:
+            self._min_version = max(self._min_version, version)
+            for key in list(self._versioned):
+                self._entries.pop(key, None)
+                self._untag(key)
+                self.stats["invalidated"] += 1
+            for project in changed:
+                keys = self._tags.get(date_ordinal(project["date"]))
+                if not keys:
+                    continue
+                for key in [k for k in keys if k[0] in (project["type"], "综合")]:
+                    self._entries.pop(key, None)
+                    self._untag(key)
+                    self.stats["invalidated"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._versioned.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["saved_ms"] = round(stats["saved_ms"], 3)
+        return stats
+
+
+def benchmark(days: int = 60, projects_per_day: int = 60, requests: int = 20000):
+    """模拟按类型、日期区间和关键词分布的查询流，对比有无缓存的 search_projects 耗时；正确性见 tests/test_query_cache.py"""
+    import time
+    import random
+    import logging
+    from datetime import date as date_type, timedelta
+    from config import Config
+    from volunteer_nlp_system import VolunteerDatabase
+
+    logging.disable(logging.INFO)
+    rng = random.Random(0)
+    types = ["环保", "教育", "社区服务", "医疗", "动物保护"]
+    places = ["公园", "敬老院", "图书馆", "福利院", "社区", "小学", "医院", "湿地"]
+    first_day = date_type.today() + timedelta(days=1)
+    database = VolunteerDatabase()
+    for offset in range(days):
+        day = (first_day + timedelta(days=offset)).isoformat()
+        for _ in range(projects_per_day):
+            place = rng.choice(places)
+            database.add_project({"name": f"{place}志愿服务", "type": rng.choice(types), "date": day,
+                                  "time": "08:00-12:00", "age_limit": f"{rng.choice([6, 12, 16, 18])}-70",
+                                  "max_participants": 30, "description": f"在{place}开展志愿服务", "location": place})
+
+    def random_query():
+        offset = min(int(rng.expovariate(0.15)), days - 1)
+        start = first_day + timedelta(days=offset)
+        query = {"activity_type": rng.choice(types + ["综合"]), "date": start.isoformat(), "date_to": None,
+                 "weekdays": None, "participants": rng.choice([1, 1, 2, 3]), "age_limit": rng.randint(10, 40)}
+        shape = rng.random()
+        if shape < 0.3:
+            query["date_to"] = (start + timedelta(days=6)).isoformat()
+        elif shape < 0.4:
+            query["date_to"] = (start + timedelta(days=29)).isoformat()
+            query["weekdays"] = [5, 6]
+        if rng.random() < 0.3:
+            query["keywords"] = [rng.choice(places)]
+        return query
+
+    queries = [random_query() for _ in range(requests)]
+
+    def run(label):
+        start = time.process_time()
+        results = [database.search_projects(query) for query in queries]
+        elapsed = time.process_time() - start
+        print(f"{label:<16}{elapsed * 1e6 / requests:8.1f}us/次")
+        return results
+
+    def shape(query) -> str:
+        if is_single_bucket(query):
+            return "单日(不经过缓存)"
+        if query.get("keywords"):
+            return "带关键词"
+        return "日期区间"
+
+    print(f"目录 {days * projects_per_day} 个项目，{requests} 次查询:")
+    database.query_cache = None
+    uncached = run("不使用缓存")
+    database.query_cache = QueryResultCache(Config.QUERY_CACHE_SIZE)
+    start = time.perf_counter()
+    database.prewarm_query_cache(Config.QUERY_CACHE_PREWARM_DAYS, Config.QUERY_CACHE_PREWARM_TYPES)
+    print(f"预热 {database.query_cache.stats['prewarmed']} 个条目 {(time.perf_counter() - start) * 1000:.1f}ms")
+    cached = run("使用缓存")
+    same = [[p["id"] for p in r] for r in cached] == [[p["id"] for p in r] for r in uncached]
+    print(f"结果{'一致' if same else '不一致'}；缓存统计: {database.query_cache.get_stats()}")
+
+    # 按查询形状分别计时，取几轮中最好的一次；单日查询强制走缓存，只为与其他形状对比
+    print("按查询形状(缓存已热):")
+    groups = {}
+    for query in queries:
+        groups.setdefault(shape(query), []).append(query)
+    cache = database.query_cache
+    for label, group in groups.items():
+        timings = []
+        for use_cache in (False, True):
+            database.query_cache = cache if use_cache else None
+            best = float("inf")
+            for _ in range(3):
+                start = time.process_time()
+                for query in group:
+                    if use_cache:
+                        database._cached_candidates(database.snapshot(), query, force=True)
+                    else:
+                        database._find_candidates(database.snapshot(), query)
+                best = min(best, time.process_time() - start)
+            timings.append(best * 1e6 / len(group))
+        print(f"  {label:<14}{len(group):>6}次  直接计算 {timings[0]:6.1f}us  查缓存 {timings[1]:6.1f}us")
+    database.query_cache = cache
+
+    before = database.query_cache.get_stats()["entries"]
+    project = database.snapshot().candidates_for_date(first_day.isoformat())[0]
+    database.update_project(project["id"], {"max_participants": 40})
+    print(f"修改 {project['date']} 的一个{project['type']}项目后，条目 {before} → "
+          f"{database.query_cache.get_stats()['entries']}")
+
+
+if __name__ == "__main__":
+    benchmark()
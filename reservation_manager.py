@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import time
+import heapq
+import secrets
+import logging
+import threading
+from typing import Dict, List, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientCapacityError(ValueError):
+    pass
+
+
+class Hold:
+    __slots__ = ("hold_id", "project_id", "participants", "expires_at")
+
+    def __init__(self, hold_id: str, project_id: int, participants: int, expires_at: float):
+        self.hold_id = hold_id
+        self.project_id = project_id
+        self.participants = participants
+        self.expires_at = expires_at
+
+    def to_dict(self) -> Dict:
+        return {
+            "hold_id": self.hold_id,
+            "project_id": self.project_id,
+            "participants": self.participants,
+            "expires_in": max(0.0, round(self.expires_at - time.monotonic(), 1))
+        }
+
+
+class ReservationManager:
+    """
+    按项目维护剩余名额的报名管理器。
+    每个项目通过 project_id 映射到固定数量的分段锁之一，不同项目的报名互不阻塞；
+    预留(hold)在超时后自动释放名额，确认(confirm)后转为正式报名。
+    """
+
+    def __init__(self, capacity_lookup: Callable[[int], Optional[int]], stripes: int = 64,
+                 hold_ttl: float = 300.0):
+        self.capacity_lookup = capacity_lookup
+        self.hold_ttl = hold_ttl
+        self._locks = [threading.Lock() for _ in range(max(1, stripes))]
+        self._confirmed: Dict[int, int] = {}
+        self._held: Dict[int, int] = {}
+        self._holds: Dict[str, Hold] = {}
+        self._expiry: Dict[int, List] = {}
+        self._stale: Dict[int, int] = {}
+        self._sweeper = None
+        self._stop = threading.Event()
+        self.stats = {"holds": 0, "confirmed": 0, "released": 0, "expired": 0, "rejected": 0}
+
+    def _lock_for(self, project_id: int) -> threading.Lock:
+        return self._locks[hash(project_id) % len(self._locks)]
+
+    def locked(self, project_id: int) -> threading.Lock:
+        """项目所在的分段锁；修改项目名额时持有它，保证与报名的名额检查互斥"""
+        return self._lock_for(project_id)
+
+    def _capacity(self, project_id: int) -> int:
+        capacity = self.capacity_lookup(project_id)
+        if capacity is None:
+            raise KeyError(f"项目 {project_id} 不存在")
+        return capacity
+
+    def _expire_locked(self, project_id: int, now: float):
+        heap = self._expiry.get(project_id)
+        while heap and heap[0][0] <= now:
+            _, hold_id = heapq.heappop(heap)
+            hold = self._holds.pop(hold_id, None)
+            if hold is not None:
+                self._held[project_id] -= hold.participants
+                self.stats["expired"] += 1
+            elif self._stale.get(project_id):
+                self._stale[project_id] -= 1
+        if heap is not None and not heap:
+            del self._expiry[project_id]
+            self._stale.pop(project_id, None)
+
+    def _discard_locked(self, project_id: int, hold: Hold):
+        """确认或释放预留后，它在过期堆里的条目作废；作废条目超过一半时重建堆，避免堆一直涨到TTL"""
+        self._held[project_id] -= hold.participants
+        heap = self._expiry[project_id]
+        if heap[0][1] == hold.hold_id:
+            heapq.heappop(heap)
+        else:
+            self._stale[project_id] = self._stale.get(project_id, 0) + 1
+            if self._stale[project_id] * 2 > len(heap):
+                heap[:] = [entry for entry in heap if entry[1] in self._holds]
+                heapq.heapify(heap)
+                self._stale[project_id] = 0
+        if not heap:
+            del self._expiry[project_id]
+            self._stale.pop(project_id, None)
+
+    def _remaining_locked(self, project_id: int, capacity: int) -> int:
+        return capacity - self._confirmed.get(project_id, 0) - self._held.get(project_id, 0)
+
+    def remaining(self, project_id: int, capacity: Optional[int] = None) -> int:
+        """查询剩余名额；只有存在已过期的预留时才会加锁清理"""
+        if capacity is None:
+            capacity = self._capacity(project_id)
+        heap = self._expiry.get(project_id)
+        if heap and heap[0][0] <= time.monotonic():
+            with self._lock_for(project_id):
+                self._expire_locked(project_id, time.monotonic())
+        return self._remaining_locked(project_id, capacity)
+
+    def reserved(self, project_id: int) -> int:
+        """已确认报名与未过期预留的人数之和"""
+        return self._confirmed.get(project_id, 0) + self._held.get(project_id, 0)
+
+    def hold(self, project_id: int, participants: int, ttl: Optional[float] = None) -> Hold:
+        """原子地检查并预留名额，超时未确认的预留会自动释放"""
+        if participants < 1:
+            raise ValueError("报名人数必须大于0")
+        now = time.monotonic()
+        with self._lock_for(project_id):
+            # 在锁内读名额，与 update_project 修改 max_participants 互斥
+            capacity = self._capacity(project_id)
+            self._expire_locked(project_id, now)
+            remaining = self._remaining_locked(project_id, capacity)
+            if participants > remaining:
+                self.stats["rejected"] += 1
+                raise InsufficientCapacityError(f"名额不足，剩余 {remaining} 个")
+            hold = Hold(f"{project_id}-{secrets.token_hex(8)}", project_id, participants,
+                        now + (ttl if ttl is not None else self.hold_ttl))
+            self._holds[hold.hold_id] = hold
+            self._held[project_id] = self._held.get(project_id, 0) + participants
+            heapq.heappush(self._expiry.setdefault(project_id, []), (hold.expires_at, hold.hold_id))
+            self.stats["holds"] += 1
+            return hold
+
+    def _project_of(self, hold_id: str) -> int:
+        try:
+            return int(hold_id.split('-', 1)[0])
+        except ValueError:
+            raise KeyError(f"预留 {hold_id} 不存在或已过期")
+
+    def confirm(self, hold_id: str) -> int:
+        """把预留转为正式报名，返回项目剩余名额"""
+        project_id = self._project_of(hold_id)
+        with self._lock_for(project_id):
+            self._expire_locked(project_id, time.monotonic())
+            if hold_id not in self._holds:
+                raise KeyError(f"预留 {hold_id} 不存在或已过期")
+            # 项目已被删除时拒绝确认，预留留给 forget 清理
+            capacity = self._capacity(project_id)
+            hold = self._holds.pop(hold_id)
+            self._discard_locked(project_id, hold)
+            self._confirmed[project_id] = self._confirmed.get(project_id, 0) + hold.participants
+            self.stats["confirmed"] += 1
+            return self._remaining_locked(project_id, capacity)
+
+    def release(self, hold_id: str) -> bool:
+        project_id = self._project_of(hold_id)
+        with self._lock_for(project_id):
+            hold = self._holds.pop(hold_id, None)
+            if hold is None:
+                return False
+            self._discard_locked(project_id, hold)
+            self.stats["released"] += 1
+            return True
+
+    def reserve(self, project_id: int, participants: int) -> int:
+        """直接确认报名，返回剩余名额"""
+        return self.confirm(self.hold(project_id, participants).hold_id)
+
+    def forget(self, project_id: int):
+        """项目被删除时清理它的计数和预留"""
+        with self._lock_for(project_id):
+            self._confirmed.pop(project_id, None)
+            self._held.pop(project_id, None)
+            self._stale.pop(project_id, None)
+            for _, hold_id in self._expiry.pop(project_id, []):
+                self._holds.pop(hold_id, None)
+
+    def sweep(self) -> int:
+        """清理所有项目中已过期的预留，返回被清理的项目数"""
+        now = time.monotonic()
+        swept = 0
+        for project_id, heap in list(self._expiry.items()):
+            if heap and heap[0][0] <= now:
+                with self._lock_for(project_id):
+                    self._expire_locked(project_id, now)
+                swept += 1
+        return swept
+
+    def start_sweeper(self, interval: float = 1.0):
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"清理过期预留失败: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="reservation-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats["active_holds"] = len(self._holds)
+        stats["expiry_entries"] = sum(len(heap) for heap in list(self._expiry.values()))
+        stats["lock_stripes"] = len(self._locks)
+        return stats
+
+
+def contend(manager: ReservationManager, project_id: int, threads: int, attempts: int) -> List[int]:
+    """多个线程同时对一个项目随机预留、确认和释放，返回预留后看到的超出名额的人数"""
+    import random
+    capacity = manager.capacity_lookup(project_id)
+    barrier = threading.Barrier(threads)
+    violations = []
+
+    def worker():
+        barrier.wait()
+        rng = random.Random()
+        for _ in range(attempts):
+            try:
+                hold = manager.hold(project_id, rng.randint(1, 3))
+            except InsufficientCapacityError:
+                continue
+            if manager.reserved(project_id) > capacity:
+                violations.append(manager.reserved(project_id))
+            action = rng.random()
+            if action < 0.05:
+                try:
+                    manager.confirm(hold.hold_id)
+                except KeyError:
+                    pass
+            elif action < 0.5:
+                manager.release(hold.hold_id)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return violations
+
+
+def stress_test(threads: int = 64, attempts: int = 2000, capacity: int = 20, stripes: int = 64):
+    """多线程同时抢同一个热门项目，测量吞吐；不超卖等正确性见 tests/test_reservation_manager.py"""
+    manager = ReservationManager(lambda project_id: capacity, stripes=stripes, hold_ttl=0.005)
+    start = time.perf_counter()
+    violations = contend(manager, 3, threads, attempts)
+    elapsed = time.perf_counter() - start
+    manager.sweep()
+    time.sleep(0.01)
+    manager.sweep()
+    print(f"线程数={threads} 尝试次数={threads * attempts} 耗时={elapsed:.2f}s "
+          f"吞吐={threads * attempts / elapsed:.0f}次/秒")
+    print(f"统计: {manager.get_stats()}, 已确认={manager._confirmed.get(3, 0)}, 剩余={manager.remaining(3)}, "
+          f"超卖 {len(violations)} 次")
+    return elapsed
+
+
+if __name__ == "__main__":
+    stress_test()
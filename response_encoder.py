@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import logging
+import threading
+from collections import OrderedDict
+from json.encoder import encode_basestring
+from typing import Dict, List, Optional, Any, Tuple, Callable
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _load_brotli():
+    """brotli 是可选依赖，没有安装时只使用gzip"""
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+class JSONEncoder:
+    """
+    响应编码器接口: encode() 把响应对象编码成UTF-8字节。
+    解析结果等对象按 to_dict() 序列化。
+    """
+
+    name = "base"
+
+    def dumps(self, payload: Any) -> str:
+        raise NotImplementedError
+
+    def encode(self, payload: Any) -> bytes:
+        return self.dumps(payload).encode('utf-8')
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"encoder": self.name}
+
+
+def _to_serializable(o):
+    if hasattr(o, "to_dict"):
+        return o.to_dict()
+    raise TypeError(f"无法序列化 {type(o).__name__} 类型的对象")
+
+
+class AsciiJSONEncoder(JSONEncoder):
+    """与原来 jsonify 的输出相同: 键排序、非ASCII字符转义为 \\uXXXX"""
+
+    name = "ascii"
+
+    def dumps(self, payload: Any) -> str:
+        return json.dumps(payload, ensure_ascii=True, sort_keys=True, separators=(',', ':'),
+                          default=_to_serializable)
+
+
+class UTF8JSONEncoder(JSONEncoder):
+    """
+    直接输出UTF-8，不转义汉字。is_static_row 判断一个字典是否是目录中不可变的项目行，
+    这类行只序列化一次，之后直接拼接缓存的片段；缓存按项目id保存，
+    同时保存行对象本身，对象被替换(项目被修改)后自动重新序列化。
+    """
+
+    name = "utf8"
+
+    def __init__(self, is_static_row: Optional[Callable[[Dict], bool]] = None, max_fragments: int = 8192):
+        self.is_static_row = is_static_row
+        self.max_fragments = max_fragments
+        self._fragments: "OrderedDict[Any, Tuple[Dict, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"fragment_hits": 0, "fragment_misses": 0}
+
+    def dumps(self, payload: Any) -> str:
+        if self.is_static_row is None:
+            return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=_to_serializable)
+        parts = []
+        self._write(payload, parts)
+        return ''.join(parts)
+
+    def _row_fragment(self, row: Dict) -> str:
+        key = row.get("id")
+        cached = self._fragments.get(key)
+        if cached is not None and cached[0] is row:
+            self.stats["fragment_hits"] += 1
+            return cached[1]
+        self.stats["fragment_misses"] += 1
+        fragment = json.dumps(row, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._fragments[key] = (row, fragment)
+            if len(self._fragments) > self.max_fragments:
+                self._fragments.popitem(last=False)
+        return fragment
+
+    def _write(self, value: Any, parts: List[str]):
+        # 只在容器这一层用Python递归，标量直接用C实现的 encode_basestring / repr
+        if isinstance(value, str):
+            parts.append(encode_basestring(value))
+        elif value is None:
+            parts.append('null')
+        elif value is True:
+            parts.append('true')
+        elif value is False:
+            parts.append('false')
+        elif isinstance(value, int):
+            parts.append(int.__repr__(value))
+        elif isinstance(value, float):
+            parts.append(json.dumps(value))
+        elif isinstance(value, dict):
+            if "id" in value and self.is_static_row(value):
+                parts.append(self._row_fragment(value))
+                return
+            parts.append('{')
+            first = True
+            for key, item in value.items():
+                if not first:
+                    parts.append(',')
+                first = False
+                parts.append(encode_basestring(key if isinstance(key, str) else str(key)))
+                parts.append(':')
+                self._write(item, parts)
+            parts.append('}')
+        elif isinstance(value, (list, tuple)):
+            parts.append('[')
+            for index, item in enumerate(value):
+                if index:
+                    parts.append(',')
+                self._write(item, parts)
+            parts.append(']')
+        else:
+            self._write(_to_serializable(value), parts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats, encoder=self.name)
+        stats["fragments"] = len(self._fragments)
+        return stats
+
+
+class ResponseCompressor:
+    """响应体超过 min_bytes 且客户端支持时压缩，优先brotli(已安装时)，其次gzip"""
+
+    def __init__(self, min_bytes: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.brotli = _load_brotli()
+        self.stats = {"compressed": 0, "uncompressed": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def choose(self, accept_encoding: str) -> Optional[str]:
+        accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+        if self.brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def compress(self, body: bytes, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """返回 (响应体, Content-Encoding)，不压缩时编码为None"""
+        encoding = self.choose(accept_encoding) if len(body) >= self.min_bytes else None
+        if encoding is None:
+            self.stats["uncompressed"] += 1
+            return body, None
+        if encoding == 'br':
+            compressed = self.brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        self.stats["compressed"] += 1
+        self.stats["bytes_in"] += len(body)
+        self.stats["bytes_out"] += len(compressed)
+        return compressed, encoding
+
+
+def create_encoder(kind: Optional[str] = None, is_static_row: Optional[Callable[[Dict], bool]] = None) -> JSONEncoder:
+    kind = kind or Config.RESPONSE_ENCODER
+    if kind == "ascii":
+        return AsciiJSONEncoder()
+    if kind == "utf8":
+        return UTF8JSONEncoder(is_static_row)
+    raise ValueError(f"未知的响应编码器: {kind}")
+
+
+def create_compressor() -> Optional[ResponseCompressor]:
+    if Config.RESPONSE_COMPRESSION != 'on':
+        return None
+    compressor = ResponseCompressor(Config.RESPONSE_COMPRESS_MIN_BYTES)
+    if compressor.brotli is None:
+        logger.info("未安装brotli，响应压缩只使用gzip")
+    return compressor
+
+
+def benchmark(repeat: int = 200):
+    """用典型的 /api/process 和 /api/test 响应，对比原来的 jsonify 输出与UTF-8编码器的字节数和编码耗时；输出一致性见 tests/test_response_encoder.py"""
+    import time
+    import logging as _logging
+    import jieba
+    from volunteer_nlp_system import VolunteerNLPEngine, VolunteerDatabase
+    from catalogue_index import group_by_day
+    from datetime import date, timedelta
+
+    _logging.getLogger().setLevel(_logging.WARNING)
+    jieba.setLogLevel(_logging.WARNING)
+    engine = VolunteerNLPEngine()
+    database = VolunteerDatabase()
+    first_day = date.today() + timedelta(days=1)
+    for offset in range(30):
+        for number in range(8):
+            database.add_project({
+                "name": f"社区环保宣传第{number + 1}组", "type": "环保",
+                "date": (first_day + timedelta(days=offset)).isoformat(), "time": "08:00-12:00",
+                "age_limit": "12-60", "max_participants": 30, "description": "在社区开展垃圾分类宣传，发放环保手册",
+                "location": "东湖社区公园", "latitude": 30.575, "longitude": 114.372
+            })
+
+    def process_response(text):
+        result = engine.process_natural_language(text)
+        query = engine.generate_database_query(result)
+        return {"original_text": text, "extracted_info": result, "structured_data": query,
+                "matched_by_date": database.search_projects_by_day(query), "needs_clarification": False,
+                "questions": [], "warnings": [], "session_id": None}
+
+    texts = ["我和朋友都是16岁，明天上午想参加环保活动", "我们三个人下个月的周末想做环保，都是18岁"]
+    test_results = []
+    for text in texts:
+        result = engine.process_natural_language(text)
+        matched = database.search_projects(engine.generate_database_query(result))
+        test_results.append({"input": text, "processed_data": result, "matched_projects": matched,
+                             "matched_by_date": group_by_day(matched), "project_count": len(matched)})
+    payloads = [("/api/process 单日", process_response(texts[0])),
+                ("/api/process 整月周末", process_response(texts[1])),
+                ("/api/test", {"test_results": test_results, "total_tests": len(texts)})]
+
+    legacy = AsciiJSONEncoder()
+    utf8_plain = UTF8JSONEncoder()
+    utf8 = UTF8JSONEncoder(lambda row: database.get_project(row["id"]) is row)
+    compressor = ResponseCompressor(min_bytes=1024)
+
+    print(f"{'响应':<20}{'编码器':<22}{'字节数':>8}{'gzip后':>8}{'编码耗时':>12}")
+    for label, payload in payloads:
+        for name, encode in (("jsonify(ASCII转义)", legacy.encode), ("UTF-8", utf8_plain.encode),
+                             ("UTF-8+项目行片段缓存", utf8.encode)):
+            body = encode(payload)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                encode(payload)
+            elapsed = (time.perf_counter() - start) / repeat
+            compressed, _ = compressor.compress(body, 'gzip')
+            print(f"{label:<20}{name:<22}{len(body):>8}{len(compressed):>8}{elapsed * 1e6:>10.1f}us")
+        start = time.perf_counter()
+        for _ in range(repeat):
+            compressor.compress(utf8.encode(payload), 'gzip')
+        print(f"{label:<20}{'UTF-8+缓存+gzip':<22}{'':>16}{(time.perf_counter() - start) / repeat * 1e6:>10.1f}us")
+    print(f"片段缓存: {utf8.get_stats()}")
+
+
+if __name__ == "__main__":
+    benchmark()
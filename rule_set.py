@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Optional, Any, Tuple, Pattern
+
+import jieba
+
+from chinese_numerals import compile_quantity
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _keyword_pattern(keywords: List[str]) -> Pattern:
+    """一类关键词编译成一个正则，长词在前；只关心是否出现，比逐个 in 判断快"""
+    if not keywords:
+        raise ValueError("关键词列表不能为空")
+    return re.compile('|'.join(map(re.escape, sorted(set(keywords), key=len, reverse=True))))
+
+
+def _compile_types(entries: List[Dict]) -> Tuple[Tuple[str, Pattern], ...]:
+    return tuple((entry["name"], _keyword_pattern(entry["keywords"])) for entry in entries)
+
+
+class RuleSet:
+    """
+    从规则文件编译出的不可变规则集: 正则、关键词匹配和映射表都在编译时生成。
+    抽取时一个请求只取一次 RuleSet 的引用，热更新换上的新规则集不会影响正在处理的请求。
+    """
+
+    __slots__ = ("version", "digest", "max_people_count", "max_future_days", "age_pattern", "people_pattern",
+                 "distance_km_pattern", "distance_m_pattern", "nearby_pattern", "nearest_pattern",
+                 "time_range_patterns", "time_of_day", "evening_words", "llm_time_of_day", "people_phrases",
+                 "activity_types", "llm_activity_types", "keyword_stopwords", "jieba_words")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("规则集不可修改，请修改规则文件后重新加载")
+
+    @classmethod
+    def compile(cls, data: Dict[str, Any]) -> "RuleSet":
+        """校验并编译规则文件的内容，格式不正确时抛出ValueError"""
+        try:
+            patterns = data["patterns"]
+            max_people_count = int(data["max_people_count"])
+            max_future_days = int(data["max_future_days"])
+            if max_people_count < 1 or max_future_days < 1:
+                raise ValueError("max_people_count和max_future_days必须是正整数")
+            return cls(
+                version=data["version"],
+                # 规则内容的哈希，作缓存键: 改了规则却忘了改 version 时旧缓存也不会再命中，
+                # 多个worker加载同一份文件得到的值相同，共享缓存照样能命中
+                digest=hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16],
+                max_people_count=max_people_count,
+                max_future_days=max_future_days,
+                age_pattern=compile_quantity(patterns["age"]),
+                people_pattern=compile_quantity(patterns["people"]),
+                distance_km_pattern=compile_quantity(patterns["distance_km"]),
+                distance_m_pattern=compile_quantity(patterns["distance_m"]),
+                nearby_pattern=re.compile(patterns["nearby"]),
+                nearest_pattern=re.compile(patterns["nearest"]),
+                time_range_patterns=tuple(re.compile(p) for p in patterns["time_ranges"]),
+                time_of_day=tuple((word, time_range) for word, time_range in data["time_of_day"]),
+                evening_words=tuple(data["evening_words"]),
+                llm_time_of_day=MappingProxyType(dict(data["llm_time_of_day"])),
+                people_phrases=tuple((phrase, int(count)) for phrase, count in data["people_phrases"]),
+                activity_types=_compile_types(data["activity_types"]),
+                llm_activity_types=_compile_types(data["llm_activity_types"]),
+                keyword_stopwords=frozenset(data["keyword_stopwords"]),
+                jieba_words=tuple(data.get("jieba_words", ())),
+            )
+        except re.error as e:
+            raise ValueError(f"规则文件中的正则表达式无效: {e}")
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"规则文件缺少字段或格式不正确: {e}")
+
+    @classmethod
+    def load(cls, path: str) -> "RuleSet":
+        with open(path, encoding="utf-8") as f:
+            return cls.compile(json.load(f))
+
+    def activity_type(self, text: str) -> str:
+        """按 activity_types 的顺序，第一个有关键词出现在文本中的类型"""
+        for name, pattern in self.activity_types:
+            if pattern.search(text):
+                return name
+        return "综合"
+
+
+class RuleStore:
+    """
+    持有当前规则集。文件变化后在后台线程中编译新规则集，编译成功才整体替换引用；
+    编译失败时保留旧规则集并记录错误。jieba只能增加词，热更新删除的词在重启前仍然有效。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = self._file_signature()
+        self._current = RuleSet.load(path)
+        self._install_words(self._current)
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self.stats = {"reloads": 0, "failures": 0, "last_error": None, "loaded_at": time.time()}
+
+    @property
+    def current(self) -> RuleSet:
+        return self._current
+
+    def _file_signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _install_words(rule_set: RuleSet):
+        for word in rule_set.jieba_words:
+            jieba.add_word(word)
+
+    def reload(self, force: bool = False) -> bool:
+        """文件有变化(或force)时重新加载，返回是否换上了新规则集"""
+        with self._lock:
+            try:
+                signature = self._file_signature()
+                if not force and signature == self._signature:
+                    return False
+                # 先记下文件签名，加载失败时不会在每次轮询时重复报错，文件再次修改后才重试
+                self._signature = signature
+                rule_set = RuleSet.load(self.path)
+            except (OSError, ValueError) as e:
+                self.stats["failures"] += 1
+                self.stats["last_error"] = str(e)
+                logger.error(f"加载规则文件 {self.path} 失败，继续使用版本 {self._current.version}: {e}")
+                return False
+            # 先加词再替换引用，新规则集生效时分词词典已经就绪
+            self._install_words(rule_set)
+            previous, self._current = self._current, rule_set
+            self.stats["reloads"] += 1
+            self.stats["last_error"] = None
+            self.stats["loaded_at"] = time.time()
+        logger.info(f"规则已从版本 {previous.version} 更新为 {rule_set.version}")
+        return True
+
+    def start_watcher(self, interval: float = 5.0):
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                self.reload()
+
+        self._watcher = threading.Thread(target=run, name="rule-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, version=self._current.version, digest=self._current.digest, path=self.path)
+
+
+@lru_cache(maxsize=4)
+def _store_for(path: str) -> RuleStore:
+    return RuleStore(path)
+
+
+def load_rules(path: Optional[str] = None) -> RuleStore:
+    """每个进程每个规则文件只有一个 RuleStore，默认使用 RULES_PATH 指向的随包规则文件"""
+    return _store_for(path or Config.RULES_PATH)
+
+
+def benchmark(iterations: int = 200, readers: int = 4):
+    """测量规则编译耗时；读线程持续解析的同时反复热更新，检查每次解析(抽取和 build_result)只用到一个版本的规则集"""
+    import shutil
+    import tempfile
+    from volunteer_nlp_system import VolunteerNLPEngine
+
+    logging.disable(logging.INFO)
+    jieba.setLogLevel(logging.WARNING)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "rules.json")
+    shutil.copy(Config.RULES_PATH, path)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        re.purge()
+        RuleSet.compile(data)
+    print(f"编译规则集 {(time.perf_counter() - start) / iterations * 1000:.2f}ms/次")
+
+    store = RuleStore(path)
+    engine = VolunteerNLPEngine(rules=store)
+    text = "我和我朋友都是16岁，我和他要做一个在4月3号上午的志愿活动，我们想做环保类型的"
+    start = time.perf_counter()
+    for _ in range(iterations):
+        engine.extract_slots(text)
+    idle = (time.perf_counter() - start) / iterations
+
+    # 偶数版本去掉 "环保" 关键词、让年龄模式失效并把人数上限降为1(在 build_result 中生效)，
+    # 同一次解析若混用两个版本，年龄、类型和人数会对不上
+    versions = {}
+    for version in (0, 1):
+        variant = json.loads(json.dumps(data))
+        if version == 0:
+            variant["patterns"]["age"] = "{n}周年"
+            variant["activity_types"][0]["keywords"].remove("环保")
+            variant["max_people_count"] = 1
+        versions[version] = variant
+    stop = threading.Event()
+    results = []
+
+    def reader():
+        count, elapsed, inconsistent, old_version = 0, 0.0, 0, 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            result = engine.process_natural_language(text)
+            elapsed += time.perf_counter() - started
+            count += 1
+            even = result.age == "不限"
+            if even != (result.activity_type != "环保") or even != (result.people == 1):
+                inconsistent += 1
+            old_version += even
+        results.append((count, elapsed, inconsistent, old_version))
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    reload_times = []
+    for version in range(2, 2 + iterations // 4):
+        variant = dict(versions[version % 2], version=version)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(variant, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        started = time.perf_counter()
+        store.reload(force=True)
+        reload_times.append(time.perf_counter() - started)
+        time.sleep(0.005)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    shutil.rmtree(directory)
+    count = sum(r[0] for r in results)
+    even = sum(r[3] for r in results)
+    print(f"单线程抽取 {idle * 1e6:.1f}us/次")
+    print(f"{readers} 个读线程共解析 {count} 次，期间热更新 {len(reload_times)} 次 "
+          f"(编译+替换平均 {sum(reload_times) / len(reload_times) * 1000:.2f}ms)，"
+          f"偶数/奇数版本分别用到 {even}/{count - even} 次，混用两个版本的解析 {sum(r[2] for r in results)} 次")
+
+if __name__ == "__main__":
+    benchmark()
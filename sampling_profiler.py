@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import secrets
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Any
+
+
+class SamplingProfiler:
+    """
+    按需开启的采样profiler: 开启后后台线程每隔 interval 秒用 sys._current_frames() 取一次
+    正在处理请求的线程的调用栈，按栈聚合计数，输出 flamegraph.pl / speedscope 可读的 collapsed stack 格式。
+    关闭时没有采样线程，请求钩子只检查一次 active 属性。
+    """
+
+    def __init__(self, interval: float = 0.01, max_seconds: float = 60.0, max_stacks: int = 10000):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.max_stacks = max_stacks
+        self.active = False
+        self._lock = threading.Lock()
+        self._threads = set()
+        self._stop = threading.Event()
+        self._labels: Dict[Any, str] = {}
+        self._result: Optional[Dict[str, Any]] = None
+        self._session: Optional[Dict[str, Any]] = None
+
+    def start(self, seconds: Optional[float] = None, requests: Optional[int] = None,
+              interval: Optional[float] = None, all_threads: bool = False) -> Dict[str, Any]:
+        """开始一次采样，在 seconds 秒后或处理完 requests 个请求后结束(都不超过 max_seconds)，已在采样时抛出RuntimeError"""
+        seconds = min(seconds or self.max_seconds, self.max_seconds)
+        interval = interval or self.interval
+        if seconds <= 0 or interval <= 0 or (requests is not None and requests < 1):
+            raise ValueError("采样时长、间隔和请求数必须是正数")
+        with self._lock:
+            if self.active:
+                raise RuntimeError("已有采样正在进行")
+            self._session = {"seconds": seconds, "requests": requests, "interval_ms": interval * 1000,
+                             "all_threads": all_threads, "started": time.time(), "finished_requests": 0,
+                             "samples": 0, "stacks": Counter()}
+            self._threads.clear()
+            self._stop.clear()
+            self.active = True
+        thread = threading.Thread(target=self._run, args=(self._session, time.monotonic() + seconds, interval),
+                                  name="sampling-profiler", daemon=True)
+        thread.start()
+        return self.status()
+
+    def stop(self):
+        self._stop.set()
+
+    def request_started(self):
+        # 与采样结束时清空 _threads 互斥，结束之后才到的请求不再登记
+        with self._lock:
+            if self.active:
+                self._threads.add(threading.get_ident())
+
+    def request_finished(self):
+        ident = threading.get_ident()
+        with self._lock:
+            if ident not in self._threads:
+                return
+            self._threads.discard(ident)
+            session = self._session
+            session["finished_requests"] += 1
+            done = session["requests"] is not None and session["finished_requests"] >= session["requests"]
+        if done:
+            self._stop.set()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _run(self, session: Dict[str, Any], deadline: float, interval: float):
+        own = threading.get_ident()
+        stacks = session["stacks"]
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if session["all_threads"]:
+                idents = frames.keys()
+            else:
+                with self._lock:
+                    idents = tuple(self._threads)
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack = ';'.join(reversed(labels))
+                if stack not in stacks and len(stacks) >= self.max_stacks:
+                    stack = "[其他调用栈]"
+                stacks[stack] += 1
+                session["samples"] += 1
+            del frames
+        with self._lock:
+            self.active = False
+            self._threads.clear()
+            session["duration"] = round(time.time() - session["started"], 3)
+            self._result = session
+
+    def status(self) -> Dict[str, Any]:
+        session = self._session
+        if session is None:
+            return {"active": False}
+        status = {key: value for key, value in session.items() if key != "stacks"}
+        status["active"] = self.active
+        status["distinct_stacks"] = len(session["stacks"])
+        return status
+
+    def collapsed(self) -> Optional[str]:
+        """最近一次已结束采样的 collapsed stack 文本，每行 "帧;帧;帧 次数"，还没有结果时返回None"""
+        result = self._result
+        if result is None:
+            return None
+        return ''.join(f"{stack} {count}\n" for stack, count in result["stacks"].most_common())
+
+
+class RequestProfiles:
+    """单个请求的 cProfile 结果，只保留最近 max_profiles 个，按编号取回"""
+
+    def __init__(self, max_profiles: int = 16, limit: int = 40):
+        self.max_profiles = max_profiles
+        self.limit = limit
+        self._profiles: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def start() -> cProfile.Profile:
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, profile: cProfile.Profile, label: str) -> str:
+        """停止profile，保存按累计耗时排序的前 limit 个函数，返回编号"""
+        profile.disable()
+        stream = io.StringIO()
+        stream.write(f"{label}\n")
+        pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(self.limit)
+        profile_id = secrets.token_hex(8)
+        with self._lock:
+            self._profiles[profile_id] = stream.getvalue()
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[str]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+def benchmark(seconds: float = 2.0, rounds: int = 3):
+    """对比不采样和以10ms、1ms间隔采样时规则引擎解析加检索的吞吐，并打印采样中最热的函数"""
+    import logging
+    import jieba
+    from volunteer_nlp_system import VolunteerNLPEngine, VolunteerDatabase
+
+    logging.disable(logging.INFO)
+    jieba.setLogLevel(logging.WARNING)
+    engine = VolunteerNLPEngine()
+    database = VolunteerDatabase()
+    texts = ["我和我朋友都是16岁，想参加明天上午的环保活动", "我18岁，想一个人参加下周六下午的社区服务",
+             "我们三个人想在4月3号做一些教育相关的事情，都是20岁", "明天下午两个人去敬老院，我们17岁"]
+    profiler = SamplingProfiler()
+
+    def workload() -> float:
+        if profiler.active:
+            profiler.request_started()
+        count = 0
+        start = time.process_time()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            result = engine.process_natural_language(texts[count % len(texts)])
+            database.search_projects(engine.generate_database_query(result))
+            count += 1
+        elapsed = time.process_time() - start
+        if profiler.active:
+            profiler.request_finished()
+        return count / elapsed
+
+    # 交替测量几轮、各取最好的一次，避免预热和缓存的影响落到某一种配置上
+    workload()
+    best = {}
+    for _ in range(rounds):
+        for interval in (None, 0.01, 0.001):
+            if interval is not None:
+                profiler.start(seconds=seconds + 1, interval=interval)
+            rate = workload()
+            if interval is not None:
+                profiler.stop()
+                while profiler.active:
+                    time.sleep(0.01)
+            best[interval] = max(best.get(interval, 0.0), rate)
+    baseline = best[None]
+    print(f"{'不采样':<12}{baseline:10.0f} 次/CPU秒")
+    for interval in (0.01, 0.001):
+        print(f"{f'{interval * 1000:g}ms间隔':<12}{best[interval]:10.0f} 次/CPU秒  "
+              f"开销 {(1 - best[interval] / baseline) * 100:5.1f}%")
+    status = profiler.status()
+    print(f"最后一次采样: 样本 {status['samples']}，不同调用栈 {status['distinct_stacks']}")
+
+    leaves = Counter()
+    for line in profiler.collapsed().splitlines():
+        stack, count = line.rsplit(' ', 1)
+        leaves[stack.rsplit(';', 1)[-1]] += int(count)
+    total = sum(leaves.values())
+    print("\n采样最多的叶子函数:")
+    for label, count in leaves.most_common(8):
+        print(f"  {count / total:6.1%}  {label}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+
+class SessionStore:
+    """
+    有容量上限、按TTL淘汰的内存会话存储，保存多轮追问中已填充的槽位。
+    超过容量时淘汰最久未访问的会话。
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 600.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "resumed": 0, "expired": 0, "evicted": 0, "completed": 0}
+
+    def _purge_expired(self, now: float):
+        while self._sessions:
+            session_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[session_id]
+            self.stats["expired"] += 1
+
+    def create(self, state: Dict[str, Any]) -> str:
+        session_id = secrets.token_urlsafe(16)
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            self._sessions[session_id] = (now + self.ttl, state)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.stats["evicted"] += 1
+            self.stats["created"] += 1
+        return session_id
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, state = entry
+            if expires_at <= now:
+                del self._sessions[session_id]
+                self.stats["expired"] += 1
+                return None
+            self._sessions[session_id] = (now + self.ttl, state)
+            self._sessions.move_to_end(session_id)
+            self.stats["resumed"] += 1
+            return state
+
+    def update(self, session_id: str, state: Dict[str, Any]):
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id] = (time.monotonic() + self.ttl, state)
+                self._sessions.move_to_end(session_id)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is not None:
+                self.stats["completed"] += 1
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats["active"] = len(self._sessions)
+        return stats
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, Callable, List
+
+from datetime import datetime, timedelta
+from volunteer_nlp_system import VolunteerNLPEngine
+from text_normalizer import normalize_text
+from prompt_templates import SLOT_NAMES, estimate_tokens
+from model_backends import ModelBackend
+
+
+class StubChatModel(ModelBackend):
+    """
+    确定性的本地桩模型，用于离线评测，不依赖真实的大模型服务。
+    可以按提示词token和输出token分别计费延迟，模拟真实模型的耗时特征。
+
+    评测时传入 answers(规范化后的输入文本 → 金标槽位)，回答取自金标而不是规则引擎，
+    再按 omission_rate / error_rate 逐槽位漏答或答错、按 malformed_rate 整条回复截断，
+    这样预填、合并和规则回退路径才真正被打分。噪声按 (seed, 文本, 槽位) 确定，重复运行结果相同。
+    不传 answers 时(负载测试、提示词基准)用规则引擎的抽取器生成看起来合理的回答。
+    """
+
+    name = "stub"
+    _input_pattern = re.compile(r'用户输入：(.*)')
+    _schema_pattern = re.compile(r'输出JSON：(\{.*\})')
+    ACTIVITY_TYPES = ("环保", "教育", "社区服务", "医疗")
+
+    def __init__(self, preamble: str = "好的，提取结果如下：", prompt_token_ms: float = 0.0,
+                 output_token_ms: float = 0.0, answers: Optional[Dict[str, Dict[str, Any]]] = None,
+                 omission_rate: float = 0.0, error_rate: float = 0.0, malformed_rate: float = 0.0, seed: int = 0):
+        self.preamble = preamble
+        self.prompt_token_ms = prompt_token_ms
+        self.output_token_ms = output_token_ms
+        self.answers = {normalize_text(text): dict(slots) for text, slots in answers.items()} if answers else None
+        self.omission_rate = omission_rate
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self.rule_engine = VolunteerNLPEngine() if answers is None else None
+        self.calls = 0
+        self.prompt_chars = 0
+        self.response_chars = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.injected = {"omitted": 0, "wrong": 0, "malformed": 0}
+        self._lock = threading.Lock()
+
+    def _extract_user_text(self, prompt: str) -> str:
+        match = self._input_pattern.search(prompt)
+        return match.group(1).strip() if match else prompt
+
+    def _requested_slots(self, prompt: str):
+        match = self._schema_pattern.search(prompt)
+        if match:
+            try:
+                return [slot for slot in json.loads(match.group(1)) if slot in SLOT_NAMES]
+            except ValueError:
+                pass
+        return SLOT_NAMES
+
+    def extract(self, text: str) -> Dict[str, Any]:
+        if self.answers is not None:
+            # 语料之外的输入模型"什么都没看出来"
+            return dict(self.answers.get(normalize_text(text), {}))
+        engine = self.rule_engine
+        return {
+            "年龄": engine.extract_age(text),
+            "人数": engine.extract_people_count(text),
+            "日期": engine.extract_date(text),
+            "时间": engine.extract_time_range(text),
+            "活动类型": engine.extract_activity_type(text)
+        }
+
+    def _wrong(self, slot: str, value: Any, rng: random.Random) -> Any:
+        """把一个槽位答错成同类型的另一个值"""
+        if slot == "年龄":
+            return value + rng.choice((-3, -1, 1, 3))
+        if slot == "人数":
+            return value + rng.choice((1, 2))
+        if slot == "日期":
+            return (datetime.strptime(value, '%Y-%m-%d') + timedelta(days=rng.choice((-1, 1)))).strftime('%Y-%m-%d')
+        if slot == "时间":
+            return "上午" if value != "08:00-12:00" else "下午"
+        return rng.choice([t for t in self.ACTIVITY_TYPES if t != value])
+
+    def _with_noise(self, text: str, slots: Dict[str, Any]) -> Dict[str, Any]:
+        noisy = {}
+        for slot, value in slots.items():
+            rng = random.Random(f"{self.seed}|{text}|{slot}")
+            roll = rng.random()
+            if value is not None and roll < self.omission_rate:
+                value = None
+                with self._lock:
+                    self.injected["omitted"] += 1
+            elif value is not None and roll < self.omission_rate + self.error_rate:
+                value = self._wrong(slot, value, rng)
+                with self._lock:
+                    self.injected["wrong"] += 1
+            noisy[slot] = value
+        return noisy
+
+    def complete(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        text = normalize_text(self._extract_user_text(prompt))
+        slots = self.extract(text)
+        slots = {slot: slots.get(slot) for slot in self._requested_slots(prompt)}
+        if self.answers is not None:
+            slots = self._with_noise(text, slots)
+        body = json.dumps(slots, ensure_ascii=False, separators=(',', ':'))
+        if self.malformed_rate and random.Random(f"{self.seed}|{text}").random() < self.malformed_rate:
+            # 回复在JSON中间被截断，解析失败后走规则回退
+            body = body[:len(body) // 2]
+            with self._lock:
+                self.injected["malformed"] += 1
+        content = f"{self.preamble}\n```json\n{body}\n```" if self.preamble else body
+        prompt_tokens = estimate_tokens(prompt)
+        response_tokens = estimate_tokens(content)
+        delay = (prompt_tokens * self.prompt_token_ms + response_tokens * self.output_token_ms) / 1000.0
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+            self.response_chars += len(content)
+            self.prompt_tokens += prompt_tokens
+            self.response_tokens += response_tokens
+        return content
+
+    def reset_stats(self):
+        with self._lock:
+            self.injected = {"omitted": 0, "wrong": 0, "malformed": 0}
+            self.calls = 0
+            self.prompt_chars = 0
+            self.response_chars = 0
+            self.prompt_tokens = 0
+            self.response_tokens = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "prompt_chars": self.prompt_chars,
+            "response_chars": self.response_chars,
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens,
+            "injected": dict(self.injected)
+        }
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    解析延迟分布，返回按分布抽样秒数的函数。单位都是毫秒:
+    "fixed:200"、"uniform:100:500"、"exp:200"(均值)、"lognormal:300:0.5"(中位数, sigma)
+    """
+    kind, _, args = spec.partition(':')
+    try:
+        values = [float(v) for v in args.split(':')] if args else []
+    except ValueError:
+        values = []
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "exp" and len(values) == 1 and values[0] > 0:
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000
+    if kind == "lognormal" and len(values) == 2 and values[0] > 0:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"无效的延迟分布: {spec}，应为 fixed:ms、uniform:ms:ms、exp:ms 或 lognormal:ms:sigma")
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """
+    OpenAI 兼容的 /v1/chat/completions 桩服务，回复由 StubChatModel 生成，可以注入故障:
+    按分布抽样的延迟、返回500的比例、挂起不响应(模拟超时)的比例、回复JSON被截断的比例。
+    GET /stats 返回各类回复的计数。
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency: str = "fixed:0", error_rate: float = 0.0, timeout_rate: float = 0.0,
+                 malformed_rate: float = 0.0, hang_seconds: float = 60.0, seed: Optional[int] = None):
+        if error_rate + timeout_rate + malformed_rate > 1:
+            raise ValueError("错误、超时和畸形回复的比例之和不能超过1")
+        self.model = StubChatModel()
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.malformed_rate = malformed_rate
+        self.hang_seconds = hang_seconds
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "error": 0, "timeout": 0, "malformed": 0, "latency_ms": 0.0}
+        super().__init__(address, _StubLLMHandler)
+
+    def draw(self):
+        """抽样本次回复的 (故障类型, 延迟秒数)，故障类型为 None 表示正常回复"""
+        with self._lock:
+            roll = self._rng.random()
+            delay = self.latency(self._rng)
+            if roll < self.error_rate:
+                fault = "error"
+            elif roll < self.error_rate + self.timeout_rate:
+                fault = "timeout"
+            elif roll < self.error_rate + self.timeout_rate + self.malformed_rate:
+                fault = "malformed"
+            else:
+                fault = None
+            self.stats["requests"] += 1
+            self.stats[fault or "ok"] += 1
+            self.stats["latency_ms"] += delay * 1000
+        return fault, delay
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["avg_latency_ms"] = round(stats.pop("latency_ms") / stats["requests"], 1) if stats["requests"] else 0.0
+        return stats
+
+
+class _StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.server.get_stats())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send_json(400, {"error": "请求体不是JSON"})
+            return
+        if self.path != "/v1/chat/completions":
+            self._send_json(404, {"error": "not found"})
+            return
+        server = self.server
+        fault, delay = server.draw()
+        if fault == "timeout":
+            # 挂起到客户端超时断开；之后的写入失败直接忽略
+            time.sleep(server.hang_seconds)
+            self.close_connection = True
+            return
+        time.sleep(delay)
+        if fault == "error":
+            self._send_json(500, {"error": {"message": "桩服务注入的错误", "type": "server_error"}})
+            return
+        prompt = payload["messages"][-1]["content"]
+        content = server.model.complete(prompt, payload.get("max_tokens"))
+        if fault == "malformed":
+            content = content[:len(content) // 2]
+        self._send_json(200, {
+            "id": f"stub-{server.stats['requests']}",
+            "object": "chat.completion",
+            "model": payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]
+        })
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="带延迟和故障注入的本地桩模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="lognormal:400:0.6",
+                        help="延迟分布(ms): fixed:200、uniform:100:500、exp:200、lognormal:中位数:sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500的比例")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="挂起不响应的比例")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="回复JSON被截断的比例")
+    parser.add_argument("--hang-seconds", type=float, default=60.0, help="挂起的秒数，应大于客户端超时")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    try:
+        server = StubLLMServer((args.host, args.port), args.latency, args.error_rate, args.timeout_rate,
+                               args.malformed_rate, args.hang_seconds, args.seed)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"桩模型服务: http://{args.host}:{server.server_port}/v1/chat/completions", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
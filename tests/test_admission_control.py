@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from admission_control import AdmissionController, parse_client_priorities
+
+
+def test_unconfigured_api_keys_share_the_ip_bucket():
+    controller = AdmissionController(max_in_flight=100, rate=1, burst=2)
+    results = []
+    for i in range(5):
+        admission = controller.admit("10.0.0.1", f"random-key-{i}")
+        results.append(admission.rejected)
+        if not admission.rejected:
+            controller.release(admission)
+    assert results == [False, False, True, True, True]
+    assert controller.get_stats()["clients"] == 1
+
+
+def test_configured_api_key_has_its_own_bucket_and_priority():
+    controller = AdmissionController(max_in_flight=100, rate=1, burst=1, client_priorities={"partner": "low"})
+    partner = controller.admit("10.0.0.1", "partner")
+    assert partner.priority == "low" and not partner.rejected
+    same_ip = controller.admit("10.0.0.1")
+    assert same_ip.priority == "normal" and not same_ip.rejected
+    assert controller.admit("10.0.0.1", "partner").rejected
+    assert controller.get_stats()["clients"] == 2
+
+
+def test_zero_rate_disables_per_client_limits():
+    controller = AdmissionController(max_in_flight=1000, rate=0)
+    for _ in range(100):
+        controller.release(controller.admit("10.0.0.1"))
+    assert controller.get_stats()["rate_limited"] == 0
+    assert controller.get_stats()["clients"] == 0
+
+
+def test_load_shedding_by_priority():
+    controller = AdmissionController(max_in_flight=4, rate=0, client_priorities={"bulk": "low", "ops": "high"})
+    held = [controller.admit(f"10.0.0.{i}") for i in range(2)]
+    # 负载 2/4 = 50%: low 降级为只用规则引擎，normal 不受影响
+    degraded = controller.admit("10.0.1.1", "bulk")
+    assert not degraded.rejected and not degraded.allow_llm
+    held.append(degraded)
+    # 负载 3/4 = 75%: low 被拒绝，normal 降级，high 照常
+    assert controller.admit("10.0.1.1", "bulk").rejected
+    normal = controller.admit("10.0.0.9")
+    assert not normal.rejected and not normal.allow_llm
+    held.append(normal)
+    # 负载 4/4: 所有优先级都被拒绝
+    assert controller.admit("10.0.0.10").reason == "overloaded"
+    assert controller.admit("10.0.2.1", "ops").rejected
+    for admission in held:
+        controller.release(admission)
+    stats = controller.get_stats()
+    assert stats["in_flight"] == 0
+    assert stats["shed_by_priority"]["low"] == {"degraded": 1, "rejected": 1}
+    assert stats["shed_by_priority"]["high"] == {"degraded": 0, "rejected": 1}
+
+
+def test_rejected_admission_reports_retry_after():
+    controller = AdmissionController(max_in_flight=10, rate=0.5, burst=1)
+    controller.release(controller.admit("10.0.0.1"))
+    rejected = controller.admit("10.0.0.1")
+    assert rejected.reason == "rate_limited"
+    assert rejected.retry_after_header == "2"
+
+
+def test_client_priorities_config():
+    assert parse_client_priorities("a:low, b:high,,") == {"a": "low", "b": "high"}
+    with pytest.raises(ValueError):
+        parse_client_priorities(":low")
+    with pytest.raises(ValueError):
+        AdmissionController(client_priorities={"a": "urgent"})
+    with pytest.raises(ValueError):
+        AdmissionController(max_in_flight=0)
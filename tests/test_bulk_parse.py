@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import json
+
+from bulk_parse import _chunked, _truncate_partial_line, last_written_offset, main, read_records
+
+
+def test_read_records_ndjson_and_csv(tmp_path):
+    ndjson = tmp_path / "queries.ndjson"
+    ndjson.write_text('{"text": "明天上午环保"}\n\n不是JSON的一行\n"字符串"\n', encoding="utf-8")
+    assert list(read_records(str(ndjson), "ndjson", "text")) == [
+        (0, "明天上午环保"), (1, ""), (2, "不是JSON的一行"), (3, "字符串")]
+    csv_path = tmp_path / "queries.csv"
+    csv_path.write_text("id,query\n1,我16岁\n2,\n", encoding="utf-8")
+    assert list(read_records(str(csv_path), "csv", "query")) == [(0, "我16岁"), (1, "")]
+
+
+def test_chunked():
+    records = [(i, str(i)) for i in range(7)]
+    assert [len(chunk) for chunk in _chunked(iter(records), 3)] == [3, 3, 1]
+
+
+def test_resume_helpers(tmp_path):
+    output = tmp_path / "results.ndjson"
+    output.write_bytes(b'{"offset": 0}\n{"offset": 1}\n{"offset": 2, "te')
+    _truncate_partial_line(str(output))
+    assert output.read_bytes() == b'{"offset": 0}\n{"offset": 1}\n'
+    assert last_written_offset(str(output)) == 1
+    assert last_written_offset(str(tmp_path / "missing.ndjson")) is None
+    # 最后一行超过读取块大小时也能找到
+    output.write_text(json.dumps({"offset": 5, "text": "长" * 70000}, ensure_ascii=False) + "\n", encoding="utf-8")
+    assert last_written_offset(str(output)) == 5
+
+
+def test_main_resumes_after_last_record(tmp_path):
+    texts = ["我和朋友都是16岁，明天上午想参加环保活动", "我想一个人参加下周六的社区服务", "我们三个人想去敬老院"]
+    source = tmp_path / "queries.ndjson"
+    source.write_text("".join(json.dumps({"text": t}, ensure_ascii=False) + "\n" for t in texts), encoding="utf-8")
+    output = tmp_path / "results.ndjson"
+    output.write_text('{"offset": 0}\n{"offset": 1, "tex', encoding="utf-8")
+    assert main([str(source), "-o", str(output), "--resume", "--workers", "1", "--report-interval", "60"]) == 0
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [r["offset"] for r in records] == [0, 1, 2]
+    assert records[1]["processed_data"]["人数"] == 1 and records[2]["processed_data"]["人数"] == 3
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from cache_backends import InProcessCache, SharedMemoryCache, create_cache
+
+SLOTS = {"年龄": 16, "人数": 2, "日期": "2026-04-03", "时间": "上午", "活动类型": "环保"}
+
+
+@pytest.fixture
+def shared(tmp_path):
+    cache = SharedMemoryCache(str(tmp_path / "parse-cache"), slots=64, slot_bytes=256)
+    yield cache
+    cache.close()
+
+
+def test_in_process_lru_and_ttl():
+    cache = InProcessCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # "a" 刚被访问过，淘汰的是 "b"
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.get_stats()["evicted"] == 1
+    expired = InProcessCache(ttl=0)
+    expired.set("a", 1)
+    assert expired.get("a") is None
+
+
+def test_shared_round_trip_between_instances(shared):
+    shared.set("rule|abc|2026-04-01|我16岁", SLOTS)
+    assert shared.get("rule|abc|2026-04-01|我16岁") == SLOTS
+    other = SharedMemoryCache(shared.path, slots=64, slot_bytes=256)
+    try:
+        assert other.get("rule|abc|2026-04-01|我16岁") == SLOTS
+        other.set("rule|abc|2026-04-01|我16岁", dict(SLOTS, 人数=3))
+        assert shared.get("rule|abc|2026-04-01|我16岁")["人数"] == 3
+        assert shared.get_stats()["entries"] == 1
+    finally:
+        other.close()
+
+
+def _write_from_child(path: str):
+    cache = SharedMemoryCache(path, slots=64, slot_bytes=256)
+    cache.set("来自子进程", SLOTS)
+    cache.close()
+
+
+def test_shared_visible_across_processes(shared):
+    process = multiprocessing.get_context("fork").Process(target=_write_from_child, args=(shared.path,))
+    process.start()
+    process.join()
+    assert process.exitcode == 0 and shared.get("来自子进程") == SLOTS
+
+
+def test_shared_rejects_values_larger_than_slot(shared):
+    shared.set("big", {"描述": "环保" * 200})
+    assert shared.get("big") is None and shared.get_stats()["too_large"] == 1
+
+
+def test_shared_full_bucket_evicts_and_clear_empties(shared):
+    for i in range(shared.slots * 2):
+        shared.set(f"key-{i}", i)
+    stats = shared.get_stats()
+    assert stats["entries"] == shared.slots and stats["evicted"] > 0
+    assert shared.get(f"key-{shared.slots * 2 - 1}") == shared.slots * 2 - 1
+    shared.clear()
+    assert shared.get_stats()["entries"] == 0 and shared.get("key-0") is None
+
+
+def test_shared_expired_entries_miss(tmp_path):
+    cache = SharedMemoryCache(str(tmp_path / "ttl-cache"), slots=8, slot_bytes=128, ttl=0.01)
+    try:
+        cache.set("a", 1)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+    finally:
+        cache.close()
+
+
+def test_shared_concurrent_writers_never_return_torn_values(shared):
+    values = [{"writer": writer, "text": str(writer) * 40} for writer in range(4)]
+    stop = threading.Event()
+    bad = []
+
+    def write(value):
+        while not stop.is_set():
+            shared.set("hot", value)
+
+    def read():
+        for _ in range(5000):
+            value = shared.get("hot")
+            if value is not None and value not in values:
+                bad.append(value)
+
+    writers = [threading.Thread(target=write, args=(value,)) for value in values]
+    for thread in writers:
+        thread.start()
+    read()
+    stop.set()
+    for thread in writers:
+        thread.join()
+    assert not bad
+
+
+def test_create_cache_kinds():
+    assert create_cache("off") is None
+    assert isinstance(create_cache("memory"), InProcessCache)
+    with pytest.raises(ValueError):
+        create_cache("redis")
+    with pytest.raises(ValueError):
+        SharedMemoryCache(slot_bytes=16)
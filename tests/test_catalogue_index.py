@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from catalogue_index import BucketIndex, CatalogueSnapshot, ChangeLog, group_by_day, parse_time_range
+
+TYPES = ["环保", "助老", "教育", "社区服务"]
+FIRST_DAY = date(2026, 5, 1)
+
+
+def make_projects(count: int = 400, seed: int = 0):
+    rng = random.Random(seed)
+    projects = []
+    for project_id in range(1, count + 1):
+        start = rng.randint(7, 18)
+        min_age = rng.choice([6, 12, 16, 18])
+        projects.append({
+            "id": project_id, "name": f"项目{project_id}", "type": rng.choice(TYPES),
+            "date": (FIRST_DAY + timedelta(days=rng.randint(0, 59))).isoformat(),
+            "time": f"{start:02d}:00-{start + rng.randint(1, 4):02d}:00",
+            "age_limit": f"{min_age}-{rng.choice([60, 70])}", "max_participants": 20,
+            "description": "", "location": ""
+        })
+    return projects
+
+
+def ids(projects):
+    return sorted(p["id"] for p in projects)
+
+
+def test_bucket_index_updates_match_build():
+    rng = random.Random(1)
+    items = [(rng.randint(0, 300), {"id": project_id}) for project_id in range(1, 2000)]
+    index = BucketIndex()
+    for key, project in items:
+        index = index.with_added(key, project)
+    built = BucketIndex.build(items)
+    assert list(index.items()) == list(built.items()) and len(index) == len(built) == len(items)
+    removed = items[::3]
+    for key, project in removed:
+        index = index.with_removed(key, project["id"])
+    kept = [item for item in items if item not in removed]
+    assert list(index.items()) == list(BucketIndex.build(kept).items()) and len(index) == len(kept)
+    assert index.range_keys(100, 120) == sorted({key for key, _ in kept if 100 <= key <= 120})
+
+
+def test_bucket_index_writes_do_not_change_old_index():
+    index = BucketIndex.build((key, {"id": key}) for key in range(500))
+    before = list(index.items())
+    index.with_added(250, {"id": 1000}).with_removed(10, 10)
+    assert list(index.items()) == before
+
+
+def test_snapshot_updates_match_rebuild():
+    projects = make_projects()
+    snapshot = CatalogueSnapshot.build(projects)
+    changed = dict(projects[0], type="助老", date="2026-06-20", time="19:00-21:00")
+    snapshot = snapshot.with_project(1, changed, projects[0])
+    snapshot = snapshot.without_project(2, projects[1])
+    current = [changed] + projects[2:]
+    rebuilt = CatalogueSnapshot.build(current)
+    assert ids(snapshot.projects) == ids(rebuilt.projects) and snapshot.version == 2
+    for query in (lambda s: s.candidates_for_type("助老"), lambda s: s.candidates_for_date("2026-06-20"),
+                  lambda s: s.candidates_for_age(14), lambda s: s.candidates_for_time(18 * 60, 20 * 60),
+                  lambda s: s.candidates_for_dates("2026-05-10", "2026-06-10", [5, 6], "环保")):
+        assert ids(query(snapshot)) == ids(query(rebuilt))
+
+
+@pytest.mark.parametrize("date_from, date_to, weekdays, activity_type", [
+    ("2026-05-01", "2026-05-31", None, None),
+    ("2026-05-10", None, [5, 6], None),
+    (None, "2026-05-20", [0], "环保"),
+    ("2026-06-01", "2026-06-30", [1, 3], "教育"),
+])
+def test_date_range_candidates_match_scan(date_from, date_to, weekdays, activity_type):
+    projects = make_projects()
+    snapshot = CatalogueSnapshot.build(projects)
+    expected = [p for p in projects
+                if (date_from is None or p["date"] >= date_from) and (date_to is None or p["date"] <= date_to)
+                and (weekdays is None or date.fromisoformat(p["date"]).weekday() in weekdays)
+                and (activity_type is None or p["type"] == activity_type)]
+    result = snapshot.candidates_for_dates(date_from, date_to, weekdays, activity_type)
+    assert ids(result) == ids(expected)
+    assert [p["date"] for p in result] == sorted(p["date"] for p in result)
+
+
+def test_age_and_time_candidates_match_scan():
+    projects = make_projects()
+    snapshot = CatalogueSnapshot.build(projects)
+    for age in (5, 12, 16, 65):
+        expected = [p for p in projects if int(p["age_limit"].split("-")[0]) <= age <= int(p["age_limit"].split("-")[1])]
+        assert ids(snapshot.candidates_for_age(age)) == ids(expected)
+    start, end = 12 * 60, 14 * 60
+    expected = [p for p in projects if parse_time_range(p["time"])[0] < end and parse_time_range(p["time"])[1] > start]
+    assert ids(snapshot.candidates_for_time(start, end)) == ids(expected)
+
+
+def test_group_by_day_keeps_order_within_day():
+    projects = [{"id": 1, "date": "2026-05-02"}, {"id": 2, "date": "2026-05-01"}, {"id": 3, "date": "2026-05-02"}]
+    groups = group_by_day(projects)
+    assert [g["date"] for g in groups] == ["2026-05-01", "2026-05-02"]
+    assert [p["id"] for p in groups[1]["projects"]] == [1, 3] and groups[0]["weekday"] == 4
+
+
+def test_change_log_since():
+    log = ChangeLog(max_entries=3)
+    assert log.since(0) == ([], True)
+    for version in range(1, 6):
+        log.append(version, "update", version)
+    changes, complete = log.since(3)
+    assert [c["version"] for c in changes] == [4, 5] and complete
+    # 版本2已被淘汰，从版本1增量同步不完整
+    changes, complete = log.since(1)
+    assert [c["version"] for c in changes] == [3, 4, 5] and not complete
+    assert log.since(5) == ([], True)
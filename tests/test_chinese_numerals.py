@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from chinese_numerals import CORRECTNESS_CASES, YEAR_CASES, parse_numeral
+
+
+@pytest.mark.parametrize("token, expected", CORRECTNESS_CASES)
+def test_parse_numeral(token, expected):
+    assert parse_numeral(token) == expected
+
+
+@pytest.mark.parametrize("token, expected", YEAR_CASES)
+def test_parse_year(token, expected):
+    assert parse_numeral(token, year=True) == expected
+
+
+@pytest.fixture(scope="module")
+def engine():
+    from volunteer_nlp_system import VolunteerNLPEngine
+    return VolunteerNLPEngine()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("我十六岁，想参加献血宣传", 16),
+    ("我和我朋友都是十八岁", 18),
+    ("我今年２５岁", 25),
+    ("年龄30，想去图书馆", 30),
+    ("我三岁半", 3),
+    ("孩子们三四岁", 3),
+])
+def test_extract_age(engine, text, expected):
+    assert engine.extract_age(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("二十人的团队想去养老院", 20),
+    ("我们三个人想做环保", 3),
+    ("我一个人", 1),
+    ("我们俩人可以去孤儿院", 2),
+    ("十二个人报名", 12),
+    ("我和同学10人", 10),
+    ("我们五六个人", 5),
+    ("两三个人想去敬老院", 2),
+    ("一二十人的团队", 10),
+])
+def test_extract_people_count(engine, text, expected):
+    assert engine.extract_people_count(text) == expected
+
+
+def test_people_count_is_capped_by_the_rules(engine):
+    assert engine.extract_people_count("一百人参加") == engine.max_people_count
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+
+import pytest
+
+from date_expressions import resolve_date_range, resolve_weekdays
+
+TODAY = date(2026, 4, 1)  # 周三
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("4月3号上午", (date(2026, 4, 3), date(2026, 4, 3))),
+    ("明天下午", (date(2026, 4, 2), date(2026, 4, 2))),
+    ("后天", (date(2026, 4, 3), date(2026, 4, 3))),
+    ("大后天我和他们去植树", (date(2026, 4, 4), date(2026, 4, 4))),
+    ("下周六", (date(2026, 4, 11), date(2026, 4, 11))),
+    ("周六有空", (date(2026, 4, 4), date(2026, 4, 4))),
+    ("这个周末", (date(2026, 4, 4), date(2026, 4, 5))),
+    ("下周末", (date(2026, 4, 11), date(2026, 4, 12))),
+    ("本月底", (date(2026, 4, 26), date(2026, 4, 30))),
+    ("下个月初", (date(2026, 5, 1), date(2026, 5, 5))),
+    ("五一想去支教", (date(2026, 5, 1), date(2026, 5, 5))),
+    ("国庆", (date(2026, 10, 1), date(2026, 10, 7))),
+    ("4月3号到5号", (date(2026, 4, 3), date(2026, 4, 5))),
+    ("4月28日至5月2日", (date(2026, 4, 28), date(2026, 5, 2))),
+    ("下周一到周三", (date(2026, 4, 6), date(2026, 4, 8))),
+    ("五月一号", (date(2026, 5, 1), date(2026, 5, 1))),
+    ("3月1日", (date(2027, 3, 1), date(2027, 3, 1))),
+    ("三天后", (date(2026, 4, 4), date(2026, 4, 4))),
+    ("在9/10下午", (date(2026, 9, 10), date(2026, 9, 10))),
+    ("6.8号", (date(2026, 6, 8), date(2026, 6, 8))),
+    ("本周", (date(2026, 4, 1), date(2026, 4, 5))),
+    ("4月", (date(2026, 4, 1), date(2026, 4, 30))),
+    ("下个月", (date(2026, 5, 1), date(2026, 5, 31))),
+    ("4月的周末", (date(2026, 4, 4), date(2026, 4, 26))),
+    ("每周六", (date(2026, 4, 4), date(2026, 4, 25))),
+    ("三月份", (date(2027, 3, 1), date(2027, 3, 31))),
+    ("二〇二六年5月1日", (date(2026, 5, 1), date(2026, 5, 1))),
+    ("二零二七年三月一号", (date(2027, 3, 1), date(2027, 3, 1))),
+    ("我们大概能做3.5个小时", None),
+    ("1/2的时间我都在忙", None),
+    ("9点到11点", None),
+])
+def test_resolve_date_range(text, expected):
+    assert resolve_date_range(text, TODAY) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("4月的周末", {5, 6}),
+    ("每周六", {5}),
+    ("下个月工作日", {0, 1, 2, 3, 4}),
+    ("下周一到周三", None),
+    ("4月3号", None),
+    ("这个周末", None),
+])
+def test_resolve_weekdays(text, expected):
+    assert resolve_weekdays(text, TODAY) == (frozenset(expected) if expected else None)
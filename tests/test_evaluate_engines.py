@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import os
+from datetime import date, datetime
+
+import pytest
+
+from evaluate_engines import (SLOTS, build_engines, check_quality_gate, evaluate, gold_answers, load_corpus,
+                              normalize_prediction, resolve_gold_date)
+from stub_llm import StubChatModel
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "eval_corpus.jsonl")
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return load_corpus(CORPUS_PATH)
+
+
+def stub_for(corpus, **noise):
+    return StubChatModel(answers=gold_answers(corpus, datetime.now().date()), **noise)
+
+
+def f1_scores(report):
+    return {slot: scores["f1"] for slot, scores in report["slots"].items()}
+
+
+def test_resolve_gold_date():
+    today = date(2026, 4, 1)
+    assert resolve_gold_date("+1", today) == "2026-04-02"
+    assert resolve_gold_date("04-03", today) == "2026-04-03"
+    assert resolve_gold_date("03-01", today) == "2027-03-01"
+    assert resolve_gold_date(None, today) is None
+
+
+def test_normalize_prediction_drops_defaults():
+    result = {"年龄": "不限", "人数": 1, "日期": "2026-04-02", "时间": "09:00-17:00", "活动类型": "综合",
+              "验证结果": {"questions": ["请问您希望参加活动的具体日期是？"]}}
+    assert normalize_prediction(result) == {"年龄": None, "人数": 1, "日期": None, "时间": None, "活动类型": None}
+
+
+def test_quality_gate():
+    report = {"engine": "rule", "slots": {"人数": {"f1": 0.7}, "年龄": {"f1": 0.95}}, "latency_ms": {"p95": 12.0}}
+    assert check_quality_gate([report], 0.8, 10.0) == ["rule.人数 F1=0.7 < 0.8", "rule p95=12.0ms > 10.0ms"]
+    assert check_quality_gate([report], None, None) == []
+
+
+def test_rule_engine_meets_quality_floor(corpus):
+    report = evaluate("rule", build_engines(stub_for(corpus))["rule"], corpus)
+    assert report["cases"] == len(corpus) and set(report["slots"]) == set(SLOTS)
+    assert min(f1_scores(report).values()) >= 0.9, report["errors"]
+
+
+def test_noise_free_model_scores_perfectly_without_prefill(corpus):
+    # 桩模型照金标回答时，合并和标准化不应把正确答案改错
+    stub = stub_for(corpus)
+    report = evaluate("llm", build_engines(stub, prefill=False)["llm"], corpus, stub)
+    assert set(f1_scores(report).values()) == {1.0}, report["errors"]
+    assert report["llm_calls"] == len(corpus)
+
+
+def test_malformed_replies_fall_back_to_rules(corpus):
+    stub = stub_for(corpus, malformed_rate=1.0)
+    engines = build_engines(stub)
+    rule = evaluate("rule", engines["rule"], corpus)
+    llm = evaluate("llm", engines["llm"], corpus, stub)
+    assert llm["llm_injected"]["malformed"] == llm["llm_calls"] > 0
+    assert f1_scores(llm) == f1_scores(rule)
+
+
+def test_noise_is_deterministic(corpus):
+    reports = []
+    for _ in range(2):
+        stub = stub_for(corpus, omission_rate=0.2, error_rate=0.1, seed=3)
+        reports.append(evaluate("llm", build_engines(stub, prefill=False)["llm"], corpus, stub))
+    assert reports[0]["slots"] == reports[1]["slots"] and reports[0]["llm_injected"] == reports[1]["llm_injected"]
+    assert sum(reports[0]["llm_injected"].values()) > 0
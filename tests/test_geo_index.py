@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from catalogue_index import CatalogueSnapshot
+from gazetteer import load_gazetteer
+from geo_index import haversine_km, nearest_scan
+
+
+@pytest.fixture(scope="module")
+def projects():
+    rng = random.Random(0)
+    return [{"id": project_id, "type": "环保", "date": "2026-06-01", "time": "08:00-12:00", "age_limit": "12-60",
+             "max_participants": 20, "latitude": rng.uniform(30.35, 30.85), "longitude": rng.uniform(114.0, 114.6)}
+            for project_id in range(1, 5001)]
+
+
+@pytest.fixture(scope="module")
+def snapshot(projects):
+    return CatalogueSnapshot.build(projects)
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return load_gazetteer()
+
+
+PLACES = ("光谷", "黄鹤楼", "江汉路", "东湖", "汉口火车站")
+
+
+@pytest.mark.parametrize("name", PLACES)
+@pytest.mark.parametrize("radius", [0.5, 3, 10])
+def test_grid_radius_query_matches_scan(projects, snapshot, gazetteer, name, radius):
+    place = gazetteer.lookup(name)
+    expected = sorted(((haversine_km(place.latitude, place.longitude, p["latitude"], p["longitude"]), p)
+                       for p in projects), key=lambda item: (item[0], item[1]["id"]))
+    expected = [p["id"] for distance, p in expected if distance <= radius]
+    assert [p["id"] for _, p in snapshot.candidates_within(place.latitude, place.longitude, radius)] == expected
+
+
+@pytest.mark.parametrize("name", PLACES)
+@pytest.mark.parametrize("k", [1, 10])
+def test_grid_nearest_matches_scan(projects, snapshot, gazetteer, name, k):
+    place = gazetteer.lookup(name)
+    assert [p["id"] for _, p in snapshot.nearest(place.latitude, place.longitude, k)] == \
+        [p["id"] for _, p in nearest_scan(projects, place.latitude, place.longitude, k)]
+
+
+def test_projects_without_coordinates_are_skipped():
+    snapshot = CatalogueSnapshot.build([{"id": 1, "type": "环保", "date": "2026-06-01", "time": "08:00-12:00",
+                                         "age_limit": "12-60", "max_participants": 20}])
+    assert snapshot.candidates_within(30.5, 114.3, 50) == []
+    assert snapshot.nearest(30.5, 114.3, 5) == []
+
+
+def test_gazetteer_finds_place_names_in_text(gazetteer):
+    assert gazetteer.find("想去光谷附近做志愿者").name == "光谷"
+    assert gazetteer.lookup("黄鹤楼") is not None
+    assert gazetteer.find("没有地名的一句话") is None
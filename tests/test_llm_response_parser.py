@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from llm_response_parser import SLOT_TYPES, ResponseParser, malformed_outputs
+
+
+@pytest.mark.parametrize("content, expected", [
+    ('{"年龄": 16, "人数": 2, "日期": "2026-04-03", "时间": "08:00-12:00", "活动类型": "环保"}',
+     {"年龄": 16, "人数": 2, "日期": "2026-04-03", "时间": "08:00-12:00", "活动类型": "环保"}),
+    ("{'年龄': None, '人数': '3人', '日期': null, '时间': '上午', '活动类型': '教育',}",
+     {"年龄": None, "人数": 3, "日期": None, "时间": "上午", "活动类型": "教育"}),
+    ('｛“年龄”：18，“人数”：1，“活动类型”：“医疗”｝', {"年龄": 18, "人数": 1, "活动类型": "医疗"}),
+    ('```json\n{"人数": 4}\n```', {"人数": 4}),
+    ('示例格式为 {年龄: 数字}，实际结果：{"人数": 4}', {"人数": 4}),
+    ('{"年龄": "十六", "日期": "4月3号", "未知": 1}', {}),
+    ("没有JSON", {}),
+    ('{"年龄": 16', {}),
+    ("", {}),
+])
+def test_parse(content, expected):
+    assert ResponseParser().parse(content) == expected
+
+
+def test_parse_only_requested_slots():
+    assert ResponseParser().parse('{"年龄": 16, "人数": 2}', ["人数"]) == {"人数": 2}
+
+
+def test_failures_are_counted_by_kind():
+    parser = ResponseParser()
+    parser.parse("没有JSON")
+    parser.parse('{"年龄" 16}')
+    parser.parse('{"年龄": "十六"}')
+    stats = parser.get_stats()
+    assert (stats["no_json"], stats["invalid_json"], stats["invalid_fields"]) == (1, 1, 1)
+    assert stats["failures"] == 2
+
+
+def test_malformed_outputs_never_raise_and_keep_slot_types():
+    parser = ResponseParser()
+    for text in malformed_outputs(5000):
+        result = parser.parse(text)
+        assert isinstance(result, dict)
+        for slot, value in result.items():
+            assert slot in SLOT_TYPES
+            if SLOT_TYPES[slot] == "int":
+                assert value is None or isinstance(value, int)
+
+
+def test_unclosed_braces_are_scanned_in_linear_time():
+    parser = ResponseParser()
+    timings = []
+    for size in (4000, 32000):
+        start = time.perf_counter()
+        assert parser.parse("好的" + "{" * size) == {}
+        timings.append(time.perf_counter() - start)
+    # 长度扩大8倍，平方级的回溯会慢64倍；留足余量只排除平方级
+    assert timings[1] < timings[0] * 32 + 0.01
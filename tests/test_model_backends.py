@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from evaluate_engines import load_corpus
+from model_backends import EXTRACTION_PREFIX, LocalTransformersBackend, build_tiny_model
+from prompt_templates import build_extraction_prompt
+
+
+@pytest.fixture(scope="module")
+def prompts():
+    texts = [case["text"] for case in load_corpus("eval_corpus.jsonl")][:6]
+    return texts, [build_extraction_prompt(text, "2026-04-01") for text in texts]
+
+
+@pytest.fixture(scope="module")
+def model_path(tmp_path_factory, prompts):
+    path = str(tmp_path_factory.mktemp("tiny-model"))
+    build_tiny_model(path, prompts[0])
+    return path
+
+
+def test_prefix_cache_and_batching_match_plain_generation(model_path, prompts):
+    from concurrent.futures import ThreadPoolExecutor
+    outputs = {}
+    for label, prefix, batch_size in (("plain", "", 1), ("prefix", EXTRACTION_PREFIX, 1),
+                                      ("batched", EXTRACTION_PREFIX, 4)):
+        backend = LocalTransformersBackend(model_path, prefix=prefix, max_batch_size=batch_size, batch_wait_ms=20)
+        try:
+            with ThreadPoolExecutor(4) as pool:
+                outputs[label] = list(pool.map(lambda p: backend.complete(p, 20), prompts[1]))
+            stats = backend.get_stats()
+        finally:
+            backend.close()
+        assert stats["requests"] == len(prompts[1])
+    assert outputs["prefix"] == outputs["plain"]
+    assert outputs["batched"] == outputs["plain"]
+
+
+def test_expired_requests_are_dropped_before_batching(model_path, prompts):
+    backend = LocalTransformersBackend(model_path, batch_wait_ms=50)
+    try:
+        expired = backend._encode(prompts[1][0], 20, time.monotonic() - 1)
+        backend._queue.put(expired)
+        result = backend.complete(prompts[1][1], 20)
+        assert expired.done.wait(1)
+        assert isinstance(expired.error, TimeoutError)
+        assert expired.result is None
+        stats = backend.get_stats()
+    finally:
+        backend.close()
+    assert isinstance(result, str)
+    assert stats["dropped"] == 1
+    assert stats["requests"] == 1
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from parse_result import RESULT_FIELDS, ParseResult, ProcessRequest, Validation
+
+TEXTS = [
+    "我和我朋友都是16岁，我和他要做一个在4月3号上午的志愿活动，我们想做环保类型的",
+    "我想一个人参加明天下午的社区服务活动，我18岁了",
+    "我们三个人想在下周六做一些环保相关的事情，都是大学生",
+    "明天我想和朋友一起去光谷附近参加敬老院的志愿活动",
+]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    from volunteer_nlp_system import VolunteerNLPEngine
+    return VolunteerNLPEngine()
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_mapping_protocol_matches_to_dict(engine, text):
+    result = engine.build_result(text, engine.extract_slots(text))
+    assert list(dict(result).keys()) == list(result.to_dict().keys())
+    assert result["验证结果"]["missing_slots"] == result.validation.missing_slots
+    assert json.loads(json.dumps(result.to_dict(), ensure_ascii=False)) == result.to_dict()
+
+
+def test_keys_follow_the_legacy_order():
+    result = ParseResult("文本", validation=Validation())
+    assert list(result)[:len(RESULT_FIELDS)] == [key for key, _ in RESULT_FIELDS]
+    assert "引擎类型" not in result
+    result.engine_type = "规则"
+    assert list(result)[-1] == "引擎类型" and len(result) == len(RESULT_FIELDS) + 2
+
+
+def test_chinese_keys_map_to_attributes():
+    result = ParseResult("文本")
+    result["日期"] = "2026-04-03"
+    assert result.date == "2026-04-03"
+    with pytest.raises(KeyError):
+        result["不存在"] = 1
+    with pytest.raises(TypeError):
+        del result["日期"]
+
+
+def test_validation_ask_tracks_missing_slots():
+    validation = Validation()
+    assert not validation.needs_clarification
+    validation.ask("请问您希望参加活动的具体日期是？", "日期", warning="日期已过")
+    assert validation.to_dict() == {"questions": ["请问您希望参加活动的具体日期是？"], "warnings": ["日期已过"],
+                                    "needs_clarification": True, "missing_slots": ["日期"]}
+    assert dict(validation) == validation.to_dict()
+
+
+def test_process_request_validation():
+    request = ProcessRequest.from_payload({"text": "明天", "latitude": "30.5", "longitude": 114.3})
+    assert (request.latitude, request.longitude) == (30.5, 114.3)
+    assert ProcessRequest.from_payload({"text": "明天", "latitude": 30.5}).latitude is None
+    with pytest.raises(ValueError):
+        ProcessRequest.from_payload({"text": ""})
+    with pytest.raises(ValueError):
+        ProcessRequest.from_payload({"text": "明天", "latitude": "北", "longitude": "东"})
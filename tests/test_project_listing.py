@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from catalogue_index import CatalogueSnapshot
+from project_listing import ListingQuery, ProjectListing, decode_cursor, encode_cursor
+
+
+def make_projects(count: int = 120):
+    types = ["环保", "助老", "教育"]
+    return [{"id": project_id, "name": f"项目{project_id}", "type": types[project_id % 3],
+             "date": (date(2026, 5, 1) + timedelta(days=project_id % 20)).isoformat(),
+             "time": "08:00-12:00" if project_id % 2 else "14:00-17:00",
+             "age_limit": "12-60", "max_participants": 20, "description": "", "location": ""}
+            for project_id in range(1, count + 1)]
+
+
+@pytest.fixture
+def listing():
+    state = {"snapshot": CatalogueSnapshot.build(make_projects())}
+    listing = ProjectListing(lambda: state["snapshot"], lambda data: json.dumps(data, ensure_ascii=False))
+    listing.state = state
+    return listing
+
+
+def page(listing, **args):
+    body, etag = listing.get_page({key: str(value) for key, value in args.items()})
+    return json.loads(body), etag
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+    with pytest.raises(ValueError):
+        decode_cursor("!!")
+
+
+def test_cursor_pages_cover_all_matches_once(listing):
+    seen = []
+    data, _ = page(listing, type="环保", limit=7)
+    while True:
+        seen.extend(p["id"] for p in data["projects"])
+        if data["next_cursor"] is None:
+            break
+        data, _ = page(listing, type="环保", limit=7, cursor=data["next_cursor"])
+    assert seen == [pid for pid in range(1, 121) if pid % 3 == 0] and data["total_count"] == 40
+
+
+def test_filters_intersect(listing):
+    data, _ = page(listing, type="助老", date_from="2026-05-01", date_to="2026-05-10", time="07:00-09:00",
+                   fields="name")
+    expected = [p["id"] for p in make_projects()
+                if p["type"] == "助老" and p["date"] <= "2026-05-10" and p["time"].startswith("08")]
+    assert [p["id"] for p in data["projects"]] == expected
+    assert set(data["projects"][0]) == {"id", "name"}
+
+
+def test_cache_and_etag_follow_catalogue_version(listing):
+    _, etag = page(listing, type="环保")
+    assert page(listing, type="环保")[1] == etag and listing.stats["hits"] == 1
+    snapshot = listing.state["snapshot"]
+    project = dict(snapshot.by_id[3], name="改名后的项目")
+    listing.state["snapshot"] = snapshot.with_project(1, project, snapshot.by_id[3])
+    data, new_etag = page(listing, type="环保")
+    assert new_etag != etag and data["version"] == 1 and data["projects"][0]["name"] == "改名后的项目"
+
+
+@pytest.mark.parametrize("args", [
+    {"limit": "abc"}, {"date": "2026-13-01"}, {"weekdays": "7"}, {"time": "上午"},
+    {"near": "30.5,abc"}, {"near": "30.5,114.3", "radius_km": "0"}, {"fields": "password"},
+])
+def test_invalid_arguments(args):
+    with pytest.raises(ValueError):
+        ListingQuery(args)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import date, timedelta
+
+import pytest
+
+from query_cache import QueryResultCache, is_single_bucket, query_key
+
+
+def day(offset: int) -> str:
+    return (date.today() + timedelta(days=offset)).isoformat()
+
+
+def test_query_key_normalizes_type_and_range():
+    assert query_key({"date": "2026-06-01"}) == ("综合", "2026-06-01", "2026-06-01", None, None, None)
+    assert query_key({"date": None}) is None
+    key = query_key({"activity_type": "环保", "date": "2026-06-01", "date_to": "2026-06-07", "weekdays": [6, 5]})
+    assert key == ("环保", "2026-06-01", "2026-06-07", (5, 6), None, None)
+
+
+def test_only_keyword_keys_carry_the_catalogue_version():
+    assert query_key({"date": "2026-06-01"}, 7)[5] is None
+    assert query_key({"date": "2026-06-01", "keywords": ["公园"]}, 7)[5] == 7
+    assert query_key({"date": "2026-06-01", "keywords": ["公园"]}, 7) != \
+        query_key({"date": "2026-06-01", "keywords": ["公园"]}, 8)
+
+
+def test_single_bucket_queries():
+    assert is_single_bucket({"date": "2026-06-01"})
+    assert is_single_bucket({"date": "2026-06-01", "date_to": "2026-06-01"})
+    assert not is_single_bucket({"date": "2026-06-01", "date_to": "2026-06-02"})
+    assert not is_single_bucket({"date": "2026-06-01", "weekdays": [5, 6]})
+    assert not is_single_bucket({"date": "2026-06-01", "keywords": ["公园"]})
+
+
+def test_invalidate_only_touches_matching_days_and_types():
+    cache = QueryResultCache()
+    week = query_key({"activity_type": "环保", "date": "2026-06-01", "date_to": "2026-06-07"})
+    other_type = query_key({"activity_type": "教育", "date": "2026-06-01", "date_to": "2026-06-07"})
+    any_type = query_key({"date": "2026-06-01", "date_to": "2026-06-07"})
+    later = query_key({"activity_type": "环保", "date": "2026-06-10", "date_to": "2026-06-12"})
+    keywords = query_key({"date": "2026-06-20", "date_to": "2026-06-21", "keywords": ["公园"]}, 1)
+    for key in (week, other_type, any_type, later, keywords):
+        cache.put(key, 1, ((), ()), 0.0)
+    cache.invalidate(2, [{"date": "2026-06-03", "type": "环保"}])
+    assert cache.get(week) is None
+    assert cache.get(any_type) is None
+    assert cache.get(other_type) is not None
+    assert cache.get(later) is not None
+    # 关键词条目的排序依赖全目录的IDF，目录一变就淘汰
+    assert cache.get(keywords) is None
+
+
+def test_results_from_an_old_snapshot_are_not_stored():
+    cache = QueryResultCache()
+    key = query_key({"date": "2026-06-01", "date_to": "2026-06-07"})
+    cache.invalidate(5, [])
+    cache.put(key, 4, ((), ()), 0.0)
+    assert cache.get(key) is None
+    assert cache.stats["rejected"] == 1
+
+
+def test_lru_eviction_untags_entries():
+    cache = QueryResultCache(max_entries=2)
+    keys = [query_key({"date": "2026-06-01", "date_to": day_to}) for day_to in ("2026-06-02", "2026-06-03", "2026-06-04")]
+    for key in keys:
+        cache.put(key, 1, ((), ()), 0.0)
+    assert cache.get(keys[0]) is None
+    assert cache.stats["evicted"] == 1
+    cache.invalidate(2, [{"date": "2026-06-01", "type": "环保"}])
+    assert cache.get_stats()["entries"] == 0
+
+
+@pytest.fixture
+def database():
+    from volunteer_nlp_system import VolunteerDatabase
+    logging.disable(logging.INFO)
+    yield VolunteerDatabase()
+    logging.disable(logging.NOTSET)
+
+
+def add_project(database, on_day: str, description: str, activity_type: str = "环保") -> dict:
+    return database.add_project({"name": "志愿服务", "type": activity_type, "date": on_day, "time": "08:00-12:00",
+                                 "age_limit": "6-70", "max_participants": 30, "description": description,
+                                 "location": "武汉"})
+
+
+def test_keyword_order_follows_idf_changes_outside_the_cached_range(database):
+    park = add_project(database, day(3), "公园清洁")
+    library = add_project(database, day(3), "图书馆整理")
+    query = {"activity_type": "环保", "date": day(3), "date_to": day(6), "keywords": ["公园", "图书馆"]}
+    assert [p["id"] for p in database.search_projects(dict(query))] == [library["id"], park["id"]]
+    # 范围之外的项目不会按标签淘汰这个条目，但让"图书馆"变得常见、IDF下降，排序应随之改变
+    for _ in range(50):
+        add_project(database, day(40), "图书馆巡查", "教育")
+    assert [p["id"] for p in database.search_projects(dict(query))] == [park["id"], library["id"]]
+
+
+def test_cached_results_match_uncached(database):
+    for offset in range(1, 15):
+        add_project(database, day(offset), "公园清洁" if offset % 2 else "图书馆整理")
+    queries = [{"date": day(1), "date_to": day(7)}, {"activity_type": "环保", "date": day(1), "date_to": day(14)},
+               {"date": day(1), "date_to": day(14), "weekdays": [5, 6]},
+               {"date": day(1), "date_to": day(14), "keywords": ["公园"]}]
+    cached = [[p["id"] for p in database.search_projects(dict(q))] for q in queries * 2]
+    database.query_cache = None
+    uncached = [[p["id"] for p in database.search_projects(dict(q))] for q in queries * 2]
+    assert cached == uncached
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from reservation_manager import InsufficientCapacityError, ReservationManager, contend
+
+
+def test_concurrent_holds_never_oversell():
+    capacity = 20
+    manager = ReservationManager(lambda project_id: capacity, stripes=8, hold_ttl=0.005)
+    violations = contend(manager, 3, threads=16, attempts=300)
+    manager.sweep()
+    time.sleep(0.01)
+    manager.sweep()
+    confirmed = manager._confirmed.get(3, 0)
+    assert not violations, f"出现超卖: {violations[:5]}"
+    assert confirmed <= capacity
+    assert manager.remaining(3) == capacity - confirmed
+    assert manager.get_stats()["expiry_entries"] == 0
+
+
+def test_hold_confirm_release():
+    manager = ReservationManager({3: 5}.get)
+    hold = manager.hold(3, 2)
+    assert manager.remaining(3) == 3
+    with pytest.raises(InsufficientCapacityError):
+        manager.hold(3, 4)
+    assert manager.confirm(hold.hold_id) == 3
+    with pytest.raises(KeyError):
+        manager.confirm(hold.hold_id)
+    assert manager.release(manager.hold(3, 1).hold_id) and manager.remaining(3) == 3
+    with pytest.raises(ValueError):
+        manager.hold(3, 0)
+
+
+def test_expired_hold_returns_capacity():
+    manager = ReservationManager({3: 2}.get)
+    hold = manager.hold(3, 2, ttl=0.01)
+    assert manager.remaining(3) == 0
+    time.sleep(0.02)
+    assert manager.remaining(3) == 2
+    with pytest.raises(KeyError):
+        manager.confirm(hold.hold_id)
+    assert manager.get_stats()["expired"] == 1
+
+
+def test_discarded_holds_do_not_accumulate_in_expiry_heap():
+    # 确认和释放的预留不应在过期堆里累积到TTL
+    manager = ReservationManager(lambda project_id: 1000, hold_ttl=60)
+    for _ in range(500):
+        manager.release(manager.hold(3, 1).hold_id)
+        manager.reserve(3, 1)
+    assert manager.get_stats()["expiry_entries"] <= 1, manager.get_stats()
+
+
+def test_confirm_rejected_after_project_deleted():
+    # 项目被删除后确认预留应被拒绝，而不是返回负的剩余名额
+    capacities = {3: 5}
+    manager = ReservationManager(capacities.get)
+    hold = manager.hold(3, 2)
+    del capacities[3]
+    with pytest.raises(KeyError):
+        manager.confirm(hold.hold_id)
+    manager.forget(3)
+    assert manager.get_stats()["active_holds"] == 0 and manager.reserved(3) == 0
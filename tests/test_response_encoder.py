@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import logging
+from datetime import date, timedelta
+
+import pytest
+
+from catalogue_index import group_by_day
+from response_encoder import AsciiJSONEncoder, ResponseCompressor, UTF8JSONEncoder, create_encoder
+
+
+@pytest.fixture(scope="module")
+def payloads():
+    from volunteer_nlp_system import VolunteerNLPEngine, VolunteerDatabase
+    logging.disable(logging.INFO)
+    engine = VolunteerNLPEngine()
+    database = VolunteerDatabase()
+    first_day = date.today() + timedelta(days=1)
+    for offset in range(30):
+        for number in range(3):
+            database.add_project({
+                "name": f"社区环保宣传第{number + 1}组", "type": "环保",
+                "date": (first_day + timedelta(days=offset)).isoformat(), "time": "08:00-12:00",
+                "age_limit": "12-60", "max_participants": 30, "description": "在社区开展垃圾分类宣传，发放环保手册",
+                "location": "东湖社区公园", "latitude": 30.575, "longitude": 114.372
+            })
+    payloads = []
+    for text in ("我和朋友都是16岁，明天上午想参加环保活动", "我们三个人下个月的周末想做环保，都是18岁"):
+        result = engine.process_natural_language(text)
+        query = engine.generate_database_query(result)
+        matched = database.search_projects(query)
+        payloads.append({"original_text": text, "extracted_info": result, "structured_data": query,
+                         "matched_by_date": group_by_day(matched), "project_count": len(matched), "ratio": 0.5})
+    logging.disable(logging.NOTSET)
+    return database, payloads
+
+
+def test_utf8_output_matches_legacy_json(payloads):
+    from flask import Flask
+    database, items = payloads
+    flask_json = Flask(__name__).json
+    legacy = AsciiJSONEncoder()
+    cached = UTF8JSONEncoder(lambda row: database.get_project(row["id"]) is row)
+    for payload in items:
+        expected = json.loads(flask_json.dumps(json.loads(legacy.dumps(payload))))
+        assert json.loads(UTF8JSONEncoder().dumps(payload)) == expected
+        # 第二次编码走项目行片段缓存
+        assert json.loads(cached.dumps(payload)) == expected
+        assert json.loads(cached.dumps(payload)) == expected
+    assert cached.get_stats()["fragment_hits"] > 0
+
+
+def test_utf8_does_not_escape_chinese():
+    assert UTF8JSONEncoder().encode({"活动类型": "环保"}) == '{"活动类型":"环保"}'.encode("utf-8")
+    assert "\\u" in AsciiJSONEncoder().dumps({"活动类型": "环保"})
+
+
+def test_changed_rows_are_serialized_again():
+    rows = {1: {"id": 1, "name": "旧名称"}}
+    encoder = UTF8JSONEncoder(lambda row: rows.get(row["id"]) is row)
+    assert "旧名称" in encoder.dumps([rows[1]])
+    rows[1] = {"id": 1, "name": "新名称"}
+    assert "新名称" in encoder.dumps([rows[1]])
+
+
+def test_compression_threshold_and_negotiation():
+    compressor = ResponseCompressor(min_bytes=100)
+    small = b"{}"
+    assert compressor.compress(small, "gzip") == (small, None)
+    body = json.dumps({"项目": ["环保"] * 200}, ensure_ascii=False).encode("utf-8")
+    assert compressor.compress(body, "identity") == (body, None)
+    compressed, encoding = compressor.compress(body, "gzip;q=1.0, deflate")
+    assert encoding == "gzip" and gzip.decompress(compressed) == body
+
+
+def test_unknown_encoder_kind():
+    with pytest.raises(ValueError):
+        create_encoder("xml")
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import copy
+import json
+
+import pytest
+
+from config import Config
+from rule_set import RuleSet, RuleStore
+
+
+@pytest.fixture
+def rules_data():
+    with open(Config.RULES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_rules(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def without_keyword(data, type_name, keyword):
+    changed = copy.deepcopy(data)
+    for entry in changed["activity_types"]:
+        if entry["name"] == type_name:
+            entry["keywords"].remove(keyword)
+    return changed
+
+
+def test_digest_follows_content_not_version(rules_data):
+    digest = RuleSet.compile(rules_data).digest
+    assert RuleSet.compile(copy.deepcopy(rules_data)).digest == digest
+    assert RuleSet.compile(without_keyword(rules_data, "环保", "环保")).digest != digest
+
+
+def test_invalid_rules_keep_the_previous_rule_set(tmp_path, rules_data):
+    path = tmp_path / "rules.json"
+    write_rules(path, rules_data)
+    store = RuleStore(str(path))
+    previous = store.current
+    broken = dict(rules_data)
+    del broken["patterns"]
+    write_rules(path, broken)
+    assert not store.reload(force=True)
+    assert store.current is previous
+    assert store.get_stats()["failures"] == 1
+
+
+def test_rule_set_is_immutable(rules_data):
+    rule_set = RuleSet.compile(rules_data)
+    with pytest.raises(AttributeError):
+        rule_set.max_people_count = 3
+
+
+def test_parse_cache_misses_after_reload_without_version_bump(tmp_path, rules_data, monkeypatch):
+    from hybrid_nlp_engine import HybridNLPEngine
+    from volunteer_nlp_system import VolunteerNLPEngine
+
+    monkeypatch.setenv("USE_LLM", "false")
+    path = tmp_path / "rules.json"
+    write_rules(path, rules_data)
+    store = RuleStore(str(path))
+    engine = HybridNLPEngine()
+    engine.rule_engine = VolunteerNLPEngine(rules=store)
+    text = "我们三个人想做环保活动"
+    assert engine.process_natural_language(text).activity_type == "环保"
+
+    # 删掉关键词但不改 version，热更新后同一句话不能再命中旧的缓存条目
+    write_rules(path, without_keyword(rules_data, "环保", "环保"))
+    assert store.reload(force=True)
+    assert store.current.version == rules_data["version"]
+    assert engine.process_natural_language(text).activity_type == "综合"
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from sampling_profiler import SamplingProfiler
+
+
+def wait_until_stopped(profiler: SamplingProfiler, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while profiler.active and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert not profiler.active
+
+
+def busy(seconds: float):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(100))
+
+
+def test_collects_stacks_of_request_threads():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start(seconds=5, requests=1)
+    profiler.request_started()
+    busy(0.1)
+    profiler.request_finished()
+    wait_until_stopped(profiler)
+    status = profiler.status()
+    assert status["finished_requests"] == 1 and status["samples"] > 0
+    assert "busy (test_sampling_profiler.py" in profiler.collapsed()
+
+
+def test_concurrent_requests_are_counted_exactly():
+    profiler = SamplingProfiler(interval=0.001)
+    threads, per_thread = 16, 50
+    profiler.start(seconds=30, requests=threads * per_thread)
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        barrier.wait()
+        for _ in range(per_thread):
+            profiler.request_started()
+            profiler.request_finished()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    wait_until_stopped(profiler)
+    assert profiler.status()["finished_requests"] == threads * per_thread
+    assert not profiler._threads
+
+
+def test_requests_after_the_session_are_not_tracked():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start(seconds=5)
+    profiler.stop()
+    wait_until_stopped(profiler)
+    profiler.request_started()
+    assert not profiler._threads
+    profiler.request_finished()
+    assert profiler.status()["finished_requests"] == 0
+
+
+def test_rejects_invalid_or_overlapping_sessions():
+    profiler = SamplingProfiler()
+    with pytest.raises(ValueError):
+        profiler.start(seconds=1, requests=0)
+    profiler.start(seconds=5)
+    try:
+        with pytest.raises(RuntimeError):
+            profiler.start(seconds=5)
+    finally:
+        profiler.stop()
+        wait_until_stopped(profiler)
+    assert profiler.collapsed() is not None
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import time
+
+from session_store import SessionStore
+
+
+def test_create_get_update_delete():
+    store = SessionStore()
+    session_id = store.create({"missing_slots": ["日期"]})
+    assert store.get(session_id) == {"missing_slots": ["日期"]}
+    store.update(session_id, {"missing_slots": []})
+    assert store.get(session_id) == {"missing_slots": []}
+    store.delete(session_id)
+    assert store.get(session_id) is None and len(store) == 0
+    assert store.get_stats()["completed"] == 1
+    # 不存在的会话不会被 update 重新创建
+    store.update(session_id, {})
+    assert len(store) == 0
+
+
+def test_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2)
+    first, second = store.create({"n": 1}), store.create({"n": 2})
+    store.get(first)
+    third = store.create({"n": 3})
+    assert store.get(second) is None and store.get(first) == {"n": 1} and store.get(third) == {"n": 3}
+    assert store.get_stats()["evicted"] == 1
+
+
+def test_expired_sessions_are_dropped():
+    store = SessionStore(ttl=0.01)
+    session_id = store.create({})
+    time.sleep(0.02)
+    assert store.get(session_id) is None
+    other = store.create({})
+    time.sleep(0.02)
+    store.create({})
+    assert store.get(other) is None and store.get_stats()["expired"] == 2 and len(store) == 1
+
+
+def test_access_extends_ttl():
+    store = SessionStore(ttl=0.2)
+    session_id = store.create({})
+    for _ in range(4):
+        time.sleep(0.08)
+        assert store.get(session_id) is not None
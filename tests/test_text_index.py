@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from text_index import PostingList, TextIndex, decode_postings, encode_postings, tokenize
+
+
+def make_projects(count: int = 600):
+    rng = random.Random(0)
+    places = ["江岸公园", "武昌敬老院", "洪山图书馆", "汉阳福利院", "东湖湿地", "青山社区"]
+    actions = ["植树", "陪伴老人", "课业辅导", "垃圾分类宣传", "图书整理", "清理河道垃圾"]
+    projects = []
+    for project_id in range(1, count + 1):
+        place, action = rng.choice(places), rng.choice(actions)
+        projects.append({"id": project_id, "name": f"{place}{action}",
+                         "description": f"{action}，{rng.choice(actions)}", "location": place})
+    return projects
+
+
+QUERIES = ("植树造林", "敬老院", "湿地清理河道垃圾", "图书馆整理书架")
+
+
+def test_encode_decode_round_trip():
+    entries = [(1, 2, 10), (3, 1, 7), (300, 5, 1000), (70000, 1, 3)]
+    decoded = decode_postings(encode_postings(entries))
+    assert decoded == {pid: (frequency, length) for pid, frequency, length in entries}
+
+
+def test_posting_list_add_and_remove():
+    entries = [(pid, 1, 5) for pid in range(1, 1000, 2)]
+    postings = PostingList.build(entries)
+    assert len(postings) == len(entries) and postings.get(501) == (1, 5) and postings.get(502) is None
+    # 一个块超过 2*BLOCK_SIZE 后拆分，内容不变
+    for pid in range(2, 1000, 2):
+        postings = postings.with_entry(pid, 2, 6)
+    assert len(postings) == 999 and dict(postings.items()) == {
+        pid: (1, 5) if pid % 2 else (2, 6) for pid in range(1, 1000)}
+    postings, removed = postings.without(501)
+    assert removed == (1, 5) and postings.get(501) is None and len(postings) == 998
+    assert postings.without(501) == (postings, None)
+
+
+def test_update_matches_rebuild():
+    projects = make_projects()
+    index = TextIndex.build(projects)
+    changed = dict(projects[0], description="植树造林")
+    updated = index.with_removed(projects[0]).with_added(changed)
+    assert 1 in updated.score(tokenize("植树造林")) and updated.doc_count == index.doc_count
+    rebuilt = TextIndex.build([changed] + projects[1:])
+    for query in QUERIES:
+        assert updated.score(tokenize(query)) == rebuilt.score(tokenize(query)), query
+
+
+def test_writes_do_not_change_old_snapshot():
+    projects = make_projects()
+    index = TextIndex.build(projects)
+    before = {query: index.score(tokenize(query)) for query in QUERIES}
+    index.with_removed(projects[1]).with_added(dict(projects[1], description="植树造林"))
+    assert {query: index.score(tokenize(query)) for query in QUERIES} == before
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_candidate_scoring_matches_full_scoring(query):
+    index = TextIndex.build(make_projects())
+    terms = tokenize(query)
+    full = index.score(terms)
+    # 候选少于倒排表时逐个查找，多于倒排表时遍历倒排表，两种方式得分一致
+    for candidates in (range(1, 20), range(1, 601)):
+        assert index.score(terms, candidates) == {pid: s for pid, s in full.items() if pid in candidates}
+
+
+def test_search_orders_by_score_then_id():
+    index = TextIndex.build(make_projects())
+    results = index.search(tokenize("敬老院陪伴老人"))
+    assert results == sorted(results, key=lambda item: (-item[0], item[1]))
+    assert index.search(tokenize("敬老院陪伴老人"), limit=5) == results[:5]
+    assert TextIndex().search(tokenize("敬老院")) == []
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from text_normalizer import normalize_text
+
+SAMPLES = [
+    "我和我朋友都是16岁，我和他要做一个在4月3号上午的志愿活动，我们想做环保类型的",
+    "我和我朋友都是１６岁，我和他要做一个在４月３号上午的志愿活动，我们想做环保类型的！",
+    "我和我朋友都是16歲，我們想在下週六上午參加環保類的志願活動，離東湖近一點",
+    "明天 上午 😊 想参加 社区服务 活动　　我 18 岁 👍🏻",
+]
+
+CASES = [
+    ("我１６岁，４月３号！", "我16岁,4月3号!"),
+    ("我們想參加環保類的志願活動", "我们想参加环保类的志愿活动"),
+    ("明天 上午 😊 想参加", "明天上午想参加"),
+    ("我 18 岁 👍🏻", "我18岁"),
+    ("4 月 3 号", "4月3号"),
+    ("社区​服务️", "社区服务"),
+    ("hello   world", "hello world"),
+    ("  前后空白\t\n", "前后空白"),
+    ("", ""),
+]
+
+
+@pytest.mark.parametrize("text, expected", CASES)
+def test_normalize(text, expected):
+    assert normalize_text(text) == expected
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_idempotent(text):
+    assert normalize_text(normalize_text(text)) == normalize_text(text)
+
+
+def test_normalized_text_keeps_slots():
+    from volunteer_nlp_system import VolunteerNLPEngine
+    engine = VolunteerNLPEngine()
+    slots = ["年龄", "日期", "时间", "活动类型"]
+    # 全角、繁体和带空白的写法与纯简体抽取出同样的年龄、日期、时间和类型
+    expected = engine.extract_slots(SAMPLES[0], slots)
+    assert engine.extract_slots(SAMPLES[1], slots) == expected
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from datetime import date, timedelta
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+
+@pytest.fixture(scope="module")
+def client():
+    import volunteer_api
+    yield volunteer_api.app.test_client()
+    volunteer_api.database.reservations.stop_sweeper()
+    volunteer_api.nlp_engine.rule_engine.rules.stop_watcher()
+
+
+@pytest.fixture
+def project(client):
+    payload = {"name": "东湖社区环保宣传", "type": "环保", "date": (date.today() + timedelta(days=3)).isoformat(),
+               "time": "08:00-12:00", "age_limit": "12-60", "max_participants": 3,
+               "description": "垃圾分类宣传", "location": "东湖社区"}
+    response = client.post("/api/projects", json=payload)
+    assert response.status_code == 201
+    yield response.get_json()["project"]
+    client.delete(f"/api/projects/{response.get_json()['project']['id']}")
+
+
+def test_process_returns_utf8_json(client):
+    response = client.post("/api/process", json={"text": "我和朋友都是16岁，明天上午想参加环保活动"})
+    assert response.status_code == 200
+    assert "环保".encode("utf-8") in response.data
+    data = response.get_json()
+    assert data["extracted_info"]["年龄"] == 16 and data["extracted_info"]["活动类型"] == "环保"
+
+
+def test_process_rejects_empty_text(client):
+    assert client.post("/api/process", json={"text": ""}).status_code == 400
+
+
+def test_clarification_session_only_parses_the_answer(client):
+    first = client.post("/api/process", json={"text": "我16岁，想参加环保活动"}).get_json()
+    assert first["needs_clarification"] and first["session_id"]
+    second = client.post("/api/process", json={"text": "明天上午", "session_id": first["session_id"]}).get_json()
+    assert second["extracted_info"]["年龄"] == 16 and second["extracted_info"]["日期"] is not None
+    assert second["extracted_info"]["时间"] == "08:00-12:00"
+    assert not second["needs_clarification"] and second["session_id"] is None
+
+
+def test_hold_confirm_and_capacity(client, project):
+    project_id = project["id"]
+    hold = client.post(f"/api/projects/{project_id}/hold", json={"participants": 2}).get_json()
+    assert client.post(f"/api/projects/{project_id}/reserve", json={"participants": 2}).status_code == 409
+    confirmed = client.post(f"/api/holds/{hold['hold_id']}/confirm").get_json()
+    assert confirmed["remaining"] == 1
+    assert client.post(f"/api/holds/{hold['hold_id']}/confirm").status_code == 404
+    assert client.post(f"/api/projects/{project_id}/reserve", json={"participants": 1}).get_json()["remaining"] == 0
+    assert client.post("/api/projects/999999/reserve", json={"participants": 1}).status_code == 404
+
+
+def test_changes_and_listing_etag(client, project):
+    response = client.get("/api/projects", query_string={"type": "环保", "limit": 5})
+    etag = response.headers["ETag"].strip('"')
+    assert client.get("/api/projects", query_string={"type": "环保", "limit": 5},
+                      headers={"If-None-Match": f'"{etag}"'}).status_code == 304
+    version = client.get(f"/api/projects/{project['id']}").get_json()["version"]
+    updated = client.patch(f"/api/projects/{project['id']}", json={"name": "东湖湿地清理"}).get_json()
+    assert updated["version"] == version + 1
+    changes = client.get("/api/changes", query_string={"since": version}).get_json()
+    assert [c["project_id"] for c in changes["changes"]] == [project["id"]] and changes["complete"]
+    # 目录版本变了，旧ETag不再匹配
+    assert client.get("/api/projects", query_string={"type": "环保", "limit": 5},
+                      headers={"If-None-Match": f'"{etag}"'}).status_code == 200
+
+
+def test_admin_endpoints_require_token(client):
+    assert client.get("/api/admin/profile").status_code == 401
+    assert client.get("/api/metrics").status_code == 200
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from volunteer_nlp_system import VolunteerNLPEngine
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return VolunteerNLPEngine()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("上午8点到10点可以参加环保活动，下午还要上课", "08:00-10:00"),
+    ("下午2点到5点我们俩人可以去孤儿院陪伴小朋友", "14:00-17:00"),
+    ("晚上7点到9点有没有社区的志愿活动", "19:00-21:00"),
+    ("我18岁，11月11日上午9点到12点想参加低碳宣传", "09:00-12:00"),
+    ("下午有空，2点到4点可以去", "14:00-16:00"),
+    ("晚上不行，上午9点到11点可以", "09:00-11:00"),
+    ("我们5人想在6月8号9点到11点做垃圾分类宣传", "09:00-11:00"),
+    ("明天下午想去敬老院", "14:00-18:00"),
+])
+def test_period_word_applies_only_to_following_time_range(engine, text, expected):
+    assert engine.extract_time_range(text) == expected
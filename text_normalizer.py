@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+from typing import Dict, Optional
+
+# 常见繁体字 → 简体字，只收一对一且不会误伤简体文本的字(如 "乾"、"著" 在简体中也单独使用，不收)
+TRADITIONAL_TO_SIMPLIFIED = (
+    "個个們们歲岁週周號号點点時时間间鐘钟後后來来過过還还這这裡里裏里麼么沒没嗎吗請请幫帮兩两幾几與与參参報报選选擇择"
+    "聯联繫系係系實实現现發发須须準准備备將将續续總总歡欢讓让給给當当應应該该於于並并從从為为對对問问題题開开門门專专"
+    "長长會会員员體体團团組组織织隊队級级紀纪齡龄環环護护動动學学習习輔辅導导課课業业義义診诊療疗醫医藥药衛卫區区務务"
+    "愛爱關关園园場场廣广館馆書书圖图讀读寫写畫画術术樂乐戲戏遊游聽听說说談谈識识傳传議议賽赛勵励節节慶庆親亲媽妈孫孙"
+    "兒儿帶带隻只貓猫寵宠樹树種种淨净潔洁掃扫類类資资訊讯電电話话網网線线車车鐵铁運运費费買买賣卖錢钱單单雙双無无難难"
+    "戶户內内東东漢汉陽阳橋桥鄉乡鎮镇縣县臺台灣湾鄰邻歷历曆历紅红綠绿藍蓝黃黄萬万億亿養养殘残聾聋啞哑離离遠远邊边圍围"
+    "處处飯饭紮扎營营農农夥伙舉举辦办屆届氣气溫温熱热雲云風风陰阴頭头臉脸腦脑語语詞词認认證证驗验寶宝貝贝齊齐鬆松嚴严"
+    "肅肃獨独強强搶抢齒齿樓楼層层廳厅廚厨燈灯聲声響响觀观覽览藝艺劇剧創创數数據据碼码帳账價价錄录標标滿满雜杂亂乱髒脏"
+    "願愿預预約约額额餘余廢废舊旧屬属態态"
+)
+
+_CJK = '[⺀-鿿豈-﫿＀-￯]'
+# 汉字与汉字、汉字与数字之间的空白没有意义，去掉后 "16 岁"、"4 月 3 号" 才能被正则匹配；
+# 英文单词之间的空白保留一个
+_SPACE_NEAR_CJK = re.compile(rf' +(?={_CJK})|(?<={_CJK}) +')
+_SPACE_RUN = re.compile(r' {2,}')
+
+
+def _build_table() -> Dict[int, Optional[str]]:
+    table: Dict[int, Optional[str]] = {}
+    # 全角ASCII(！到～)映射为半角，全角空格映射为普通空格
+    for code in range(0xFF01, 0xFF5F):
+        table[code] = chr(code - 0xFEE0)
+    table[0x3000] = ' '
+    for ch in '\t\n\r\v\f\x85\xa0     ' + ''.join(map(chr, range(0x2000, 0x200B))):
+        table[ord(ch)] = ' '
+    # 零宽字符、变体选择符和emoji直接删除
+    for code in (0x200B, 0x200C, 0x200D, 0x2060, 0xFEFF, 0xFE0E, 0xFE0F, 0x20E3):
+        table[code] = None
+    for start, end in ((0x1F000, 0x1FAFF), (0x2600, 0x27BF), (0x2B00, 0x2BFF), (0x1F1E6, 0x1F1FF),
+                       (0xE0020, 0xE007F)):
+        for code in range(start, end + 1):
+            table[code] = None
+    pairs = TRADITIONAL_TO_SIMPLIFIED
+    for i in range(0, len(pairs), 2):
+        table[ord(pairs[i])] = pairs[i + 1]
+    return table
+
+
+NORMALIZATION_TABLE = _build_table()
+
+
+def normalize_text(text: str) -> str:
+    """
+    抽取前的文本规范化: 全角转半角、繁体转简体、删除emoji和零宽字符、统一空白，
+    由一次 str.translate 完成；只有文本中有空格时才再整理空白。结果是幂等的，也用作解析缓存的键。
+    """
+    text = text.translate(NORMALIZATION_TABLE)
+    if ' ' in text:
+        text = _SPACE_RUN.sub(' ', _SPACE_NEAR_CJK.sub('', text)).strip()
+    return text
+
+
+def benchmark(repeat: int = 20000):
+    """测量不同输入的每字符规范化耗时，并统计规范化前后规则引擎抽取结果的差异；正确性见 tests/test_text_normalizer.py"""
+    import time
+    import logging
+    import jieba
+    from volunteer_nlp_system import VolunteerNLPEngine
+
+    logging.disable(logging.INFO)
+    jieba.setLogLevel(logging.WARNING)
+    samples = {
+        "纯简体": "我和我朋友都是16岁，我和他要做一个在4月3号上午的志愿活动，我们想做环保类型的",
+        "全角数字和标点": "我和我朋友都是１６岁，我和他要做一个在４月３号上午的志愿活动，我们想做环保类型的！",
+        "繁体": "我和我朋友都是16歲，我們想在下週六上午參加環保類的志願活動，離東湖近一點",
+        "emoji和空白": "明天 上午 😊 想参加 社区服务 活动　　我 18 岁 👍🏻",
+    }
+    print(f"{'输入':<14}{'字符数':>6}{'耗时':>10}{'每字符':>10}")
+    for label, text in samples.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            normalize_text(text)
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"{label:<14}{len(text):>6}{elapsed * 1e6:>8.2f}us{elapsed * 1e9 / len(text):>8.1f}ns")
+
+    engine = VolunteerNLPEngine()
+    print("\n规范化前后的抽取结果:")
+    for label, text in samples.items():
+        raw = {slot: getattr(engine, method)(text) for slot, method in engine.SLOT_EXTRACTORS.items()
+               if slot in ("年龄", "日期", "时间", "活动类型")}
+        normalized = engine.extract_slots(text, ["年龄", "日期", "时间", "活动类型"])
+        changed = {slot: f"{raw[slot]} → {normalized[slot]}" for slot in raw if raw[slot] != normalized[slot]}
+        print(f"  {label}: {normalize_text(text)}")
+        if changed:
+            print(f"    {changed}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,17 +1,93 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider
 from volunteer_nlp_system import VolunteerDatabase
+from reservation_manager import InsufficientCapacityError
+from project_listing import ProjectListing
+from catalogue_index import group_by_day
+from session_store import SessionStore
+from llm_response_parser import default_parser
+from config import Config
 from hybrid_nlp_engine import HybridNLPEngine
+from parse_result import ParseResult, ProcessRequest, Validation
+from response_encoder import create_encoder, create_compressor
+from admission_control import AdmissionController
+from sampling_profiler import SamplingProfiler, RequestProfiles
 import logging
+import hmac
 import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class ResultJSONProvider(DefaultJSONProvider):
+    """解析结果对象直接按原来的中文键结构序列化，汉字不转义"""
+
+    ensure_ascii = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (ParseResult, Validation)):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+
 app = Flask(__name__)
+app.json = ResultJSONProvider(app)
 nlp_engine = HybridNLPEngine()
 database = VolunteerDatabase()
+database.reservations.start_sweeper()
+nlp_engine.rule_engine.rules.start_watcher(Config.RULES_RELOAD_INTERVAL)
+database.prewarm_query_cache(Config.QUERY_CACHE_PREWARM_DAYS, Config.QUERY_CACHE_PREWARM_TYPES)
+# 目录快照中的项目字典不可变，是同一个对象就可以复用已序列化的片段
+response_encoder = create_encoder(is_static_row=lambda row: database.get_project(row["id"]) is row)
+response_compressor = create_compressor()
+project_listing = ProjectListing(database.snapshot, response_encoder.dumps)
+session_store = SessionStore(Config.SESSION_MAX_COUNT, Config.SESSION_TTL)
+admission_controller = AdmissionController.from_config()
+sampling_profiler = SamplingProfiler(Config.PROFILER_INTERVAL_MS / 1000, Config.PROFILER_MAX_SECONDS)
+request_profiles = RequestProfiles(Config.PROFILER_KEEP_PROFILES)
+
+
+def json_response(payload, status: int = 200) -> Response:
+    """用配置的编码器序列化响应，超过阈值且客户端支持时压缩"""
+    body = response_encoder.encode(payload)
+    response = Response(body, status=status, mimetype='application/json')
+    if response_compressor is not None:
+        body, encoding = response_compressor.compress(body, request.headers.get('Accept-Encoding', ''))
+        if encoding is not None:
+            response.set_data(body)
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+    return response
+
+def is_admin() -> bool:
+    """没有配置ADMIN_TOKEN时管理接口一律不可用"""
+    token = Config.ADMIN_TOKEN
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+@app.before_request
+def start_profiling():
+    if sampling_profiler.active:
+        sampling_profiler.request_started()
+    if 'X-Profile' in request.headers and is_admin():
+        g.profile = request_profiles.start()
+
+@app.after_request
+def finish_profiling(response):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        response.headers['X-Profile-Id'] = request_profiles.finish(profile, f"{request.method} {request.full_path}")
+    return response
+
+@app.teardown_request
+def stop_profiling(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.disable()
+    if sampling_profiler.active:
+        sampling_profiler.request_finished()
 
 @app.route('/')
 def index():
@@ -299,6 +375,7 @@ def index():
                         <div class="input-group">
                             <label class="input-label">描述您的志愿需求：</label>
                             <textarea name="text" placeholder="例如：我和朋友都是16岁，想在4月3号上午参加环保活动..." required></textarea>
+                            <input type="hidden" name="session_id" id="sessionId" value="">
                         </div>
                         <button type="submit" class="submit-btn">🚀 智能匹配</button>
                     </form>
@@ -356,6 +433,7 @@ def index():
                         })
                         .then(response => response.json())
                         .then(data => {
+                            document.getElementById('sessionId').value = data.session_id || '';
                             if (data.needs_clarification) {
                                 const container = document.getElementById('questionsContainer');
                                 const list = document.getElementById('questionsList');
@@ -392,40 +470,233 @@ def index():
 
 @app.route('/api/process', methods=['POST'])
 def process_query():
+    controller = admission_controller
+    if controller is None:
+        return _process_query(allow_llm=True)
+    # X-Forwarded-For 最前面的地址可以由客户端随意填写，只信任代理追加的最后一个
+    client = request.access_route[-1] if Config.ADMISSION_TRUST_PROXY else request.remote_addr
+    admission = controller.admit(client, request.headers.get('X-API-Key'))
+    if admission.rejected:
+        response = jsonify({"error": "请求过多，请稍后重试" if admission.reason == "rate_limited" else "服务繁忙，请稍后重试"})
+        response.status_code = 429
+        response.headers['Retry-After'] = admission.retry_after_header
+        return response
     try:
-        if request.is_json:
-            data = request.get_json()
-            text = data.get('text', '')
-        else:
-            text = request.form.get('text', '')
-            
-        if not text:
-            return jsonify({"error": "请提供文本输入"}), 400
+        response = _process_query(admission.allow_llm)
+    finally:
+        controller.release(admission)
+    if not admission.allow_llm and nlp_engine.use_llm:
+        # 过载时低优先级请求只用规则引擎处理
+        response.headers['X-Load-Shed'] = 'rules'
+    return response
+
+def _process_query(allow_llm: bool) -> Response:
+    try:
+        try:
+            req = ProcessRequest.from_payload(request.get_json() if request.is_json else request.form)
+        except ValueError as e:
+            return json_response({"error": str(e)}, 400)
             
-        logger.info(f"收到查询: {text}")
+        logger.info(f"收到查询: {req.text}")
 
-        processed_data = nlp_engine.process_natural_language(text)
+        session_id = req.session_id
+        state = session_store.get(session_id) if session_id else None
+        if state is not None:
+            processed_data, state = nlp_engine.continue_session(state, req.text, allow_llm)
+        else:
+            processed_data, state = nlp_engine.start_session(req.text, allow_llm)
+            session_id = None
+        
+        validation = processed_data.validation
+        needs_clarification = validation.needs_clarification
+        if needs_clarification:
+            if session_id:
+                session_store.update(session_id, state)
+            else:
+                session_id = session_store.create(state)
+        elif session_id:
+            session_store.delete(session_id)
+            session_id = None
+        
+        query = nlp_engine.generate_database_query(processed_data) if not needs_clarification else None
+        if query and query.get("location") and query.get("latitude") is None and req.latitude is not None:
+            # "附近"、"离我最近" 需要客户端提供用户当前位置
+            query["latitude"] = req.latitude
+            query["longitude"] = req.longitude
         response = {
-            "original_text": text,
+            "original_text": req.text,
             "extracted_info": processed_data,
-            "structured_data": nlp_engine.generate_database_query(processed_data) if not processed_data.get("验证结果", {}).get("needs_clarification", False) else None,
-            "needs_clarification": processed_data.get("验证结果", {}).get("needs_clarification", False),
-            "questions": processed_data.get("验证结果", {}).get("questions", []) if processed_data.get("验证结果", {}).get("needs_clarification", False) else [],
-            "warnings": processed_data.get("验证结果", {}).get("warnings", []) if processed_data.get("验证结果", {}).get("needs_clarification", False) else []
+            "structured_data": query,
+            "matched_by_date": database.search_projects_by_day(query) if query else [],
+            "needs_clarification": needs_clarification,
+            "questions": validation.questions if needs_clarification else [],
+            "warnings": validation.warnings if needs_clarification else [],
+            "session_id": session_id
         }
         
-        return jsonify(response)
+        return json_response(response)
         
     except Exception as e:
         logger.error(f"处理查询时出错: {str(e)}")
-        return jsonify({"error": f"处理失败: {str(e)}"}), 500
+        return json_response({"error": f"处理失败: {str(e)}"}, 500)
 
 @app.route('/api/projects', methods=['GET'])
 def get_all_projects():
-    return jsonify({
-        "projects": database.projects,
-        "total_count": len(database.projects)
-    })
+    try:
+        body, etag = project_listing.get_page(request.args.to_dict())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/projects', methods=['POST'])
+def add_project():
+    try:
+        project = database.add_project(request.get_json(silent=True) or {})
+        return jsonify({"project": project, "version": database.version}), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/projects/<int:project_id>', methods=['GET'])
+def get_project(project_id):
+    project = database.get_project(project_id)
+    if project is None:
+        return jsonify({"error": f"项目 {project_id} 不存在"}), 404
+    return jsonify({"project": project, "version": database.version})
+
+@app.route('/api/projects/<int:project_id>', methods=['PUT', 'PATCH'])
+def update_project(project_id):
+    try:
+        project = database.update_project(project_id, request.get_json(silent=True) or {})
+        return jsonify({"project": project, "version": database.version})
+    except KeyError:
+        return jsonify({"error": f"项目 {project_id} 不存在"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/projects/<int:project_id>', methods=['DELETE'])
+def remove_project(project_id):
+    try:
+        project = database.remove_project(project_id)
+        return jsonify({"project": project, "version": database.version})
+    except KeyError:
+        return jsonify({"error": f"项目 {project_id} 不存在"}), 404
+
+@app.route('/api/projects/<int:project_id>/reserve', methods=['POST'])
+def reserve_project(project_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        participants = int(data.get('participants', 1))
+        remaining = database.reserve_participants(project_id, participants)
+        return jsonify({"project_id": project_id, "reserved": participants, "remaining": remaining})
+    except KeyError:
+        return jsonify({"error": f"项目 {project_id} 不存在"}), 404
+    except InsufficientCapacityError as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/projects/<int:project_id>/hold', methods=['POST'])
+def hold_project(project_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        hold = database.hold_participants(project_id, int(data.get('participants', 1)))
+        return jsonify(hold), 201
+    except KeyError:
+        return jsonify({"error": f"项目 {project_id} 不存在"}), 404
+    except InsufficientCapacityError as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/holds/<hold_id>/confirm', methods=['POST'])
+def confirm_hold(hold_id):
+    try:
+        remaining = database.reservations.confirm(hold_id)
+        return jsonify({"hold_id": hold_id, "confirmed": True, "remaining": remaining})
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+
+@app.route('/api/holds/<hold_id>', methods=['DELETE'])
+def release_hold(hold_id):
+    try:
+        released = database.reservations.release(hold_id)
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    if not released:
+        return jsonify({"error": f"预留 {hold_id} 不存在或已过期"}), 404
+    return jsonify({"hold_id": hold_id, "released": True})
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    since = request.args.get('since', 0, type=int)
+    return jsonify(database.changes_since(since))
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    metrics = {
+        "catalogue_version": database.version,
+        "llm_response_parser": default_parser.get_stats(),
+        "sessions": session_store.get_stats(),
+        "reservations": database.reservations.get_stats(),
+        "project_listing_cache": dict(project_listing.stats),
+        "response_encoder": response_encoder.get_stats()
+    }
+    metrics["rules"] = nlp_engine.rule_engine.rules.get_stats()
+    if admission_controller is not None:
+        metrics["admission"] = admission_controller.get_stats()
+    if nlp_engine.parse_cache is not None:
+        metrics["parse_cache"] = nlp_engine.parse_cache.get_stats()
+    if database.query_cache is not None:
+        metrics["query_cache"] = database.query_cache.get_stats()
+    if response_compressor is not None:
+        metrics["response_compression"] = dict(response_compressor.stats)
+    if nlp_engine.llm_engine is not None:
+        metrics["llm_prompts"] = dict(nlp_engine.llm_engine.prompt_stats)
+        metrics["llm_backend"] = nlp_engine.llm_engine.backend.get_stats()
+    return jsonify(metrics)
+
+@app.route('/api/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def sampling_profile():
+    if not is_admin():
+        return jsonify({"error": "需要管理员令牌"}), 401
+    if request.method == 'POST':
+        try:
+            requests = request.args.get('requests', type=int)
+            interval_ms = request.args.get('interval_ms', type=float)
+            status = sampling_profiler.start(request.args.get('seconds', type=float), requests,
+                                             interval_ms / 1000 if interval_ms else None,
+                                             request.args.get('threads') == 'all')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({"error": str(e), "profile": sampling_profiler.status()}), 409
+        return jsonify(status), 202
+    if request.method == 'DELETE':
+        sampling_profiler.stop()
+        return jsonify(sampling_profiler.status())
+    if sampling_profiler.active:
+        return jsonify(sampling_profiler.status()), 202
+    collapsed = sampling_profiler.collapsed()
+    if collapsed is None:
+        return jsonify({"error": "还没有采样结果"}), 404
+    response = Response(collapsed, mimetype='text/plain')
+    response.headers['X-Profile-Samples'] = str(sampling_profiler.status()["samples"])
+    return response
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+def request_profile(profile_id):
+    if not is_admin():
+        return jsonify({"error": "需要管理员令牌"}), 401
+    profile = request_profiles.get(profile_id)
+    if profile is None:
+        return jsonify({"error": f"profile {profile_id} 不存在或已被淘汰"}), 404
+    return Response(profile, mimetype='text/plain')
 
 @app.route('/api/test', methods=['GET'])
 def run_tests():
@@ -446,10 +717,11 @@ def run_tests():
             "input": text,
             "processed_data": processed_data,
             "matched_projects": matched_projects,
+            "matched_by_date": group_by_day(matched_projects),
             "project_count": len(matched_projects)
         })
     
-    return jsonify({
+    return json_response({
         "test_results": results,
         "total_tests": len(test_cases)
     })
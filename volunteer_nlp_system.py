@@ -3,277 +3,314 @@
 import re
 import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+import time
+import threading
+from collections import Counter
+from datetime import datetime, date as date_type, timedelta
+from typing import Dict, List, Tuple, Optional, Union
 import jieba
 import jieba.posseg as pseg
+from chinese_numerals import NUMERAL, first_quantity, parse_numeral
+from date_expressions import resolve_date_range, resolve_weekdays
+from catalogue_index import CatalogueSnapshot, ChangeLog, group_by_day, parse_age_limit, parse_time_range
+from gazetteer import load_gazetteer
+from parse_result import ParseResult, Validation
+from text_index import tokenize
+from text_normalizer import normalize_text
+from rule_set import RuleSet, RuleStore, load_rules
+from geo_index import has_coordinates, haversine_km
+from query_cache import PREWARM_EXPRESSIONS, QueryResultCache, is_single_bucket, query_key
+from reservation_manager import ReservationManager
+from config import Config
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class VolunteerNLPEngine:
-    def __init__(self):
+    NUMERAL_START = re.compile(f'^{NUMERAL}')
+    SLOT_EXTRACTORS = {
+        "年龄": "extract_age",
+        "人数": "extract_people_count",
+        "日期": "extract_date",
+        "结束日期": "extract_end_date",
+        "星期": "extract_weekdays",
+        "时间": "extract_time_range",
+        "活动类型": "extract_activity_type",
+        "地点": "extract_location",
+        "距离": "extract_distance",
+        "关键词": "extract_keywords"
+    }
+    
+    def __init__(self, rules: Optional[RuleStore] = None):
         self.current_year = datetime.now().year
         self.current_date = datetime.now().date()
-        self.max_future_days = 365 
-        self.max_people_count = 50  
-        self.load_dictionaries()
-        
-    def load_dictionaries(self):
-        environmental_words = [
-            '环保', '环境保护', '垃圾分类', '植树', '绿化', '清洁', '捡垃圾',
-            '保护地球', '绿色', '生态', '可持续发展', '低碳', '节能'
-        ]
-        time_words = [
-            '上午', '下午', '早上', '中午', '傍晚', '晚上', '凌晨',
-            '点', '点钟', '小时', '分钟', '半', '整'
-        ]
-        number_words = {
-            '一': 1, '二': 2, '三': 3, '四': 4, '五': 5,
-            '六': 6, '七': 7, '八': 8, '九': 9, '十': 10,
-            '两': 2, '俩': 2
-        }
-        for word in environmental_words + time_words:
-            jieba.add_word(word)
-            
-        self.number_map = number_words
-        
-    def extract_age(self, text: str) -> Optional[int]:
-        age_patterns = [
-            r'(\d+)岁',
-            r'(\d+)周岁',
-            r'年龄(\d+)',
-            r'(\d+)岁了'
-        ]
-        
-        for pattern in age_patterns:
-            match = re.search(pattern, text)
-            if match:
-                return int(match.group(1))
-        for chinese_num, arabic_num in self.number_map.items():
-            if f'{chinese_num}岁' in text or f'{chinese_num}周岁' in text:
-                return arabic_num
-                
+        # 关键词、时间段映射、人数上限等规则来自 RULES_PATH，文件修改后会被热更新
+        self.rules = rules or load_rules()
+        self.gazetteer = load_gazetteer()
+    
+    @property
+    def max_people_count(self) -> int:
+        return self.rules.current.max_people_count
+    
+    @property
+    def max_future_days(self) -> int:
+        return self.rules.current.max_future_days
+    
+    def extract_age(self, text: str, rules: Optional[RuleSet] = None) -> Optional[int]:
+        rules = rules or self.rules.current
+        return first_quantity(rules.age_pattern, text)
+    
+    def extract_people_count(self, text: str, rules: Optional[RuleSet] = None) -> int:
+        count = self.explicit_people_count(text, rules)
+        return count if count is not None else 1
+    
+    def explicit_people_count(self, text: str, rules: Optional[RuleSet] = None) -> Optional[int]:
+        """按规则集的 people 模式和 people_phrases 抽取人数，没有明确说人数时返回None"""
+        rules = rules or self.rules.current
+        count = first_quantity(rules.people_pattern, text)
+        if count is not None:
+            return min(count, rules.max_people_count)
+        for phrase, phrase_count in rules.people_phrases:
+            if phrase in text:
+                return phrase_count
         return None
     
-    def extract_people_count(self, text: str) -> int:
-        import re
-        match = re.search(r'(\d+)人', text)
+    def extract_date(self, text: str, rules: Optional[RuleSet] = None) -> Optional[str]:
+        rules = rules or self.rules.current
+        date_range = resolve_date_range(text, max_future_days=rules.max_future_days)
+        return date_range[0].strftime('%Y-%m-%d') if date_range else None
+    
+    def extract_end_date(self, text: str, rules: Optional[RuleSet] = None) -> Optional[str]:
+        """日期表达式是区间(如 "4月3号到5号"、"这个周末")时返回结束日期，单日返回None"""
+        rules = rules or self.rules.current
+        date_range = resolve_date_range(text, max_future_days=rules.max_future_days)
+        if date_range and date_range[1] != date_range[0]:
+            return date_range[1].strftime('%Y-%m-%d')
+        return None
+    
+    def extract_weekdays(self, text: str, rules: Optional[RuleSet] = None) -> Optional[List[int]]:
+        """日期区间内只要某几个星期时返回星期列表(0=周一)，如 "4月的周末" → [5, 6]"""
+        rules = rules or self.rules.current
+        weekdays = resolve_weekdays(text, max_future_days=rules.max_future_days)
+        return sorted(weekdays) if weekdays else None
+    
+    def extract_location(self, text: str, rules: Optional[RuleSet] = None) -> Optional[str]:
+        """地名表中的地点(如 "光谷"、"洪山区")；只说了 "附近"、"离我最近" 时返回 "附近" """
+        place = self.gazetteer.find(text)
+        if place is not None:
+            return place.name
+        rules = rules or self.rules.current
+        if rules.nearby_pattern.search(text) or rules.nearest_pattern.search(text):
+            return "附近"
+        return None
+    
+    def extract_distance(self, text: str, rules: Optional[RuleSet] = None) -> Optional[Union[float, str]]:
+        """"3公里以内" → 3.0，"500米" → 0.5；要找最近的项目时返回 "最近" """
+        rules = rules or self.rules.current
+        if rules.nearest_pattern.search(text):
+            return "最近"
+        match = rules.distance_km_pattern.search(text)
         if match:
-            count = int(match.group(1))
-            return min(count, self.max_people_count)
-        for chinese_num, arabic_num in self.number_map.items():
-            if f'{chinese_num}个人' in text or f'{chinese_num}人' in text:
-                return min(arabic_num, self.max_people_count)
-        if '我一个人' in text or '我自己' in text:
-            return 1
-        elif '我和朋友' in text or '我和我朋友' in text:
-            return 2
-        elif '我和他们' in text:
-            return 3
-        elif '两个人' in text or '俩人' in text:
-            return 2
-        elif '三个人' in text or '我们三个' in text:
-            return 3
-        elif '我和' in text:
-            return 2
-            
-        return 1  
-    
-    def extract_date(self, text: str) -> Optional[str]:
-        date_patterns = [
-            r'(\d+)月(\d+)日',
-            r'(\d+)月(\d+)号',
-            r'(\d+)/(\d+)',
-            r'(\d+)\.(\d+)',
-            r'(\d+)月(\d+)'
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text)
-            if match:
-                month = int(match.group(1))
-                day = int(match.group(2))
-                if 1 <= month <= 12 and 1 <= day <= 31:
-                    try:
-                        target_date = datetime(self.current_year, month, day).date()
-
-                        if target_date < self.current_date:
-                            target_date = datetime(self.current_year + 1, month, day).date()
-
-                        if (target_date - self.current_date).days > self.max_future_days:
-                            return None
-                            
-                        return target_date.strftime('%Y-%m-%d')
-                    except ValueError:
-                        return None
-        
-        today = datetime.now()
-        if '明天' in text:
-            target_date = today + timedelta(days=1)
-            return target_date.strftime('%Y-%m-%d')
-        elif '后天' in text:
-            target_date = today + timedelta(days=2)
-            return target_date.strftime('%Y-%m-%d')
-        elif '大后天' in text:
-            target_date = today + timedelta(days=3)
-            return target_date.strftime('%Y-%m-%d')
-            
+            token = match.group(1)
+            value = float(token) if '.' in token else parse_numeral(token)
+            if value:
+                return float(value)
+        meters = first_quantity(rules.distance_m_pattern, text)
+        if meters is not None:
+            return meters / 1000
         return None
     
-    def extract_time_range(self, text: str) -> Optional[str]:
-        time_patterns = [
-            r'(\d+)[点时](\d+)?[到至](\d+)[点时](\d+)?',
-            r'(上午|下午|早上|中午|晚上)(\d+)[点时]',
-            r'(\d+)[点时]到(\d+)[点时]',
-        ]
-        
-        for pattern in time_patterns:
-            match = re.search(pattern, text)
+    def extract_keywords(self, text: str, rules: Optional[RuleSet] = None) -> Optional[List[str]]:
+        """用户点名想做的事或想去的地方(如 "敬老院"、"植树")，用于在项目名称和描述中检索"""
+        # 停用词: 由其他槽位处理的词(包括活动类型的名称)和几乎每个请求都有的词
+        stopwords = (rules or self.rules.current).keyword_stopwords
+        keywords = []
+        # 关闭HMM新词发现：关键词只需要词典里的词，分词耗时约少三分之一
+        for word in jieba.cut_for_search(text, HMM=False):
+            if len(word) < 2 or word in stopwords or word in keywords:
+                continue
+            if not re.match(r'^[\u4e00-\u9fffA-Za-z]+$', word) or self.NUMERAL_START.match(word):
+                continue
+            keywords.append(word)
+        return keywords or None
+    
+    def extract_time_range(self, text: str, rules: Optional[RuleSet] = None) -> Optional[str]:
+        rules = rules or self.rules.current
+        for pattern in rules.time_range_patterns:
+            match = pattern.search(text)
             if match:
                 groups = match.groups()
                 if len(groups) >= 3:
                     start_hour = int(groups[0] if groups[0] else groups[1])
                     end_hour = int(groups[2] if len(groups) > 2 else groups[1])
-                    if '下午' in text and start_hour < 12:
-                        start_hour += 12
-                        end_hour += 12
-                    elif '晚上' in text and start_hour < 12:
+                    if start_hour < 12 and self._period_before(text, match.start(), rules) in rules.evening_words:
                         start_hour += 12
                         end_hour += 12
                         
                     return f"{start_hour:02d}:00-{end_hour:02d}:00"
 
-        if '上午' in text:
-            return "08:00-12:00"
-        elif '下午' in text:
-            return "14:00-18:00"
-        elif '中午' in text:
-            return "11:00-14:00"
-        elif '早上' in text:
-            return "07:00-10:00"
+        for word, time_range in rules.time_of_day:
+            if word in text:
+                return time_range
             
         return None
     
-    def extract_activity_type(self, text: str) -> str:
-        text_lower = text.lower()
+    @staticmethod
+    def _period_before(text: str, position: int, rules: RuleSet) -> Optional[str]:
+        """时间段之前最近的 上午/下午/晚上 等词；"上午8点到10点，下午还要上课" 中的下午在后面，不修饰这个时间段"""
+        prefix = text[:position]
+        words = [word for word, _ in rules.time_of_day] + list(rules.evening_words)
+        found, period = max((prefix.rfind(word), word) for word in words)
+        return period if found >= 0 else None
 
-        environmental_keywords = [
-            '环保', '环境保护', '垃圾分类', '植树', '绿化', '清洁', '捡垃圾',
-            '保护地球', '绿色', '生态', '可持续发展', '低碳', '节能'
-        ]
-
-        education_keywords = [
-            '教育', '教学', '辅导', '支教', '培训', '学习', '读书', '知识'
-        ]
-
-        community_keywords = [
-            '社区', '敬老院', '养老院', '孤儿院', '福利', '关爱', '陪伴',
-            '帮助', '服务', '志愿', '公益'
-        ]
-
-        medical_keywords = [
-            '医疗', '医院', '健康', '献血', '义诊', '救助', '护理'
-        ]
-
-        for keyword in environmental_keywords:
-            if keyword in text_lower:
-                return "环保"
-                
-        for keyword in education_keywords:
-            if keyword in text_lower:
-                return "教育"
-                
-        for keyword in community_keywords:
-            if keyword in text_lower:
-                return "社区服务"
-                
-        for keyword in medical_keywords:
-            if keyword in text_lower:
-                return "医疗"
-                
-        return "综合"
-    
-    def validate_input(self, processed_data: Dict) -> Dict:
-        questions = []
-        warnings = []
-        if not processed_data["日期"]:
-            questions.append("请问您希望参加活动的具体日期是？")
+    def extract_activity_type(self, text: str, rules: Optional[RuleSet] = None) -> str:
+        return (rules or self.rules.current).activity_type(text.lower())
+    
+    def validate_input(self, result: ParseResult, confirmed_slots=(), rules: Optional[RuleSet] = None) -> Validation:
+        """检查解析结果并生成追问；不修改result，被拒绝的日期记录在 missing_slots 中"""
+        rules = rules or self.rules.current
+        validation = Validation()
+        if not result.date:
+            validation.ask("请问您希望参加活动的具体日期是？", "日期")
         else:
             try:
-                target_date = datetime.strptime(processed_data["日期"], '%Y-%m-%d').date()
+                target_date = datetime.strptime(result.date, '%Y-%m-%d').date()
                 if target_date < self.current_date:
-                    warnings.append("您选择的日期已经过去，请选择未来的日期")
-                    processed_data["日期"] = None 
-                    questions.append("请重新选择未来的活动日期")
-                elif (target_date - self.current_date).days > self.max_future_days:
-                    warnings.append("您选择的日期太远了，建议选择一年内的日期")
-                    processed_data["日期"] = None  
-                    questions.append("请选择一年内的活动日期")
-            except:
-                warnings.append("日期格式不正确")
-                processed_data["日期"] = None 
-                questions.append("请提供正确的日期格式，如：4月3日")
-        if not processed_data["时间"] or processed_data["时间"] == "09:00-17:00":
-            questions.append("请问您希望活动的具体时间段是？")
-        if processed_data["人数"] == 1:
+                    validation.ask("请重新选择未来的活动日期", "日期", "您选择的日期已经过去，请选择未来的日期")
+                elif (target_date - self.current_date).days > rules.max_future_days:
+                    validation.ask("请选择一年内的活动日期", "日期", "您选择的日期太远了，建议选择一年内的日期")
+            except (ValueError, TypeError):
+                validation.ask("请提供正确的日期格式，如：4月3日", "日期", "日期格式不正确")
+        if not result.time_range or result.time_range == "09:00-17:00":
+            validation.ask("请问您希望活动的具体时间段是？", "时间")
+        if result.people == 1:
             pass
-        elif processed_data["人数"] > self.max_people_count:
-            warnings.append(f"人数过多，已限制为{self.max_people_count}人")
-            processed_data["人数"] = self.max_people_count
-        elif processed_data["人数"] > 20:
-            questions.append(f"您计划{processed_data['人数']}人参加，请确认具体人数")
-        if not processed_data["年龄"] or processed_data["年龄"] == "不限":
-            questions.append("请问参与者的年龄大概是多少？")
+        elif result.people > rules.max_people_count:
+            validation.warnings.append(f"人数过多，已限制为{rules.max_people_count}人")
+        elif result.people > 20 and "人数" not in confirmed_slots:
+            validation.ask(f"您计划{result.people}人参加，请确认具体人数", "人数")
+        if not result.age or result.age == "不限":
+            validation.ask("请问参与者的年龄大概是多少？", "年龄")
         
-        return {
-            "questions": questions,
-            "warnings": warnings,
-            "needs_clarification": len(questions) > 0
-        }
+        return validation
     
-    def process_natural_language(self, text: str) -> Dict:
-        logger.info(f"处理输入: {text}")
-        words = pseg.cut(text)
-        logger.info(f"分词结果: {list(words)}")
-        result = {
-            "原始输入": text,
-            "年龄": self.extract_age(text),
-            "人数": self.extract_people_count(text),
-            "日期": self.extract_date(text),
-            "时间": self.extract_time_range(text),
-            "活动类型": self.extract_activity_type(text),
-            "处理时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        validation = self.validate_input(result)
-        if not result["年龄"]:
-            result["年龄"] = "不限"
-            
-        if not result["日期"]:
-            result["日期"] = datetime.now().strftime("%Y-%m-%d")
+    def extract_slots(self, text: str, slots=None, rules: Optional[RuleSet] = None) -> Dict:
+        """只运行指定槽位的抽取器，返回未填充默认值的原始结果；输入先经过 normalize_text"""
+        text = normalize_text(text)
+        # 整个请求只取一次规则集(调用方可传入它已取得的规则集)，热更新不会让同一次请求混用新旧规则
+        rules = rules or self.rules.current
+        return {slot: getattr(self, self.SLOT_EXTRACTORS[slot])(text, rules) for slot in (slots or self.SLOT_EXTRACTORS)}
+    
+    def merge_follow_up(self, slots: Dict, answer: str, missing_slots, rules: Optional[RuleSet] = None) -> Dict:
+        """只针对缺失的槽位解析追问的回答，并合并到已有结果中"""
+        rules = rules or self.rules.current
+        merged = dict(slots)
+        wanted = [slot for slot in missing_slots if slot in self.SLOT_EXTRACTORS]
+        if "日期" in wanted:
+            wanted += ["结束日期", "星期"]
+        extracted = self.extract_slots(answer, wanted, rules)
+        if "人数" in extracted:
+            # extract_people_count 没找到人数时默认返回1，只有明确说了人数才覆盖
+            extracted["人数"] = self.explicit_people_count(normalize_text(answer), rules)
+        for slot, value in extracted.items():
+            if slot in ("结束日期", "星期"):
+                if extracted["日期"] is not None:
+                    merged[slot] = value
+            elif value is not None:
+                merged[slot] = value
+        return merged
+    
+    def build_result(self, text: str, slots: Dict, confirmed_slots=(), rules: Optional[RuleSet] = None) -> ParseResult:
+        """填充默认值并验证；rules 应与抽取 slots 时用的是同一个规则集"""
+        result = ParseResult(
+            text,
+            age=slots.get("年龄"),
+            people=slots.get("人数", 1),
+            date=slots.get("日期"),
+            end_date=slots.get("结束日期"),
+            weekdays=slots.get("星期"),
+            time_range=slots.get("时间"),
+            activity_type=slots.get("活动类型") or "综合",
+            location=slots.get("地点"),
+            distance=slots.get("距离"),
+            keywords=slots.get("关键词"),
+            processed_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        )
+        rules = rules or self.rules.current
+        validation = self.validate_input(result, confirmed_slots, rules)
+        result.validation = validation
+        if "日期" in validation.missing_slots:
+            result.date = None
+            result.end_date = None
+            result.weekdays = None
+        if result.people > rules.max_people_count:
+            result.people = rules.max_people_count
+        if not result.age:
+            result.age = "不限"
             
-        if not result["时间"]:
-            result["时间"] = "09:00-17:00"
+        if not result.date:
+            result.date = datetime.now().strftime("%Y-%m-%d")
             
-        result["验证结果"] = validation
+        if not result.time_range:
+            result.time_range = "09:00-17:00"
         
-        logger.info(f"处理结果: {result}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"处理结果: {result}")
         return result
     
-    def generate_database_query(self, processed_data: Dict) -> Dict:
+    def process_natural_language(self, text: str) -> ParseResult:
+        logger.info(f"处理输入: {text}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f"分词结果: {list(pseg.cut(text))}")
+        rules = self.rules.current
+        return self.build_result(text, self.extract_slots(text, rules=rules), rules=rules)
+    
+    def generate_database_query(self, processed_data: ParseResult) -> Dict:
         query = {
-            "activity_type": processed_data["活动类型"],
-            "date": processed_data["日期"],
-            "time_range": processed_data["时间"],
-            "participants": processed_data["人数"],
-            "age_limit": processed_data["年龄"] if processed_data["年龄"] != "不限" else None
+            "activity_type": processed_data.activity_type,
+            "date": processed_data.date,
+            "date_to": processed_data.end_date,
+            "weekdays": processed_data.weekdays,
+            "time_range": processed_data.time_range,
+            "participants": processed_data.people,
+            "age_limit": processed_data.age if processed_data.age != "不限" else None
         }
+        if processed_data.keywords:
+            query["keywords"] = processed_data.keywords
+        if processed_data.location or processed_data.distance:
+            query.update(self.location_query(processed_data.location, processed_data.distance))
         
         return query
+    
+    def location_query(self, location: Optional[str], distance=None) -> Dict:
+        """
+        地点槽位转换成查询条件。"附近" 没有坐标，需要调用方填入用户的 latitude/longitude；
+        距离为 "最近" 时查询最近的 GEO_NEAREST_K 个项目，否则查询半径内的项目。
+        """
+        if not location:
+            if not distance:
+                return {}
+            # 只说了 "5公里以内" 没说地点，按用户当前位置附近处理
+            location = "附近"
+        place = self.gazetteer.lookup(location)
+        query = {
+            "location": location,
+            "latitude": place.latitude if place else None,
+            "longitude": place.longitude if place else None,
+            "radius_km": None,
+            "nearest": None
+        }
+        if distance == "最近":
+            query["nearest"] = Config.GEO_NEAREST_K
+        else:
+            query["radius_km"] = distance or (place.default_radius_km if place else Config.GEO_NEARBY_RADIUS_KM)
+        return query
 
 class VolunteerDatabase:
     
+    REQUIRED_FIELDS = ("name", "type", "date", "time", "age_limit", "max_participants")
+    
     def __init__(self):
-        self.projects = [
+        projects = [
             {
                 "id": 1,
                 "name": "城市公园环保清洁行动",
@@ -283,7 +320,9 @@ class VolunteerDatabase:
                 "age_limit": "12-60",
                 "max_participants": 50,
                 "description": "清理公园垃圾，宣传环保知识",
-                "location": "市中心公园"
+                "location": "市中心公园",
+                "latitude": 30.5900,
+                "longitude": 114.3000
             },
             {
                 "id": 2,
@@ -294,7 +333,9 @@ class VolunteerDatabase:
                 "age_limit": "8-65",
                 "max_participants": 30,
                 "description": "在社区公园种植树木，美化环境",
-                "location": "东湖社区公园"
+                "location": "东湖社区公园",
+                "latitude": 30.5750,
+                "longitude": 114.3720
             },
             {
                 "id": 3,
@@ -305,7 +346,9 @@ class VolunteerDatabase:
                 "age_limit": "16-70",
                 "max_participants": 20,
                 "description": "陪伴老人，表演节目，聊天谈心",
-                "location": "阳光敬老院"
+                "location": "阳光敬老院",
+                "latitude": 30.5200,
+                "longitude": 114.3300
             },
             {
                 "id": 4,
@@ -316,38 +359,255 @@ class VolunteerDatabase:
                 "age_limit": "10-50",
                 "max_participants": 25,
                 "description": "向青少年宣传环保知识，互动游戏",
-                "location": "青少年活动中心"
+                "location": "青少年活动中心",
+                "latitude": 30.5650,
+                "longitude": 114.2900
             }
         ]
     
+        self._write_lock = threading.Lock()
+        self._snapshot = CatalogueSnapshot.build(projects)
+        self._next_id = max(p["id"] for p in projects) + 1
+        self.change_log = ChangeLog()
+        self.query_cache = QueryResultCache(Config.QUERY_CACHE_SIZE) if Config.QUERY_CACHE_SIZE > 0 else None
+        self.reservations = ReservationManager(self._capacity_of,
+                                               stripes=Config.RESERVATION_LOCK_STRIPES,
+                                               hold_ttl=Config.RESERVATION_HOLD_TTL)
+    
+    def _capacity_of(self, project_id: int) -> Optional[int]:
+        project = self._snapshot.by_id.get(project_id)
+        return project["max_participants"] if project else None
+    
+    @property
+    def projects(self) -> List[Dict]:
+        return self._snapshot.projects
+    
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+    
+    def snapshot(self) -> CatalogueSnapshot:
+        return self._snapshot
+    
+    def get_project(self, project_id: int) -> Optional[Dict]:
+        return self._snapshot.by_id.get(project_id)
+    
+    def _validate_project(self, project: Dict):
+        missing = [field for field in self.REQUIRED_FIELDS if project.get(field) in (None, "")]
+        if missing:
+            raise ValueError(f"缺少必填字段: {', '.join(missing)}")
+        try:
+            datetime.strptime(project["date"], '%Y-%m-%d')
+            min_age, max_age = parse_age_limit(project["age_limit"])
+            start, end = parse_time_range(project["time"])
+        except (ValueError, IndexError, TypeError):
+            raise ValueError("日期、时间或年龄限制格式不正确，应为 YYYY-MM-DD / HH:MM-HH:MM / 最小-最大")
+        if min_age > max_age or start >= end:
+            raise ValueError("年龄限制或时间段的起止顺序不正确")
+        if not isinstance(project["max_participants"], int) or project["max_participants"] < 1:
+            raise ValueError("max_participants必须是正整数")
+        latitude, longitude = project.get("latitude"), project.get("longitude")
+        if (latitude is None) != (longitude is None):
+            raise ValueError("latitude和longitude需要同时提供")
+        if latitude is not None:
+            if isinstance(latitude, bool) or isinstance(longitude, bool) or \
+                    not isinstance(latitude, (int, float)) or not isinstance(longitude, (int, float)):
+                raise ValueError("latitude和longitude必须是数字")
+            if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+                raise ValueError("latitude应在-90到90之间，longitude应在-180到180之间")
+    
+    def add_project(self, project: Dict) -> Dict:
+        with self._write_lock:
+            snapshot = self._snapshot
+            project = dict(project)
+            if project.get("id") is None:
+                project["id"] = self._next_id
+            elif project["id"] in snapshot.by_id:
+                raise ValueError(f"项目 {project['id']} 已存在")
+            self._validate_project(project)
+            self._next_id = max(self._next_id, project["id"] + 1)
+            version = snapshot.version + 1
+            self._invalidate_cache(version, project)
+            self._snapshot = snapshot.with_project(version, project)
+            self.change_log.append(version, "add", project["id"], project)
+            return project
+    
+    def update_project(self, project_id: int, changes: Dict) -> Dict:
+        with self._write_lock:
+            snapshot = self._snapshot
+            previous = snapshot.by_id.get(project_id)
+            if previous is None:
+                raise KeyError(f"项目 {project_id} 不存在")
+            project = dict(previous)
+            project.update(changes)
+            project["id"] = project_id
+            self._validate_project(project)
+            # 持有项目的报名分段锁，检查已报名人数和发布新名额之间不会有新的预留插进来
+            with self.reservations.locked(project_id):
+                reserved = self.reservations.reserved(project_id)
+                if project["max_participants"] < reserved:
+                    raise ValueError(f"已有 {reserved} 人报名，max_participants不能小于该人数")
+                version = snapshot.version + 1
+                self._invalidate_cache(version, previous, project)
+                self._snapshot = snapshot.with_project(version, project, previous)
+            self.change_log.append(version, "update", project_id, project)
+            return project
+    
+    def remove_project(self, project_id: int) -> Dict:
+        with self._write_lock:
+            snapshot = self._snapshot
+            previous = snapshot.by_id.get(project_id)
+            if previous is None:
+                raise KeyError(f"项目 {project_id} 不存在")
+            version = snapshot.version + 1
+            self._invalidate_cache(version, previous)
+            self._snapshot = snapshot.without_project(version, previous)
+            self.change_log.append(version, "remove", project_id)
+        self.reservations.forget(project_id)
+        return previous
+    
+    def _invalidate_cache(self, version: int, *changed: Dict):
+        # 在发布新快照之前淘汰，避免其他线程读到新快照后又命中旧条目
+        if self.query_cache is not None:
+            self.query_cache.invalidate(version, changed)
+    
+    def prewarm_query_cache(self, days: int, type_count: int) -> int:
+        """
+        为 "这周"、"下周末"、"下个月" 等说法解析出的、从今天起 days 天内开始的日期区间，
+        按项目最多的 type_count 个类型和不限类型预先计算查询结果，返回条目数。单日查询不经过缓存，不预热。
+        """
+        if self.query_cache is None:
+            return 0
+        snapshot = self._snapshot
+        today = date_type.today()
+        last_day = (today + timedelta(days=days - 1)).isoformat()
+        upcoming = Counter(p["type"] for p in snapshot.projects if today.isoformat() <= p["date"] <= last_day)
+        types = [activity_type for activity_type, _ in upcoming.most_common(type_count)] + ["综合"]
+        ranges = set()
+        for expression in PREWARM_EXPRESSIONS:
+            date_range = resolve_date_range(expression, today)
+            if date_range and date_range[0].isoformat() <= last_day:
+                ranges.add((date_range[0].isoformat(), date_range[1].isoformat()))
+        count = 0
+        for first_day, last in sorted(ranges):
+            for activity_type in types:
+                query = {"activity_type": activity_type, "date": first_day, "date_to": last}
+                if is_single_bucket(query):
+                    continue
+                start = time.perf_counter()
+                candidates = self._find_candidates(snapshot, query)
+                self.query_cache.put(query_key(query), snapshot.version, candidates, time.perf_counter() - start)
+                count += 1
+        self.query_cache.stats["prewarmed"] += count
+        return count
+    
+    def reserve_participants(self, project_id: int, count: int) -> int:
+        """为项目登记报名人数，返回剩余名额；名额不足时抛出InsufficientCapacityError"""
+        return self.reservations.reserve(project_id, count)
+    
+    def hold_participants(self, project_id: int, count: int, ttl: Optional[float] = None) -> Dict:
+        """临时预留名额，超时未确认会自动释放"""
+        return self.reservations.hold(project_id, count, ttl).to_dict()
+    
+    def remaining_capacity(self, project_id: int) -> int:
+        return self.reservations.remaining(project_id)
+    
+    def changes_since(self, version: int) -> Dict:
+        changes, complete = self.change_log.since(version)
+        return {
+            "version": self.version,
+            "changes": changes,
+            "complete": complete
+        }
+    
     def search_projects(self, query: Dict) -> List[Dict]:
-        results = []
+        snapshot = self._snapshot
+        if query.get("date") is None:
+            return []
+        candidates, age_ranges = self._cached_candidates(snapshot, query)
+        user_age = query.get("age_limit")
+        if user_age:
+            candidates = [project for project, (min_age, max_age) in zip(candidates, age_ranges)
+                          if min_age <= user_age <= max_age]
+        if query.get("latitude") is not None and query.get("longitude") is not None:
+            return self._search_near(snapshot, candidates, query)
+        participants = query.get("participants", 1)
+        return [project for project in candidates if self._has_room(project, participants)]
+    
+    def _cached_candidates(self, snapshot: CatalogueSnapshot, query: Dict, force: bool = False):
+        """
+        日期、类型和关键词筛出的候选项目及其年龄范围，先查查询结果缓存；年龄、名额和距离由调用方再过滤。
+        单个桶的查询直接计算，force 为 True 时也走缓存(只用于基准测试对比)。
+        """
+        if self.query_cache is None or (is_single_bucket(query) and not force):
+            return self._find_candidates(snapshot, query)
+        key = query_key(query, snapshot.version)
+        candidates = self.query_cache.get(key)
+        if candidates is None:
+            start = time.perf_counter()
+            candidates = self._find_candidates(snapshot, query)
+            self.query_cache.put(key, snapshot.version, candidates, time.perf_counter() - start)
+        return candidates
+    
+    def _find_candidates(self, snapshot: CatalogueSnapshot, query: Dict):
+        activity_type = query.get("activity_type") or "综合"
+        date = query["date"]
+        date_to = query.get("date_to") or date
+        weekdays = query.get("weekdays")
+        if date_to != date or weekdays:
+            candidates = snapshot.candidates_for_dates(date, date_to, weekdays,
+                                                       activity_type if activity_type != "综合" else None)
+        elif activity_type != "综合":
+            candidates = snapshot.candidates_for_type(activity_type, date)
+        else:
+            candidates = snapshot.candidates_for_date(date)
         
-        for project in self.projects:
-            match = True
-
-            if query["activity_type"] != "综合" and project["type"] != query["activity_type"]:
-                match = False
-
-            if project["date"] != query["date"]:
-                match = False
-
-            if project["max_participants"] < query["participants"]:
-                match = False
-
-            if query["age_limit"]:
-                age_limit_parts = project["age_limit"].split('-')
-                min_age = int(age_limit_parts[0])
-                max_age = int(age_limit_parts[1])
-                user_age = query["age_limit"]
-                
-                if user_age < min_age or user_age > max_age:
-                    match = False
-            
-            if match:
-                results.append(project)
-                
-        return results
+        if query.get("keywords"):
+            candidates = self._rank_by_keywords(snapshot, candidates, query["keywords"])
+        candidates = tuple(candidates)
+        return candidates, tuple(parse_age_limit(project["age_limit"]) for project in candidates)
+    
+    def _rank_by_keywords(self, snapshot: CatalogueSnapshot, candidates: List[Dict], keywords: List[str]) -> List[Dict]:
+        """
+        只保留名称、描述或地点命中关键词的候选项目，按BM25得分排序；
+        一个都没命中时关键词不作为过滤条件，原样返回结构化条件的结果。
+        """
+        scores = snapshot.text_scores(tokenize(" ".join(keywords)), candidates)
+        if not scores:
+            return candidates
+        matched = [p for p in candidates if p["id"] in scores]
+        matched.sort(key=lambda p: -scores[p["id"]])
+        return matched
+    
+    def _has_room(self, project: Dict, participants: int) -> bool:
+        return self.reservations.remaining(project["id"], project["max_participants"]) >= participants
+    
+    def _search_near(self, snapshot: CatalogueSnapshot, candidates: List[Dict], query: Dict) -> List[Dict]:
+        """
+        按距离过滤和排序，结果带上 distance_km。候选项目不多时直接计算距离，
+        否则用网格索引只查看附近单元格里的项目，再与日期、类型条件取交集。
+        """
+        latitude, longitude = query["latitude"], query["longitude"]
+        nearest = query.get("nearest")
+        radius = query.get("radius_km") or Config.GEO_NEARBY_RADIUS_KM
+        participants = query.get("participants", 1)
+        if len(candidates) <= Config.GEO_INDEX_THRESHOLD:
+            scored = sorted(((haversine_km(latitude, longitude, p["latitude"], p["longitude"]), p)
+                             for p in candidates if has_coordinates(p) and self._has_room(p, participants)),
+                            key=lambda item: (item[0], item[1]["id"]))
+            scored = scored[:nearest] if nearest else [item for item in scored if item[0] <= radius]
+        else:
+            candidate_ids = {p["id"] for p in candidates}
+            accept = lambda p: p["id"] in candidate_ids and self._has_room(p, participants)
+            if nearest:
+                scored = snapshot.nearest(latitude, longitude, nearest, accept)
+            else:
+                scored = snapshot.candidates_within(latitude, longitude, radius, accept)
+        return [dict(project, distance_km=round(distance, 2)) for distance, project in scored]
+    
+    def search_projects_by_day(self, query: Dict) -> List[Dict]:
+        """与 search_projects 条件相同，结果按日期分组: [{"date", "weekday", "projects"}]"""
+        return group_by_day(self.search_projects(query))
 
 def main():
 